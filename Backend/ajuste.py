@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Busca de hiperparâmetros do XGBoost com validação cruzada k-fold.
+
+Cada combinação da grade (max_depth, learning_rate, n_estimators) é avaliada
+em k folds estratificados. Dentro de cada fold, uma parte do treino vira
+conjunto de validação para o early stopping: `n_estimators` é o teto, e o
+número de árvores que conta é o da melhor iteração na validação. O fold de
+teste só é usado para medir.
+
+Os ajustes (combinação x fold) rodam em threads, um por núcleo, cada
+XGBoost com uma thread só: o XGBoost solta o GIL durante o treino, e com
+poucos milhares de linhas paralelizar entre modelos escala melhor do que
+paralelizar dentro de cada árvore.
+
+O orçamento de tempo só impede que novas combinações comecem; as que já
+começaram terminam. A grade é embaralhada com semente fixa, para que um
+orçamento curto ainda cubra todos os eixos.
+"""
+import itertools
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+from sklearn.metrics import accuracy_score, f1_score, log_loss, precision_score, recall_score, roc_auc_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from sklearn.preprocessing import StandardScaler
+from xgboost import XGBClassifier
+
+# Profundidade até 6 mantém as árvores dentro do limite de 64 folhas do motor compilado
+GRADE_PADRAO = {
+    "max_depth": [3, 4, 5, 6],
+    "learning_rate": [0.03, 0.1, 0.3],
+    "n_estimators": [200, 500, 1000],
+}
+FOLDS_PADRAO = 5
+
+# Fração do treino de cada fold separada para o early stopping
+FRACAO_VALIDACAO = 0.15
+# Rodadas sem melhora na validação antes de parar
+RODADAS_SEM_MELHORA = 30
+
+
+def avaliar(y, probabilidades):
+    """Métricas de classificação (limiar 0,5, o mesmo dos vereditos da API)."""
+    y = np.asarray(y)
+    previsto = probabilidades > 0.5
+    return {
+        "acuracia": float(accuracy_score(y, previsto)),
+        "precisao": float(precision_score(y, previsto, zero_division=0)),
+        "recall": float(recall_score(y, previsto, zero_division=0)),
+        "f1": float(f1_score(y, previsto, zero_division=0)),
+        "auc": float(roc_auc_score(y, probabilidades)),
+        "logloss": float(log_loss(y, probabilidades, labels=[0, 1])),
+    }
+
+
+def combinacoes(grade, semente=42):
+    """Todas as combinações da grade, em ordem aleatória (reprodutível)."""
+    nomes = sorted(grade)
+    lista = [dict(zip(nomes, valores)) for valores in itertools.product(*(grade[n] for n in nomes))]
+    random.Random(semente).shuffle(lista)
+    return lista
+
+
+def _ajustar_fold(parametros, X_treino, y_treino, X_teste, y_teste, tree_method, semente):
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X_treino, y_treino, test_size=FRACAO_VALIDACAO, random_state=semente, stratify=y_treino
+    )
+    escalonador = StandardScaler().fit(X_fit)
+    modelo = XGBClassifier(
+        **parametros, early_stopping_rounds=RODADAS_SEM_MELHORA, eval_metric='logloss',
+        random_state=semente, n_jobs=1, tree_method=tree_method
+    )
+    modelo.fit(escalonador.transform(X_fit), y_fit, eval_set=[(escalonador.transform(X_val), y_val)], verbose=False)
+    # predict_proba já usa só as árvores até a melhor iteração
+    resultado = avaliar(y_teste, modelo.predict_proba(escalonador.transform(X_teste))[:, 1])
+    resultado["arvores"] = modelo.best_iteration + 1
+    return resultado
+
+
+def buscar_hiperparametros(X, y, grade=None, folds=FOLDS_PADRAO, orcamento_s=None, n_jobs=None,
+                           tree_method="hist", semente=42, avisar=True):
+    """
+    Avalia a grade com validação cruzada e retorna um dicionário com
+    `melhores_parametros` (n_estimators = média das melhores iterações da
+    melhor combinação), as métricas de validação cruzada dela (`cv`, média e
+    desvio entre folds, por logloss), o `ranking` das combinações avaliadas
+    e quantas couberam no orçamento.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y)
+    divisoes = list(StratifiedKFold(folds, shuffle=True, random_state=semente).split(X, y))
+    candidatos = combinacoes(grade or GRADE_PADRAO, semente)
+    n_jobs = n_jobs or os.cpu_count() or 1
+
+    inicio = time.perf_counter()
+    por_candidato = {}
+    proximo = 0
+    with ThreadPoolExecutor(max_workers=n_jobs, thread_name_prefix="ajuste") as executor:
+        pendentes = {}
+        while True:
+            # Mantém os núcleos ocupados; depois do orçamento, só espera os que já começaram
+            while proximo < len(candidatos) and len(pendentes) < n_jobs:
+                if proximo and orcamento_s is not None and time.perf_counter() - inicio >= orcamento_s:
+                    break
+                for fold, (treino, teste) in enumerate(divisoes):
+                    futuro = executor.submit(_ajustar_fold, candidatos[proximo], X[treino], y[treino],
+                                             X[teste], y[teste], tree_method, semente)
+                    pendentes[futuro] = (proximo, fold)
+                proximo += 1
+            if not pendentes:
+                break
+            prontos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                indice, fold = pendentes.pop(futuro)
+                por_candidato.setdefault(indice, {})[fold] = futuro.result()
+
+    ranking = []
+    for indice, por_fold in sorted(por_candidato.items()):
+        # Na ordem dos folds: as médias não dependem de qual thread terminou primeiro
+        resultados = [por_fold[fold] for fold in sorted(por_fold)]
+        resumo = {"parametros": candidatos[indice], "arvores": int(round(np.mean([r["arvores"] for r in resultados])))}
+        for nome in ("logloss", "acuracia", "auc", "f1"):
+            valores = [r[nome] for r in resultados]
+            resumo[nome] = float(np.mean(valores))
+            resumo[f"{nome}_std"] = float(np.std(valores))
+        ranking.append(resumo)
+    ranking.sort(key=lambda r: r["logloss"])
+
+    melhor = ranking[0]
+    segundos = time.perf_counter() - inicio
+    if avisar:
+        print(f"   {len(ranking)}/{len(candidatos)} combinações avaliadas em {segundos:.1f} s ({n_jobs} threads)")
+        print(f"   Melhor: {melhor['parametros']} -> {melhor['arvores']} árvores, "
+              f"logloss {melhor['logloss']:.4f}, acurácia {melhor['acuracia'] * 100:.2f}% ± {melhor['acuracia_std'] * 100:.2f}")
+    return {
+        "melhores_parametros": {**melhor["parametros"], "n_estimators": melhor["arvores"]},
+        "cv": {"folds": folds, **{k: v for k, v in melhor.items() if k not in ("parametros", "arvores")}},
+        "ranking": ranking,
+        "avaliadas": len(ranking),
+        "total_grade": len(candidatos),
+        "segundos": segundos,
+        "n_jobs": n_jobs,
+    }
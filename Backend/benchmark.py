@@ -0,0 +1,924 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks do backend de classificação de exoplanetas.
+
+Uso (a partir da pasta Backend):
+    python benchmark.py serializacao [--linhas 10000] [--repeticoes 5]
+    python benchmark.py microlote [--clientes 32] [--requisicoes 2000] [--linhas 5]
+    python benchmark.py carga_modelo [--repeticoes 5]
+    python benchmark.py motor [--linhas 100000] [--repeticoes 5] [--threads N]
+    python benchmark.py treino [--arquivo CSV] [--repeticoes 3]
+    python benchmark.py ajuste [--arquivo CSV] [--folds 5] [--threads N]
+    python benchmark.py cache [--repeticoes 5]
+    python benchmark.py lote [--arquivos 100] [--linhas 50] [--repeticoes 3]
+    python benchmark.py json [--requisicoes 2000] [--candidatos 1]
+    python benchmark.py explicar [--tamanhos 1000,100000] [--repeticoes 3]
+    python benchmark.py leitor [--linhas 1000000] [--repeticoes 3]
+    python benchmark.py formatos [--linhas 100000] [--repeticoes 3]
+    python benchmark.py suite [--tamanhos 1000,100000,1000000] [--casos parse,score,...] [--repeticoes 3] [--saida JSON]
+    python benchmark.py comparar BASE.json NOVO.json [--limite 0.10]
+
+A suíte gera CSVs sintéticos no formato do cumulative (em tempfile.gettempdir()/exo_benchmark,
+reaproveitados entre execuções), roda cada caso em um processo novo para medir o pico de
+memória (RSS) e grava os resultados em JSON, comparáveis entre commits com `comparar`.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+import main
+
+CSV_EXEMPLO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cumulative_2025.10.05_03.56.05.csv")
+
+
+def _resultados_sinteticos(linhas, seed=42):
+    """DataFrame no formato retornado por model.analisar_dataframe."""
+    rng = np.random.default_rng(seed)
+    confianca = rng.random(linhas, dtype=np.float32)
+    return pd.DataFrame({
+        'kepoi_name': [f"K{i:05d}.01" for i in range(linhas)],
+        'Confianca_Calculada': confianca,
+        'Veredito_do_Modelo': np.where(confianca > 0.5, "Planeta Confirmado", "Falso Positivo")
+    })
+
+
+def _serializar_iterrows(resultados):
+    """Caminho antigo do /predict: iterrows + try/except por linha + json da stdlib."""
+    predictions = []
+    for idx, row in resultados.iterrows():
+        try:
+            percent = float(row["Confianca_Calculada"]) * 100 if isinstance(row["Confianca_Calculada"], (float, int)) else None
+        except Exception:
+            percent = None
+        predictions.append({
+            "id": idx + 1,
+            "name": row.get("kepoi_name", f"ID_{idx+1}"),
+            "percent": round(percent, 2) if percent else None,
+            "status": row.get("Veredito_do_Modelo", "Desconhecido")
+        })
+    return JSONResponse(content={"predictions": predictions}).body
+
+
+def _serializar_colunar(resultados, orient):
+    return ORJSONResponse(content={"predictions": main.build_predictions(resultados, orient)}).body
+
+
+def _medir(func, repeticoes):
+    """Menor tempo (s) entre as repetições."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        func()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def bench_serializacao(linhas, repeticoes):
+    resultados = _resultados_sinteticos(linhas)
+    casos = {
+        "iterrows + json (antigo)": lambda: _serializar_iterrows(resultados),
+        "numpy + orjson, records": lambda: _serializar_colunar(resultados, "records"),
+        "numpy + orjson, columns": lambda: _serializar_colunar(resultados, "columns"),
+    }
+
+    print(f"\n📏 Serialização de {linhas} predições (melhor de {repeticoes})")
+    base = None
+    for nome, func in casos.items():
+        segundos = _medir(func, repeticoes)
+        base = base or segundos
+        print(f"   {nome:<28} {segundos * 1e3:9.2f} ms  {segundos / linhas * 1e6:7.3f} µs/linha  {base / segundos:6.1f}x")
+
+
+def _csv_pequeno(linhas, seed=0):
+    """Algumas linhas aleatórias do CSV de exemplo, como um cliente pequeno enviaria."""
+    df = pd.read_csv(CSV_EXEMPLO, comment='#')
+    return df.sample(linhas, random_state=seed).to_csv(index=False).encode("utf-8")
+
+
+async def _carga(cliente, corpo, clientes, requisicoes):
+    """Dispara `requisicoes` POSTs com `clientes` concorrentes; retorna (segundos, latências)."""
+    latencias = []
+    restantes = iter(range(requisicoes))
+
+    async def cliente_loop():
+        for _ in restantes:
+            inicio = time.perf_counter()
+            r = await cliente.post("/predict?csv_mode=link", files={"file": ("k.csv", corpo, "text/csv")})
+            latencias.append(time.perf_counter() - inicio)
+            r.raise_for_status()
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente_loop() for _ in range(clientes)))
+    return time.perf_counter() - inicio, np.array(latencias)
+
+
+async def _bench_microlote(clientes, requisicoes, linhas):
+    import contextlib
+    import io
+    import httpx
+    import model
+    from cache_predicoes import CachePredicoes
+
+    # Fila do pool grande o bastante para nenhuma requisição da carga receber 429
+    main.POOL_QUEUE_DEPTH = max(main.POOL_QUEUE_DEPTH, clientes)
+    with contextlib.redirect_stdout(io.StringIO()):
+        await main.startup_event()
+    batcher = main.micro_batcher
+    corpo = _csv_pequeno(linhas)
+    # Todas as requisições mandam as mesmas linhas: com o cache, só o aquecimento chegaria ao modelo
+    cache, model.cache_predicoes = model.cache_predicoes, CachePredicoes(0)
+
+    print(f"\n📏 Carga: {requisicoes} requisições de {linhas} linhas, {clientes} clientes concorrentes (sem cache)")
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as cliente:
+        for nome, micro_batcher in (("por requisição", None), ("micro-batching", batcher)):
+            main.micro_batcher = micro_batcher
+            with contextlib.redirect_stdout(io.StringIO()):
+                await _carga(cliente, corpo, clientes, min(requisicoes, 100))  # aquecimento
+                lotes, linhas_pontuadas = (batcher.batches, batcher.rows) if micro_batcher else (0, 0)
+                segundos, latencias = await _carga(cliente, corpo, clientes, requisicoes)
+            p50, p99 = np.percentile(latencias, [50, 99]) * 1e3
+            # Fator de agrupamento: linhas por chamada ao modelo (sem micro-batching, as de uma requisição)
+            por_lote = ((batcher.rows - linhas_pontuadas) / max(batcher.batches - lotes, 1)) if micro_batcher else linhas
+            print(f"   {nome:<16} {requisicoes / segundos:8.1f} req/s  {por_lote:7.1f} linhas/lote  "
+                  f"p50 {p50:7.2f} ms  p99 {p99:7.2f} ms")
+
+    model.cache_predicoes = cache
+    main.micro_batcher = batcher
+    with contextlib.redirect_stdout(io.StringIO()):
+        await main.shutdown_event()
+
+
+def bench_microlote(clientes, requisicoes, linhas):
+    asyncio.run(_bench_microlote(clientes, requisicoes, linhas))
+
+
+# Imprime (segundos de import, segundos de carga). O unpickling do joblib
+# importa scikit-learn e xgboost sob demanda; o bundle importa só o xgboost.
+_CARGA_JOBLIB = """
+import time
+inicio = time.perf_counter()
+import joblib, sklearn.preprocessing, xgboost.sklearn
+meio = time.perf_counter()
+for caminho in {caminhos!r}:
+    joblib.load(caminho)
+print(meio - inicio, time.perf_counter() - meio)
+"""
+
+_CARGA_BUNDLE = """
+import time
+inicio = time.perf_counter()
+import bundle, xgboost
+meio = time.perf_counter()
+bundle.carregar_bundle({caminho!r})
+print(meio - inicio, time.perf_counter() - meio)
+"""
+
+
+def bench_carga_modelo(repeticoes):
+    """Tempo até o modelo estar pronto em um processo novo."""
+    import model
+
+    if not os.path.exists(model.BUNDLE_PATH):
+        model.exportar_bundle()
+
+    casos = (
+        ("joblib (3 arquivos)", _CARGA_JOBLIB.format(caminhos=(model.MODEL_PATH, model.SCALER_PATH, model.FEATURES_PATH))),
+        ("bundle .exob (mmap)", _CARGA_BUNDLE.format(caminho=model.BUNDLE_PATH)),
+    )
+
+    print(f"\n📏 Cold start do modelo em processo novo, imports incluídos (melhor de {repeticoes})")
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    for nome, codigo in casos:
+        tempos = []
+        for _ in range(repeticoes):
+            saida = subprocess.run(
+                [sys.executable, "-W", "ignore", "-c", codigo],
+                cwd=diretorio, capture_output=True, text=True, check=True
+            ).stdout
+            tempos.append([float(t) for t in saida.strip().splitlines()[-1].split()])
+        imports, carga = np.min(tempos, axis=0) * 1e3
+        print(f"   {nome:<22} imports {imports:8.1f} ms   carga {carga:6.2f} ms")
+
+
+def bench_motor(linhas, repeticoes, threads):
+    """
+    Motor compilado (1 thread e `threads` threads) vs o XGBoost, que usa
+    todos os núcleos: latência de 1 linha, vazão em lote e diferença.
+    """
+    import contextlib
+    import io
+    import arvores
+    import model
+
+    model.MOTOR_INFERENCIA = "xgboost"  # carrega o XGBClassifier mesmo com EXO_MOTOR_INFERENCIA definido
+    with contextlib.redirect_stdout(io.StringIO()):
+        xgb, escalonador, features = model.treinar_modelo_final()
+        inicio = time.perf_counter()
+        compilado = model.aplicar_motor(xgb, "compilado")
+        compilacao = time.perf_counter() - inicio
+
+    df = pd.read_csv(CSV_EXEMPLO, comment='#')
+    X = model.preparar_matriz(df, features, medianas=model.medianas_do_treino(escalonador))
+    X = escalonador.transform(pd.DataFrame(X, columns=features))
+    X_lote = np.resize(X, (linhas, X.shape[1]))
+    uma_linha = X[:1]
+
+    nucleos = os.cpu_count() or 1
+    print(f"\n📏 Motor de inferência, {linhas} linhas no lote (melhor de {repeticoes}); compilação {compilacao:.2f} s; "
+          f"{nucleos} núcleo(s)")
+    casos = (("xgboost predict_proba", xgb, nucleos), ("compilado, 1 thread", compilado, 1),
+             (f"compilado, {threads} threads", compilado, threads))
+    for nome, modelo, n in casos:
+        arvores.THREADS, arvores._executor = n, None
+        modelo.predict_proba(uma_linha)
+        latencia = _medir(lambda: [modelo.predict_proba(uma_linha) for _ in range(200)], repeticoes) / 200
+        lote = _medir(lambda: modelo.predict_proba(X_lote), repeticoes)
+        print(f"   {nome:<24} 1 linha {latencia * 1e6:8.1f} µs   lote {linhas / lote:12,.0f} linhas/s")
+    if nucleos < threads:
+        print(f"   ⚠️  Só {nucleos} núcleo(s): o ganho das threads no lote não aparece nesta máquina")
+
+    esperado = xgb.predict_proba(X)[:, 1]
+    obtido = compilado.predict_proba(X)[:, 1]
+    X_nan = X.copy()
+    X_nan[np.random.default_rng(0).random(X.shape) < 0.2] = np.nan
+    diferenca = max(np.abs(esperado - obtido).max(),
+                    np.abs(xgb.predict_proba(X_nan)[:, 1] - compilado.predict_proba(X_nan)[:, 1]).max())
+    vereditos = int(((esperado > 0.5) != (obtido > 0.5)).sum())
+    print(f"   diferença máxima de probabilidade {diferenca:.2e} (com 20% de NaN incluso), vereditos diferentes: {vereditos}")
+
+
+def bench_treino(arquivo, repeticoes):
+    """Pré-processamento do CSV de treino com e sem cache, e o retreino completo com cache."""
+    import contextlib
+    import io
+    import tempfile
+    import model
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        # Artefatos e cache vão para um diretório temporário: o modelo em uso não é tocado
+        for nome in ("MODEL_PATH", "SCALER_PATH", "FEATURES_PATH", "BUNDLE_PATH", "CACHE_TREINO_PATH"):
+            setattr(model, nome, os.path.join(diretorio, os.path.basename(getattr(model, nome))))
+        model.MOTOR_INFERENCIA = "xgboost"
+        features = model.FEATURES_MODELO
+
+        def sem_cache():
+            if os.path.exists(model.CACHE_TREINO_PATH):
+                os.remove(model.CACHE_TREINO_PATH)
+            model.carregar_dados_treino(arquivo, features)
+
+        casos = (
+            ("read_csv completo (antigo)", lambda: pd.read_csv(arquivo, comment='#')),
+            ("CSV -> cache (usecols)", sem_cache),
+            ("cache .npz", lambda: model.carregar_dados_treino(arquivo, features)),
+            ("retreino com cache", lambda: model.treinar_modelo_final(arquivo, retreinar=True)),
+        )
+        print(f"\n📏 Dados de treino de {os.path.basename(arquivo)} (melhor de {repeticoes})")
+        for nome, func in casos:
+            with contextlib.redirect_stdout(io.StringIO()):
+                segundos = _medir(func, repeticoes)
+            print(f"   {nome:<28} {segundos * 1e3:9.1f} ms")
+
+
+def bench_ajuste(arquivo, folds, threads):
+    """
+    Busca de hiperparâmetros com a grade padrão: um ajuste por vez vs
+    `threads` em paralelo (padrão: um por núcleo, no mínimo 2), com o ganho.
+    """
+    import tempfile
+    import ajuste
+    import model
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        model.CACHE_TREINO_PATH = os.path.join(diretorio, "cache_treino.npz")
+        X, y = model.carregar_dados_treino(arquivo, model.FEATURES_MODELO)
+    X_treino, _, y_treino, _ = model._dividir_treino_teste(X, y)
+
+    threads = max(threads, 2)
+    nucleos = os.cpu_count() or 1
+    total = len(ajuste.combinacoes(ajuste.GRADE_PADRAO))
+    print(f"\n📏 Busca de hiperparâmetros: {total} combinações x {folds} folds, {len(X_treino)} amostras "
+          f"({nucleos} núcleo(s) disponível(is))")
+    resultados = {}
+    for n in (1, threads):
+        inicio = time.perf_counter()
+        busca = ajuste.buscar_hiperparametros(X_treino, y_treino, folds=folds, n_jobs=n, avisar=False)
+        resultados[n] = (time.perf_counter() - inicio, busca)
+        print(f"   {n:>3} thread(s): {resultados[n][0]:8.1f} s  melhor {busca['melhores_parametros']} "
+              f"(logloss {busca['cv']['logloss']:.4f})")
+
+    ganho = resultados[1][0] / resultados[threads][0]
+    mesma = resultados[1][1]["melhores_parametros"] == resultados[threads][1]["melhores_parametros"]
+    print(f"   Ganho da busca paralela ({threads} threads vs 1): {ganho:.2f}x; "
+          f"mesma escolha de hiperparâmetros: {'sim' if mesma else 'não'}")
+    if nucleos < threads:
+        print(f"   ⚠️  Só {nucleos} núcleo(s): o ganho fica limitado a {nucleos}x nesta máquina; "
+              f"meça em uma máquina com {threads} núcleos")
+
+
+def bench_cache(repeticoes):
+    """Pontuação do CSV de exemplo sem cache, com cache frio, quente e com metade das linhas repetidas."""
+    import contextlib
+    import io
+    import model
+    from cache_predicoes import CachePredicoes
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        modelo, escalonador, features = model.treinar_modelo_final()
+    df = pd.read_csv(CSV_EXEMPLO, comment='#')
+    X = model.preparar_matriz(df, features, medianas=model.medianas_do_treino(escalonador))
+    metade = len(X) // 2
+    perturbacoes = iter(range(1, 10 ** 6))
+
+    def sobreposto():
+        # Metade já vista + metade nova (linhas perturbadas, diferentes a cada chamada)
+        return np.concatenate([X[metade:], X[:metade] * (1 + next(perturbacoes) * 1e-3)])
+
+    def pontuar(X_, cache):
+        model.cache_predicoes = cache
+        return model.pontuar_candidatos(X_, modelo, escalonador, features)[0]
+
+    def frio():
+        pontuar(X, CachePredicoes(len(X) * 2))
+
+    quente = CachePredicoes(len(X) * (repeticoes + 2))
+    pontuar(X, quente)
+
+    casos = (
+        ("sem cache", lambda: pontuar(X, CachePredicoes(0))),
+        ("cache frio (só misses)", frio),
+        ("cache quente (só hits)", lambda: pontuar(X, quente)),
+        ("50% das linhas em cache", lambda: pontuar(sobreposto(), quente)),
+    )
+    print(f"\n📏 Pontuação de {len(X)} candidatos (melhor de {repeticoes})")
+    for nome, func in casos:
+        segundos = _medir(func, repeticoes)
+        print(f"   {nome:<26} {segundos * 1e3:8.2f} ms")
+
+    X_sobreposto = sobreposto()
+    iguais = np.array_equal(pontuar(X_sobreposto, quente), pontuar(X_sobreposto, CachePredicoes(0)))
+    print(f"   resultado com cache idêntico ao sem cache: {iguais}; {quente.stats()}")
+
+
+async def _bench_lote(arquivos, linhas, repeticoes):
+    import contextlib
+    import io
+    import zipfile
+    import httpx
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        await main.startup_event()
+    df = pd.read_csv(CSV_EXEMPLO, comment='#')
+    csvs = [
+        (f"alvo_{i:04d}.csv", df.sample(linhas, random_state=i).to_csv(index=False).encode("utf-8"))
+        for i in range(arquivos)
+    ]
+    zip_bytes = io.BytesIO()
+    with zipfile.ZipFile(zip_bytes, "w", zipfile.ZIP_DEFLATED) as zf:
+        for nome, corpo in csvs:
+            zf.writestr(nome, corpo)
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as cliente:
+        async def uma_por_arquivo():
+            for nome, corpo in csvs:
+                (await cliente.post("/predict?csv_mode=link", files={"file": (nome, corpo, "text/csv")})).raise_for_status()
+
+        async def lote_arquivos():
+            files = [("files", (nome, corpo, "text/csv")) for nome, corpo in csvs]
+            (await cliente.post("/predict/batch", files=files)).raise_for_status()
+
+        async def lote_zip():
+            files = {"files": ("lote.zip", zip_bytes.getvalue(), "application/zip")}
+            (await cliente.post("/predict/batch", files=files)).raise_for_status()
+
+        print(f"\n📏 {arquivos} CSVs de {linhas} linhas (melhor de {repeticoes})")
+        for nome, func in (("1 /predict por arquivo", uma_por_arquivo),
+                           ("/predict/batch, arquivos", lote_arquivos),
+                           ("/predict/batch, ZIP", lote_zip)):
+            tempos = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    await func()
+                tempos.append(time.perf_counter() - inicio)
+            print(f"   {nome:<26} {min(tempos) * 1e3:9.1f} ms")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        await main.shutdown_event()
+
+
+def bench_lote(arquivos, linhas, repeticoes):
+    asyncio.run(_bench_lote(arquivos, linhas, repeticoes))
+
+
+async def _bench_json(requisicoes, candidatos):
+    import contextlib
+    import io
+    import httpx
+
+    main.SERVER_TIMING = True
+    with contextlib.redirect_stdout(io.StringIO()):
+        await main.startup_event()
+    df = pd.read_csv(CSV_EXEMPLO, comment='#').sample(candidatos, random_state=0)
+    colunas = ["kepoi_name"] + main.model.FEATURES_MODELO
+    corpo_json = df[colunas].astype(object).where(df[colunas].notna(), None).to_dict("records")
+    corpo_csv = df.to_csv(index=False).encode("utf-8")
+
+    def servidor_ms(resposta):
+        # "total;dur=..." do Server-Timing: tempo dentro do endpoint
+        return float(resposta.headers["server-timing"].rsplit("total;dur=", 1)[1])
+
+    print(f"\n📏 {requisicoes} requisições sequenciais de {candidatos} candidato(s)")
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as cliente:
+        casos = (
+            ("/predict (CSV multipart)", lambda: cliente.post(
+                "/predict", files={"file": ("alvo.csv", corpo_csv, "text/csv")})),
+            ("/predict/json", lambda: cliente.post("/predict/json", json=corpo_json)),
+        )
+        for nome, enviar in casos:
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(min(requisicoes, 100)):  # aquecimento
+                    await enviar()
+                ida_e_volta, servidor = [], []
+                for _ in range(requisicoes):
+                    inicio = time.perf_counter()
+                    resposta = await enviar()
+                    ida_e_volta.append(time.perf_counter() - inicio)
+                    servidor.append(servidor_ms(resposta))
+            p50, p99 = np.percentile(ida_e_volta, [50, 99]) * 1e3
+            s50, s99 = np.percentile(servidor, [50, 99])
+            print(f"   {nome:<26} servidor p50 {s50:7.3f} ms  p99 {s99:7.3f} ms | "
+                  f"ida e volta (ASGI) p50 {p50:7.3f} ms  p99 {p99:7.3f} ms")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        await main.shutdown_event()
+
+
+def bench_json(requisicoes, candidatos):
+    """Latência de um candidato: /predict com CSV vs /predict/json (cliente ASGI no mesmo processo)."""
+    asyncio.run(_bench_json(requisicoes, candidatos))
+
+
+def bench_explicar(tamanhos, repeticoes):
+    """
+    Custo de explain=true: contribuições (pred_contribs) vs só a pontuação,
+    e o /predict completo (leitura, pontuação e CSV Base64) sem e com elas.
+    """
+    import contextlib
+    import io
+    import leitor
+    import model
+    import pipeline
+    from cache_predicoes import CachePredicoes
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        modelo, escalonador, features = model.treinar_modelo_final()
+    # Sem cache de predições: as duas variantes pontuam tudo
+    model.cache_predicoes = CachePredicoes(0)
+
+    print(f"\n📏 Custo das contribuições por feature (explain=true, melhor de {repeticoes})")
+    for linhas in tamanhos:
+        with open(_arquivo_sintetico(linhas), 'rb') as f:
+            conteudo = f.read()
+        df = leitor.ler_csv(conteudo, features)[0]
+        X = model.preparar_matriz(df, features, medianas=model.medianas_do_treino(escalonador))
+        with contextlib.redirect_stdout(io.StringIO()):
+            pontuar = _medir(lambda: model.pontuar_candidatos(X, modelo, escalonador, features, avisar=False),
+                             repeticoes)
+            explicar = _medir(lambda: model.calcular_contribuicoes(X, modelo, escalonador, features), repeticoes)
+            sem = _medir(lambda: pipeline.analisar_upload(conteudo, "koi.csv", modelo, escalonador, features),
+                         repeticoes)
+            com = _medir(lambda: pipeline.analisar_upload(conteudo, "koi.csv", modelo, escalonador, features,
+                                                          explicar=True), repeticoes)
+        print(f"   {linhas:>9} linhas  pontuação {pontuar * 1e3:9.1f} ms   contribuições {explicar * 1e3:9.1f} ms "
+              f"({explicar / pontuar:5.1f}x)   /predict {sem * 1e3:9.1f} -> {com * 1e3:9.1f} ms (+{com / sem - 1:.0%})")
+
+
+def _ler_upload_antigo(conteudo):
+    """Leitura do upload antes do `leitor`: filtro de comentários em Python e todas as colunas."""
+    import io
+    text = conteudo.decode("utf-8")
+    clean_text = '\n'.join(line for line in text.split('\n') if not line.strip().startswith('#'))
+    return pd.read_csv(io.StringIO(clean_text), sep=',', on_bad_lines='skip')
+
+
+def bench_leitor(linhas, repeticoes):
+    """Leitura de um upload grande (CSV de exemplo replicado): leitor antigo vs `leitor.ler_csv`."""
+    import contextlib
+    import io
+    import leitor
+    import model
+
+    with open(CSV_EXEMPLO, 'rb') as f:
+        exemplo = f.read()
+    inicio = leitor.fim_dos_comentarios(exemplo)
+    cabecalho, dados = exemplo[inicio:].split(b'\n', 1)
+    dados = dados.rstrip(b'\n') + b'\n'
+    n_exemplo = dados.count(b'\n')
+    conteudo = exemplo[:inicio] + cabecalho + b'\n' + dados * (linhas // n_exemplo) + \
+        b''.join(dados.splitlines(keepends=True)[:linhas % n_exemplo])
+    del exemplo, dados
+
+    casos = [("antigo (filtro Python, todas as colunas)", lambda: _ler_upload_antigo(conteudo)),
+             ("leitor, motor C", lambda: leitor.ler_csv(conteudo, model.FEATURES_MODELO, motor="c")[0])]
+    if leitor._TEM_PYARROW:
+        casos.append(("leitor, motor pyarrow", lambda: leitor.ler_csv(conteudo, model.FEATURES_MODELO, motor="pyarrow")[0]))
+
+    print(f"\n📏 Leitura de {linhas} linhas ({len(conteudo) / 2**20:.0f} MB, melhor de {repeticoes})")
+    for nome, func in casos:
+        with contextlib.redirect_stdout(io.StringIO()):
+            segundos = _medir(func, repeticoes)
+        df = func()
+        memoria = df.memory_usage(deep=True).sum() / 2**20
+        print(f"   {nome:<42} {segundos * 1e3:9.1f} ms  {len(df) / segundos / 1e6:6.2f} M linhas/s  "
+              f"DataFrame {df.shape[1]:>3} colunas, {memoria:7.1f} MB")
+        del df
+
+
+def bench_formatos(linhas, repeticoes):
+    """Upload de `linhas` candidatos em CSV, Parquet, Arrow IPC e .npy: codificação no cliente, leitura e pontuação."""
+    import contextlib
+    import io
+    import pyarrow as pa
+    import model
+    import pipeline
+    from cache_predicoes import CachePredicoes
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        modelo, escalonador, features = model.treinar_modelo_final()
+    # Sem cache de predições: toda repetição pontua de novo
+    model.cache_predicoes = CachePredicoes(0)
+    medianas = model.medianas_do_treino(escalonador)
+
+    exemplo = pd.read_csv(CSV_EXEMPLO, comment='#')
+    df = pd.concat([exemplo] * (linhas // len(exemplo) + 1), ignore_index=True).iloc[:linhas]
+
+    def arrow_stream():
+        saida = io.BytesIO()
+        tabela = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.ipc.new_stream(saida, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+        return saida.getvalue()
+
+    def npy():
+        saida = io.BytesIO()
+        np.save(saida, df[features].to_numpy(np.float64))
+        return saida.getvalue()
+
+    def parquet():
+        saida = io.BytesIO()
+        df.to_parquet(saida)
+        return saida.getvalue()
+
+    formatos = (
+        ("CSV", lambda: df.to_csv(index=False).encode()),
+        ("Parquet", parquet),
+        ("Arrow IPC (stream)", arrow_stream),
+        (".npy 2D float64", npy),
+    )
+    print(f"\n📏 Upload de {linhas} candidatos, {df.shape[1]} colunas (melhor de {repeticoes})")
+    print(f"   {'formato':<20} {'cliente':>10} {'tamanho':>9} {'leitura':>10} {'leitura+modelo':>15}")
+    for nome, codificar in formatos:
+        codificacao = _medir(codificar, 1)
+        conteudo = codificar()
+        with contextlib.redirect_stdout(io.StringIO()):
+            leitura = _medir(lambda: pipeline.preparar_upload(conteudo, nome, features, medianas), repeticoes)
+            total = _medir(lambda: pipeline.analisar_upload(conteudo, nome, modelo, escalonador, features,
+                                                            incluir_csv_base64=False), repeticoes)
+        print(f"   {nome:<20} {codificacao * 1e3:8.0f} ms {len(conteudo) / 2**20:6.1f} MB "
+              f"{leitura * 1e3:8.1f} ms {total * 1e3:13.1f} ms")
+
+
+TAMANHOS_SUITE = (1000, 100000, 1000000)
+CASOS_SUITE = ("parse", "score", "serialize", "analisar_novo_csv", "http", "treino")
+# Fora do padrão (~100x a pontuação, minutos em 1M linhas): pedidos com --casos
+CASOS_EXPLAIN = ("explain", "analisar_explain")
+
+
+def gerar_koi_sintetico(linhas, destino, seed=0):
+    """
+    CSV no formato do cumulative (mesmo bloco de comentários e colunas) com
+    `linhas` candidatos sorteados do exemplo, ruído de 1% nas features
+    contínuas e nomes únicos (o cache de predições não reconhece as linhas).
+    """
+    import leitor
+    import model
+
+    with open(CSV_EXEMPLO, 'rb') as f:
+        exemplo = f.read()
+    comentarios = exemplo[:leitor.fim_dos_comentarios(exemplo)].decode("utf-8")
+    df = pd.read_csv(CSV_EXEMPLO, comment='#')
+
+    rng = np.random.default_rng(seed)
+    sintetico = df.iloc[rng.integers(0, len(df), linhas)].reset_index(drop=True)
+    for col in model.FEATURES_MODELO:
+        valores = df[col].dropna()
+        if not np.array_equal(valores, valores.round()):
+            sintetico[col] = sintetico[col] * rng.normal(1, 0.01, linhas)
+    sintetico['kepoi_name'] = [f"S{i:07d}.01" for i in range(linhas)]
+
+    tmp = destino + ".tmp"
+    with open(tmp, 'w', encoding="utf-8", newline="") as f:
+        f.write(comentarios)
+        sintetico.to_csv(f, index=False)
+    os.replace(tmp, destino)
+
+
+def _arquivo_sintetico(linhas, seed=0):
+    import tempfile
+
+    diretorio = os.path.join(tempfile.gettempdir(), "exo_benchmark")
+    os.makedirs(diretorio, exist_ok=True)
+    destino = os.path.join(diretorio, f"koi_{linhas}_{seed}.csv")
+    if not os.path.exists(destino):
+        print(f"   gerando {linhas} linhas sintéticas em {destino}...")
+        gerar_koi_sintetico(linhas, destino, seed)
+    return destino
+
+
+def _rss_pico_mb():
+    import resource
+
+    # ru_maxrss vem em KiB no Linux (em bytes no macOS)
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+def _executar_caso(caso, arquivo, linhas, repeticoes):
+    """
+    Roda um caso da suíte neste processo (chamado pela suíte em um processo
+    novo) e imprime o resultado em JSON na última linha da saída.
+    """
+    import contextlib
+    import io
+    import json
+    import tempfile
+    import orjson
+    import leitor
+    import model
+    import pipeline
+    from cache_predicoes import CachePredicoes
+
+    silencio = contextlib.redirect_stdout(io.StringIO())
+    with silencio:
+        modelo, escalonador, features = model.treinar_modelo_final()
+    # Sem cache de predições: cada repetição pontua tudo de novo
+    model.cache_predicoes = CachePredicoes(0)
+    with open(arquivo, 'rb') as f:
+        conteudo = f.read()
+
+    diretorio_treino = None
+    cliente = None
+    if caso == "parse":
+        func = lambda: leitor.ler_csv(conteudo, features)
+    elif caso == "score":
+        df = leitor.ler_csv(conteudo, features)[0]
+        func = lambda: model.pontuar_candidatos(df, modelo, escalonador, features, avisar=False)
+    elif caso == "explain":
+        df = leitor.ler_csv(conteudo, features)[0]
+        X = model.preparar_matriz(df, features, medianas=model.medianas_do_treino(escalonador))
+        func = lambda: model.calcular_contribuicoes(X, modelo, escalonador, features)
+    elif caso == "serialize":
+        df = leitor.ler_csv(conteudo, features)[0]
+        confianca, _ = model.pontuar_candidatos(df, modelo, escalonador, features, avisar=False)
+        resultados = model.montar_resultados(df['kepoi_name'], confianca)
+        func = lambda: (orjson.dumps(main.build_predictions(resultados)), pipeline.render_csv_base64(resultados))
+    elif caso == "analisar_novo_csv":
+        func = lambda: model.analisar_novo_csv(arquivo, modelo, escalonador, features)
+    elif caso == "analisar_explain":
+        func = lambda: model.analisar_novo_csv(arquivo, modelo, escalonador, features, explicar=True)
+    elif caso == "http":
+        from fastapi.testclient import TestClient
+
+        cliente = TestClient(main.app)
+        with silencio:
+            cliente.__enter__()
+
+        def func():
+            resposta = cliente.post("/predict", files={"file": ("koi.csv", conteudo, "text/csv")})
+            if resposta.status_code != 200:
+                raise RuntimeError(f"/predict respondeu {resposta.status_code}: {resposta.text[:200]}")
+    elif caso == "treino":
+        # Artefatos e cache do treino vão para um diretório temporário: o modelo em uso não é tocado
+        diretorio_treino = tempfile.TemporaryDirectory()
+        for nome in ("MODEL_PATH", "SCALER_PATH", "FEATURES_PATH", "BUNDLE_PATH", "CACHE_TREINO_PATH"):
+            setattr(model, nome, os.path.join(diretorio_treino.name, os.path.basename(getattr(model, nome))))
+
+        def func():
+            if os.path.exists(model.CACHE_TREINO_PATH):
+                os.remove(model.CACHE_TREINO_PATH)
+            model.treinar_modelo_final(arquivo, retreinar=True)
+    else:
+        raise ValueError(f"Caso desconhecido: {caso}")
+
+    rss_base = _rss_pico_mb()
+    tempos = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            func()
+            tempos.append(time.perf_counter() - inicio)
+    rss_pico = _rss_pico_mb()
+
+    if cliente is not None:
+        with silencio:
+            cliente.__exit__(None, None, None)
+    if diretorio_treino is not None:
+        diretorio_treino.cleanup()
+
+    print(json.dumps({
+        "caso": caso,
+        "linhas": linhas,
+        "segundos_min": min(tempos),
+        "segundos_mediana": float(np.median(tempos)),
+        "segundos": tempos,
+        "linhas_por_segundo": linhas / min(tempos),
+        "rss_base_mb": round(rss_base, 1),
+        "rss_pico_mb": round(rss_pico, 1),
+    }))
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecido"
+
+
+def bench_suite(tamanhos, casos, repeticoes, saida=None):
+    """Roda cada caso em cada tamanho, cada um em um processo novo, e grava o JSON dos resultados."""
+    import json
+    import platform
+    from datetime import datetime, timezone
+
+    commit = _commit_atual()
+    saida = saida or f"benchmark_{commit}.json"
+    relatorio = {
+        "commit": commit,
+        "data": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "repeticoes": repeticoes,
+        "resultados": [],
+    }
+
+    print(f"\n📏 Suíte de benchmarks (commit {commit}, {os.cpu_count()} CPUs, melhor de {repeticoes})")
+    print(f"   {'caso':<18} {'linhas':>9} {'mínimo':>11} {'mediana':>11} {'linhas/s':>11} {'RSS base':>9} {'RSS pico':>9}")
+    for linhas in tamanhos:
+        arquivo = _arquivo_sintetico(linhas)
+        for caso in casos:
+            codigo = f"import benchmark; benchmark._executar_caso({caso!r}, {arquivo!r}, {linhas}, {repeticoes})"
+            processo = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True,
+                                      cwd=os.path.dirname(os.path.abspath(__file__)))
+            if processo.returncode != 0:
+                erro = (processo.stderr.strip().splitlines() or [f"código de saída {processo.returncode}"])[-1]
+                relatorio["resultados"].append({"caso": caso, "linhas": linhas, "erro": erro})
+                print(f"   {caso:<18} {linhas:>9} ❌ {erro}")
+                continue
+            resultado = json.loads(processo.stdout.strip().splitlines()[-1])
+            relatorio["resultados"].append(resultado)
+            print(f"   {caso:<18} {linhas:>9} {resultado['segundos_min'] * 1e3:8.1f} ms "
+                  f"{resultado['segundos_mediana'] * 1e3:8.1f} ms {resultado['linhas_por_segundo']:11,.0f} "
+                  f"{resultado['rss_base_mb']:6.0f} MB {resultado['rss_pico_mb']:6.0f} MB")
+
+    with open(saida, 'w') as f:
+        json.dump(relatorio, f, indent=2)
+    print(f"   resultados em {saida}")
+
+
+def bench_comparar(base, novo, limite):
+    """Compara dois JSONs da suíte; retorna 1 se algum caso ficou mais lento que `limite` (fração)."""
+    import json
+
+    with open(base) as f:
+        antes = json.load(f)
+    with open(novo) as f:
+        depois = json.load(f)
+    indice = {(r["caso"], r["linhas"]): r for r in antes["resultados"] if "erro" not in r}
+
+    regressoes = 0
+    print(f"\n📏 {antes['commit']} -> {depois['commit']} (limite de regressão {limite:.0%})")
+    print(f"   {'caso':<18} {'linhas':>9} {'antes':>11} {'depois':>11} {'razão':>7} {'RSS antes':>10} {'RSS depois':>10}")
+    for r in depois["resultados"]:
+        anterior = indice.get((r["caso"], r["linhas"]))
+        if anterior is None or "erro" in r:
+            continue
+        razao = r["segundos_min"] / anterior["segundos_min"]
+        marca = ""
+        if razao > 1 + limite:
+            regressoes += 1
+            marca = "  ⚠️  regressão"
+        print(f"   {r['caso']:<18} {r['linhas']:>9} {anterior['segundos_min'] * 1e3:8.1f} ms "
+              f"{r['segundos_min'] * 1e3:8.1f} ms {razao:6.2f}x {anterior['rss_pico_mb']:7.0f} MB "
+              f"{r['rss_pico_mb']:7.0f} MB{marca}")
+    return 1 if regressoes else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("serializacao", help="custo por linha da montagem do JSON de resposta")
+    p.add_argument("--linhas", type=int, default=10000)
+    p.add_argument("--repeticoes", type=int, default=5)
+
+    p = sub.add_parser("microlote", help="vazão e latência de uploads pequenos com e sem micro-batching")
+    p.add_argument("--clientes", type=int, default=32)
+    p.add_argument("--requisicoes", type=int, default=2000)
+    p.add_argument("--linhas", type=int, default=5)
+
+    p = sub.add_parser("carga_modelo", help="cold start: artefatos joblib vs bundle .exob")
+    p.add_argument("--repeticoes", type=int, default=5)
+
+    p = sub.add_parser("motor", help="motor compilado vs XGBoost: latência, vazão e diferença nas probabilidades")
+    p.add_argument("--linhas", type=int, default=100000)
+    p.add_argument("--repeticoes", type=int, default=5)
+    p.add_argument("--threads", type=int, default=max(os.cpu_count() or 1, 2),
+                   help="threads do motor compilado no lote (padrão: núcleos disponíveis, no mínimo 2)")
+
+    p = sub.add_parser("treino", help="pré-processamento do treino com e sem cache .npz")
+    p.add_argument("--arquivo", default=CSV_EXEMPLO)
+    p.add_argument("--repeticoes", type=int, default=3)
+
+    p = sub.add_parser("ajuste", help="busca de hiperparâmetros com validação cruzada: sequencial vs paralela")
+    p.add_argument("--arquivo", default=CSV_EXEMPLO)
+    p.add_argument("--folds", type=int, default=5)
+    p.add_argument("--threads", type=int, default=os.cpu_count() or 1,
+                   help="threads da busca paralela (padrão: núcleos disponíveis, no mínimo 2)")
+
+    p = sub.add_parser("cache", help="cache de predições: frio, quente e sobreposição parcial")
+    p.add_argument("--repeticoes", type=int, default=5)
+
+    p = sub.add_parser("lote", help="muitos CSVs: um /predict por arquivo vs /predict/batch")
+    p.add_argument("--arquivos", type=int, default=100)
+    p.add_argument("--linhas", type=int, default=50)
+    p.add_argument("--repeticoes", type=int, default=3)
+
+    p = sub.add_parser("json", help="latência de poucos candidatos: /predict com CSV vs /predict/json")
+    p.add_argument("--requisicoes", type=int, default=2000)
+    p.add_argument("--candidatos", type=int, default=1)
+
+    p = sub.add_parser("explicar", help="custo de explain=true: contribuições SHAP vs só a pontuação")
+    p.add_argument("--tamanhos", default="1000,100000", help="linhas dos CSVs sintéticos, separadas por vírgula")
+    p.add_argument("--repeticoes", type=int, default=3)
+
+    p = sub.add_parser("leitor", help="leitura de um CSV grande: leitor antigo vs projetado (C e pyarrow)")
+    p.add_argument("--linhas", type=int, default=1000000)
+    p.add_argument("--repeticoes", type=int, default=3)
+
+    p = sub.add_parser("formatos", help="upload em CSV vs Parquet, Arrow IPC e .npy")
+    p.add_argument("--linhas", type=int, default=100000)
+    p.add_argument("--repeticoes", type=int, default=3)
+
+    p = sub.add_parser("suite", help="suíte completa (parse, score, serialize, analisar_novo_csv, HTTP, treino) com JSON")
+    p.add_argument("--tamanhos", default=",".join(map(str, TAMANHOS_SUITE)),
+                   help="linhas dos CSVs sintéticos, separadas por vírgula")
+    p.add_argument("--casos", default=",".join(CASOS_SUITE), help=f"casos, separados por vírgula (opcionais: {','.join(CASOS_EXPLAIN)})")
+    p.add_argument("--repeticoes", type=int, default=3)
+    p.add_argument("--saida", help="arquivo JSON (padrão: benchmark_<commit>.json)")
+
+    p = sub.add_parser("comparar", help="compara dois JSONs da suíte e acusa regressões")
+    p.add_argument("base")
+    p.add_argument("novo")
+    p.add_argument("--limite", type=float, default=0.10, help="fração de aumento de tempo tolerada")
+
+    args = parser.parse_args()
+    if args.bench == "serializacao":
+        bench_serializacao(args.linhas, args.repeticoes)
+    elif args.bench == "microlote":
+        bench_microlote(args.clientes, args.requisicoes, args.linhas)
+    elif args.bench == "carga_modelo":
+        bench_carga_modelo(args.repeticoes)
+    elif args.bench == "motor":
+        bench_motor(args.linhas, args.repeticoes, args.threads)
+    elif args.bench == "treino":
+        bench_treino(args.arquivo, args.repeticoes)
+    elif args.bench == "ajuste":
+        bench_ajuste(args.arquivo, args.folds, args.threads)
+    elif args.bench == "cache":
+        bench_cache(args.repeticoes)
+    elif args.bench == "lote":
+        bench_lote(args.arquivos, args.linhas, args.repeticoes)
+    elif args.bench == "json":
+        bench_json(args.requisicoes, args.candidatos)
+    elif args.bench == "explicar":
+        bench_explicar([int(n) for n in args.tamanhos.split(",")], args.repeticoes)
+    elif args.bench == "leitor":
+        bench_leitor(args.linhas, args.repeticoes)
+    elif args.bench == "formatos":
+        bench_formatos(args.linhas, args.repeticoes)
+    elif args.bench == "suite":
+        bench_suite([int(n) for n in args.tamanhos.split(",")], args.casos.split(","), args.repeticoes, args.saida)
+    elif args.bench == "comparar":
+        sys.exit(bench_comparar(args.base, args.novo, args.limite))
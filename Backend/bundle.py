@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+Bundle único e versionado do modelo (arquivo .exob).
+
+Substitui os três arquivos joblib (modelo, scaler e features) por um único
+arquivo que é aberto com mmap, sem unpickling:
+
+    8 bytes   assinatura b"EXOBUNDL"
+    4 bytes   versão do formato (uint32 little-endian)
+    4 bytes   tamanho do cabeçalho JSON (uint32 little-endian)
+    N bytes   cabeçalho JSON (features, metadados e offsets das seções)
+    ...       seções binárias, cada uma alinhada em 64 bytes
+
+Seções: `media` e `escala` do StandardScaler (float64), que viram o
+EscalonadorFundido, `mediana` (float64, medianas das features no treino,
+usadas na imputação; obrigatória), `booster`, o XGBoost no
+formato nativo UBJSON, e `arvores_*`, as tabelas do motor compilado
+(arvores.py), quando o modelo cabe nele.
+
+Os arrays (escalonador e tabelas do motor compilado) são views do mmap: as
+páginas ficam no page cache e são compartilhadas entre os workers do
+uvicorn. O booster não: o XGBoost o copia para a memória de cada processo.
+Com EXO_MOTOR_INFERENCIA=compilado o modelo servido são as próprias
+tabelas mapeadas e o booster só é lido se for preciso (contribuições).
+
+Para converter os artefatos joblib existentes (o dataset de treino só é
+lido se o escalonador não tiver as medianas):
+    python bundle.py converter [--saida modelo_exoplanetas.exob] [--versao v1.0.0] [--dataset CSV]
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+
+import arvores
+
+ASSINATURA = b"EXOBUNDL"
+VERSAO_FORMATO = 1
+# Versão do modelo gravada quando nenhuma é informada
+VERSAO_PADRAO = "v1.0.0"
+ALINHAMENTO = 64
+_PREAMBULO = struct.Struct("<8sII")
+
+# `compilado`: ModeloCompilado sobre as tabelas mapeadas, ou None se o bundle não as tem
+Bundle = namedtuple("Bundle", "modelo escalonador features metadados compilado")
+
+
+class EscalonadorFundido:
+    """
+    Padronização (x - média) / escala com os parâmetros do StandardScaler
+    gravados no bundle. Mesma aritmética do `StandardScaler.transform`,
+    sem depender do scikit-learn nem de pickle.
+    """
+
+    def __init__(self, mean, scale, features, medianas=None):
+        self.mean_ = mean
+        self.scale_ = scale
+        self.medianas_ = medianas
+        self.feature_names_in_ = np.asarray(features, dtype=object)
+        self.n_features_in_ = len(features)
+
+    def transform(self, X):
+        X = np.array(X, copy=True)
+        if X.dtype not in (np.float32, np.float64):
+            X = X.astype(np.float64)
+        X -= self.mean_.astype(X.dtype, copy=False)
+        X /= self.scale_.astype(X.dtype, copy=False)
+        return X
+
+
+class ModeloBooster:
+    """
+    xgboost.Booster com a interface de predição do XGBClassifier
+    (`predict_proba` e `get_booster`), sem o wrapper do scikit-learn. Usa
+    as árvores até a melhor iteração, como o XGBClassifier.
+    """
+
+    def __init__(self, booster):
+        self.booster = booster
+        melhor_iteracao = booster.attr("best_iteration")
+        self._arvores = (0, int(melhor_iteracao) + 1) if melhor_iteracao is not None else (0, 0)
+
+    def get_booster(self):
+        return self.booster
+
+    def predict_proba(self, X):
+        p = self.booster.inplace_predict(X, iteration_range=self._arvores, missing=np.nan)
+        return np.column_stack([1 - p, p])
+
+
+def _alinhar(posicao):
+    return (posicao + ALINHAMENTO - 1) // ALINHAMENTO * ALINHAMENTO
+
+
+def _booster_ubj(modelo):
+    """Serializa o booster do XGBClassifier no formato nativo UBJSON."""
+    return bytes(modelo.get_booster().save_raw(raw_format="ubj"))
+
+
+def _tabelas_compiladas(modelo):
+    """ModeloCompilado do modelo, ou None se ele não cabe no motor compilado."""
+    try:
+        return arvores.ModeloCompilado.de_booster(modelo)
+    except ValueError:
+        return None
+
+
+def salvar_bundle(caminho, modelo, escalonador, features, versao_modelo=VERSAO_PADRAO, metadados=None):
+    """
+    Grava o bundle de forma atômica (arquivo temporário + os.replace), para que
+    workers que estejam iniciando nunca leiam um arquivo pela metade.
+    """
+    if getattr(escalonador, "medianas_", None) is None:
+        raise ValueError("O escalonador não tem as medianas do treino (medianas_), necessárias no bundle")
+    secoes = {
+        "media": np.ascontiguousarray(escalonador.mean_, dtype="<f8"),
+        "escala": np.ascontiguousarray(escalonador.scale_, dtype="<f8"),
+        "mediana": np.ascontiguousarray(escalonador.medianas_, dtype="<f8"),
+    }
+    secoes["booster"] = _booster_ubj(modelo)
+
+    cabecalho = {
+        "versao_modelo": versao_modelo,
+        "criado_em": datetime.utcnow().isoformat() + "Z",
+        "features": list(features),
+        "metadados": metadados or {},
+        "secoes": {},
+    }
+
+    compilado = _tabelas_compiladas(modelo)
+    if compilado is not None:
+        for nome in compilado.TABELAS:
+            tabela = getattr(compilado, nome)
+            secoes["arvores_" + nome] = np.ascontiguousarray(tabela, dtype=tabela.dtype.newbyteorder("<"))
+        cabecalho["motor_compilado"] = {"margem_base": float(compilado.margem_base),
+                                        "n_features": compilado.n_features}
+
+    # Offsets dependem do tamanho do cabeçalho, que depende dos offsets:
+    # reserva espaço com folga e recalcula até estabilizar.
+    reserva = 0
+    while True:
+        posicao = _alinhar(_PREAMBULO.size + reserva)
+        for nome, dados in secoes.items():
+            info = {"offset": posicao, "tamanho": len(dados) if isinstance(dados, bytes) else dados.nbytes}
+            if isinstance(dados, np.ndarray):
+                info.update(dtype=dados.dtype.str, shape=list(dados.shape))
+            else:
+                info["formato"] = "ubj"
+            cabecalho["secoes"][nome] = info
+            posicao = _alinhar(posicao + info["tamanho"])
+        cabecalho_bytes = json.dumps(cabecalho, ensure_ascii=False).encode("utf-8")
+        if len(cabecalho_bytes) <= reserva:
+            break
+        reserva = len(cabecalho_bytes) + 256
+
+    diretorio = os.path.dirname(os.path.abspath(caminho))
+    fd, caminho_tmp = tempfile.mkstemp(dir=diretorio, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_PREAMBULO.pack(ASSINATURA, VERSAO_FORMATO, reserva))
+            f.write(cabecalho_bytes.ljust(reserva, b" "))
+            for nome, dados in secoes.items():
+                f.seek(cabecalho["secoes"][nome]["offset"])
+                f.write(dados if isinstance(dados, bytes) else dados.tobytes())
+        os.chmod(caminho_tmp, 0o644)
+        os.replace(caminho_tmp, caminho)
+    except BaseException:
+        os.unlink(caminho_tmp)
+        raise
+    return caminho
+
+
+def ler_cabecalho(mm):
+    """Valida a assinatura/versão e retorna o cabeçalho JSON do bundle."""
+    assinatura, versao, tamanho = _PREAMBULO.unpack_from(mm, 0)
+    if assinatura != ASSINATURA:
+        raise ValueError("Arquivo não é um bundle de modelo (.exob)")
+    if versao > VERSAO_FORMATO:
+        raise ValueError(f"Bundle na versão de formato {versao}; este código lê até a {VERSAO_FORMATO}")
+    return json.loads(bytes(mm[_PREAMBULO.size:_PREAMBULO.size + tamanho]))
+
+
+def ler_versao(caminho):
+    """Versão do modelo gravada no bundle, sem carregar o modelo."""
+    with open(caminho, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return ler_cabecalho(mm)["versao_modelo"]
+
+
+def _array(mm, info):
+    contagem = int(np.prod(info["shape"]))
+    return np.frombuffer(mm, dtype=info["dtype"], count=contagem, offset=info["offset"]).reshape(info["shape"])
+
+
+def _carregar_booster(mm, info):
+    import xgboost
+
+    booster = xgboost.Booster()
+    booster.load_model(bytearray(mm[info["offset"]:info["offset"] + info["tamanho"]]))
+    return booster
+
+
+def carregar_bundle(caminho, motor="xgboost"):
+    """
+    Abre o bundle com mmap e retorna Bundle(modelo, escalonador, features, metadados, compilado).
+    `metadados` inclui `versao_modelo` e `criado_em`.
+
+    Com motor="compilado" e as tabelas no bundle, `modelo` é o próprio
+    `compilado` e o XGBoost não é importado; senão `modelo` é o booster em
+    um ModeloBooster. O scikit-learn nunca é usado (mas o pacote xgboost o
+    importa, quando instalado).
+    """
+    with open(caminho, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    cabecalho = ler_cabecalho(mm)
+    secoes = cabecalho["secoes"]
+    features = cabecalho["features"]
+
+    if "mediana" not in secoes:
+        raise ValueError(
+            f"Bundle {caminho} sem as medianas do treino (gerado por uma versão antiga): "
+            "regenere com python bundle.py converter --dataset CSV"
+        )
+    escalonador = EscalonadorFundido(_array(mm, secoes["media"]), _array(mm, secoes["escala"]), features,
+                                     _array(mm, secoes["mediana"]))
+
+    modelo = None
+    if motor != "compilado" or "motor_compilado" not in cabecalho:
+        modelo = ModeloBooster(_carregar_booster(mm, secoes["booster"]))
+
+    compilado = None
+    if "motor_compilado" in cabecalho:
+        tabelas = [_array(mm, secoes["arvores_" + nome]) for nome in arvores.ModeloCompilado.TABELAS]
+        compilado = arvores.ModeloCompilado(
+            *tabelas, cabecalho["motor_compilado"]["margem_base"], cabecalho["motor_compilado"]["n_features"],
+            booster=modelo.get_booster() if modelo is not None else None,
+            carregar_booster=lambda: _carregar_booster(mm, secoes["booster"]),
+        )
+        if modelo is None:
+            modelo = compilado
+
+    metadados = dict(cabecalho.get("metadados", {}))
+    metadados.update(versao_modelo=cabecalho["versao_modelo"], criado_em=cabecalho["criado_em"])
+    return Bundle(modelo, escalonador, features, metadados, compilado)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    import model
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p = sub.add_parser("converter", help="gera o bundle a partir dos artefatos joblib")
+    p.add_argument("--saida", default=model.BUNDLE_PATH)
+    p.add_argument("--versao", default=VERSAO_PADRAO)
+    p.add_argument("--dataset", default=model.DATASET_PATH,
+                   help="CSV de treino, para recalcular as medianas de artefatos antigos (padrão: dataset da NASA)")
+    args = parser.parse_args()
+
+    caminho = model.exportar_bundle(args.saida, args.versao, args.dataset)
+    print(f"✅ Bundle salvo em: {caminho} ({os.path.getsize(caminho) / 1024:.1f} KiB)")
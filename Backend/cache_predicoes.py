@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Cache LRU de predições por vetor de features.
+
+A chave é (versão do modelo, hash do vetor de features já preenchido): um
+candidato que aparece de novo, em qualquer upload, não passa pelo
+escalonador nem pelo modelo. A versão é uma impressão digital do conteúdo
+do modelo e do escalonador. Versões servidas lado a lado (ver
+model_registry.py) dividem o mesmo limite de entradas, cada uma com as suas;
+a versão usada há mais tempo perde entradas primeiro, e as de um modelo que
+deixa de ser servido são descartadas.
+"""
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import metricas
+
+
+class CachePredicoes:
+    """
+    Até `max_entradas` probabilidades, indexadas pelo hash de 64 bits da
+    linha. `max_entradas=0` desliga o cache.
+    """
+
+    def __init__(self, max_entradas):
+        self.max_entradas = max_entradas
+        self.hits = 0
+        self.misses = 0
+        self.invalidacoes = 0
+        self._total = 0
+        # versão -> OrderedDict(hash da linha -> probabilidade), da versão usada há mais tempo para a mais recente
+        self._entradas = OrderedDict()
+        self._versoes = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def versao(self, modelo, escalonador):
+        """Impressão digital de (modelo, escalonador), calculada uma vez por objeto."""
+        memo = self._versoes.get(modelo)
+        if memo is not None and memo[0] is escalonador:
+            return memo[1]
+
+        h = hashlib.sha256()
+        if hasattr(modelo, "get_booster"):
+            h.update(bytes(modelo.get_booster().save_raw(raw_format="ubj")))
+        else:
+            for valor in vars(modelo).values():
+                if isinstance(valor, np.ndarray):
+                    h.update(valor.tobytes())
+        for nome in ("mean_", "scale_"):
+            h.update(np.asarray(getattr(escalonador, nome)).tobytes())
+        versao = h.hexdigest()[:16]
+        self._versoes[modelo] = (escalonador, versao)
+        return versao
+
+    def pontuar(self, X, versao, pontuar_fn):
+        """
+        Probabilidades para as linhas de X (ndarray 2D): as que estão no cache
+        vêm de lá, as outras são pontuadas de uma vez por `pontuar_fn(X_faltantes)`
+        e guardadas. A ordem das linhas é preservada.
+        """
+        if self.max_entradas <= 0 or len(X) == 0:
+            return pontuar_fn(X)
+
+        with metricas.etapa("cache"):
+            hashes = pd.util.hash_pandas_object(pd.DataFrame(X), index=False).to_numpy()
+            chaves = hashes.tolist()
+            with self._lock:
+                entradas = self._entradas.get(versao)
+                if entradas is None:
+                    entradas = self._entradas[versao] = OrderedDict()
+                self._entradas.move_to_end(versao)
+                # -1 marca as linhas fora do cache (probabilidades nunca são negativas)
+                confianca = np.array([entradas.get(k, -1.0) for k in chaves], dtype=np.float32)
+                faltando = confianca < 0
+                for k in hashes[~faltando].tolist():
+                    entradas.move_to_end(k)
+
+        n_faltando = int(faltando.sum())
+        if n_faltando == len(chaves):
+            confianca = pontuar_fn(X)
+        elif n_faltando:
+            confianca[faltando] = pontuar_fn(X[faltando])
+
+        with metricas.etapa("cache"), self._lock:
+            self.hits += len(chaves) - n_faltando
+            self.misses += n_faltando
+            # Versão descartada durante a pontuação: o resultado não é guardado
+            if n_faltando and self._entradas.get(versao) is entradas:
+                antes = len(entradas)
+                entradas.update(zip(hashes[faltando].tolist(), confianca[faltando].tolist()))
+                self._total += len(entradas) - antes
+                self._liberar()
+        return confianca
+
+    def _liberar(self):
+        """Remove as entradas mais antigas, começando pela versão usada há mais tempo."""
+        while self._total > self.max_entradas:
+            versao, entradas = next(iter(self._entradas.items()))
+            if entradas:
+                entradas.popitem(last=False)
+                self._total -= 1
+            if not entradas:
+                del self._entradas[versao]
+
+    def descartar(self, versao):
+        """Remove as entradas de uma versão que não é mais servida."""
+        with self._lock:
+            entradas = self._entradas.pop(versao, None)
+            if entradas:
+                self._total -= len(entradas)
+                self.invalidacoes += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": self._total,
+            "max_entries": self.max_entradas,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "invalidations": self.invalidacoes,
+            "model_versions": list(self._entradas)
+        }
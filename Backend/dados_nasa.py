@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Atualização do dataset Kepler (tabela `cumulative`) a partir do serviço
+TAP do NASA Exoplanet Archive.
+
+Só as colunas usadas pelo modelo são pedidas ao TAP, e a resposta é
+gravada em disco em blocos, sem passar inteira pela memória. A nova cópia
+é comparada com a local por `kepoi_name`: linhas novas, removidas ou com
+algum valor alterado. Se nada mudou, o arquivo local não é tocado (mesmo
+mtime e mesmo sha256), o cache de treino continua válido e não há o que
+retreinar (`python model.py --atualizar-dataset` para por aí).
+
+A comparação é só um relatório de mudanças: quando algo mudou, a tabela
+inteira substitui a cópia local e o modelo é retreinado do zero sobre ela.
+O XGBoost não atualiza árvores já treinadas linha a linha, e a divisão
+treino/teste, o escalonador e as medianas dependem do dataset inteiro.
+
+A tabela cumulative não tem coluna de data de atualização por linha; a
+comparação usa um hash dos valores de cada linha, o que detecta qualquer
+atualização nas colunas que o modelo usa e ignora as demais.
+
+A URL do serviço vem de EXO_ARCHIVE_TAP_URL, para rodar contra um
+servidor HTTP local sem rede.
+"""
+import os
+
+import pandas as pd
+import requests
+
+TAP_URL = os.getenv("EXO_ARCHIVE_TAP_URL", "https://exoplanetarchive.ipac.caltech.edu/TAP/sync")
+TABELA = "cumulative"
+
+# Bytes gravados por vez durante o download
+TAMANHO_BLOCO_DOWNLOAD = 1 << 20
+
+
+def montar_consulta(colunas, tabela=TABELA):
+    """Consulta ADQL com só as colunas pedidas (todas, se `colunas` for vazio)."""
+    return f"select {','.join(colunas) if colunas else '*'} from {tabela}"
+
+
+def baixar_em_blocos(destino, colunas, url=None, timeout=60):
+    """
+    Baixa o resultado da consulta TAP em CSV direto para `destino`, em blocos.
+    Retorna o número de bytes gravados.
+    """
+    params = {"query": montar_consulta(colunas), "format": "csv"}
+    total = 0
+    with requests.get(url or TAP_URL, params=params, stream=True, timeout=timeout) as resposta:
+        resposta.raise_for_status()
+        with open(destino, 'wb') as f:
+            for bloco in resposta.iter_content(chunk_size=TAMANHO_BLOCO_DOWNLOAD):
+                f.write(bloco)
+                total += len(bloco)
+    return total
+
+
+def _hashes_por_linha(caminho, colunas):
+    """Hash dos valores de cada linha, indexado por kepoi_name."""
+    df = pd.read_csv(caminho, comment='#', usecols=lambda col: col in colunas, dtype={'kepoi_name': str})
+    if 'kepoi_name' not in df.columns:
+        raise ValueError(f"{caminho} não tem a coluna 'kepoi_name'")
+    df = df.drop_duplicates('kepoi_name', keep='last').set_index('kepoi_name')
+    # Mesma ordem de colunas dos dois lados, para os hashes serem comparáveis
+    df = df[sorted(df.columns)]
+    return pd.util.hash_pandas_object(df, index=False), set(df.columns)
+
+
+def atualizar_dataset(caminho, colunas, url=None):
+    """
+    Substitui `caminho` pela versão atual da tabela no archive, se ela mudou.
+
+    Retorna o relatório da mudança: os `kepoi_name` novos, alterados e
+    removidos e `arquivo_alterado` (False quando a cópia local já estava em
+    dia). As linhas listadas não são aplicadas uma a uma: o arquivo é
+    trocado inteiro.
+    """
+    colunas = list(dict.fromkeys(['kepoi_name'] + list(colunas)))
+    caminho_tmp = caminho + ".download"
+    try:
+        tamanho = baixar_em_blocos(caminho_tmp, colunas, url)
+        print(f"   Recebidos {tamanho / 1024:.0f} KiB ({len(colunas)} colunas)")
+
+        novos, colunas_novas = _hashes_por_linha(caminho_tmp, set(colunas))
+        if os.path.exists(caminho):
+            try:
+                antigos, colunas_antigas = _hashes_por_linha(caminho, colunas_novas | {'kepoi_name'})
+            except (ValueError, pd.errors.ParserError) as e:
+                print(f"⚠️  Cópia local ilegível ({e}); substituindo")
+                antigos, colunas_antigas = pd.Series(dtype='uint64'), set()
+        else:
+            antigos, colunas_antigas = pd.Series(dtype='uint64'), set()
+
+        comuns = novos.index.intersection(antigos.index)
+        diferenca = {
+            "novas": novos.index.difference(antigos.index).tolist(),
+            "alteradas": comuns[novos.loc[comuns].to_numpy() != antigos.loc[comuns].to_numpy()].tolist(),
+            "removidas": antigos.index.difference(novos.index).tolist(),
+        }
+
+        mudou = any(diferenca.values()) or colunas_antigas != colunas_novas
+        if mudou:
+            os.replace(caminho_tmp, caminho)
+    finally:
+        if os.path.exists(caminho_tmp):
+            os.remove(caminho_tmp)
+
+    diferenca["arquivo_alterado"] = mudou
+    return diferenca
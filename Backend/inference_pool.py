@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Pool de execução para o trabalho pesado do /predict, fora do event loop.
+
+Limita quantas tarefas podem estar rodando ou esperando ao mesmo tempo:
+quando `workers + queue_depth` tarefas estão pendentes, novas chamadas
+falham na hora com PoolSaturatedError (HTTP 429 na API) em vez de
+acumular memória e latência. Trabalho já aceito em partes (os blocos
+seguintes de um /predict/stream) usa `run_waiting`, que espera a vaga.
+"""
+import asyncio
+import collections
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class PoolSaturatedError(RuntimeError):
+    """Todas as vagas do pool (execução + fila) estão ocupadas."""
+
+
+class InferencePool:
+    """
+    Pool de threads ou de processos com fila limitada.
+
+    kind="thread" compartilha o modelo já carregado (pandas, scikit-learn e
+    XGBoost liberam o GIL nas partes pesadas). kind="process" isola cada
+    worker em um processo, que carrega o próprio modelo via `initializer`.
+    """
+
+    def __init__(self, kind="thread", workers=None, queue_depth=16, initializer=None):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Tipo de pool inválido: {kind!r} (use 'thread' ou 'process')")
+
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_depth = queue_depth
+        self.pending = 0
+        self.rejected = 0
+        # Futures de quem espera uma vaga em `run_waiting`, na ordem de chegada
+        self._waiting = collections.deque()
+
+        if kind == "process":
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=initializer)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inferencia")
+
+    @property
+    def capacity(self):
+        return self.workers + self.queue_depth
+
+    async def run(self, func, *args, **kwargs):
+        """Executa func(*args, **kwargs) no pool ou levanta PoolSaturatedError."""
+        # Só é chamado do event loop, então o contador não precisa de lock
+        if self.pending >= self.capacity:
+            self.rejected += 1
+            raise PoolSaturatedError(
+                f"Pool saturado ({self.pending} tarefas pendentes, capacidade {self.capacity})"
+            )
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+        finally:
+            self.pending -= 1
+            # Acorda o próximo que espera vaga (o primeiro que ainda não desistiu)
+            while self._waiting:
+                vaga = self._waiting.popleft()
+                if not vaga.done():
+                    vaga.set_result(None)
+                    break
+
+    async def run_waiting(self, func, *args, **kwargs):
+        """Como `run`, mas espera uma vaga em vez de levantar PoolSaturatedError."""
+        while self.pending >= self.capacity:
+            vaga = asyncio.get_running_loop().create_future()
+            self._waiting.append(vaga)
+            await vaga
+        return await self.run(func, *args, **kwargs)
+
+    def stats(self):
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "pending": self.pending,
+            "waiting": len(self._waiting),
+            "rejected": self.rejected
+        }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -1,12 +1,26 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import Body, FastAPI, File, Query, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import create_model
+from typing import List, Literal, Optional, Union
+import asyncio
 import pandas as pd
-import io
-import csv
-import base64
+import numpy as np
+import orjson
+import os
+import time
+import codecs
 from datetime import datetime
 import model
+import arvores
+import leitor
+import metricas
+import pipeline
+from inference_pool import InferencePool, PoolSaturatedError
+from micro_batcher import MicroBatcher
+from model_registry import ModelRegistry, ModelUnavailableError
+from result_store import ResultStore, iter_csv
 
 app = FastAPI(title="Exoplanet Prediction API")
 
@@ -16,19 +30,63 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
 ALLOWED_CONTENT_TYPES = {"text/csv", "application/vnd.ms-excel", "text/plain"}
 
-# Variáveis globais para o modelo
-modelo_final = None
-escalonador_final = None
-features_usadas = None
+# Bytes lidos do início do upload para detectar encoding e delimitador no modo streaming
+SNIFF_BYTES = 64 * 1024
+
+# Limite de memória para resultados guardados para download (csv_mode=link)
+RESULT_STORE_MAX_BYTES = int(os.environ.get("EXO_RESULT_STORE_MB", "256")) * 1024 * 1024
+result_store = ResultStore(RESULT_STORE_MAX_BYTES)
+
+# Pool que roda leitura + pontuação fora do event loop (ver inference_pool.py)
+POOL_KIND = os.environ.get("EXO_POOL_KIND", "thread")
+POOL_WORKERS = int(os.environ.get("EXO_POOL_WORKERS", "0")) or os.cpu_count() or 1
+POOL_QUEUE_DEPTH = int(os.environ.get("EXO_POOL_QUEUE_DEPTH", "16"))
+inference_pool = None
+
+# Micro-batching de uploads pequenos (ver micro_batcher.py); EXO_MICROBATCH_MAX_UPLOAD_KB=0 desliga
+MICROBATCH_MAX_UPLOAD_BYTES = int(os.environ.get("EXO_MICROBATCH_MAX_UPLOAD_KB", "64")) * 1024
+MICROBATCH_MAX_ROWS = int(os.environ.get("EXO_MICROBATCH_MAX_ROWS", "512"))
+MICROBATCH_WAIT_MS = float(os.environ.get("EXO_MICROBATCH_WAIT_MS", "2"))
+micro_batcher = None
+
+# /predict/batch: máximo de CSVs por requisição e tamanho máximo de cada um (descompactado)
+BATCH_MAX_FILES = int(os.environ.get("EXO_BATCH_MAX_FILES", "1000"))
+BATCH_MAX_FILE_BYTES = int(os.environ.get("EXO_BATCH_MAX_FILE_MB", "64")) * 1024 * 1024
+# Soma dos CSVs do lote (descompactados) e taxa máxima de compressão de um ZIP/tar.gz (0 desliga)
+BATCH_MAX_TOTAL_BYTES = int(os.environ.get("EXO_BATCH_MAX_TOTAL_MB", "512")) * 1024 * 1024
+BATCH_MAX_RATIO = float(os.environ.get("EXO_BATCH_MAX_RATIO", "100"))
+
+# /predict/json: máximo de candidatos por requisição (pontuados no próprio event loop)
+JSON_MAX_CANDIDATES = int(os.environ.get("EXO_JSON_MAX_CANDIDATES", "64"))
+
+# Esquema de um candidato no /predict/json, montado uma vez: as features do modelo
+# (ausente ou null = valor faltante) e o nome opcional
+Candidate = create_model(
+    "Candidate",
+    kepoi_name=(Optional[str], None),
+    **{feature: (Optional[float], None) for feature in model.FEATURES_MODELO}
+)
+# Matriz de features reaproveitada pelo /predict/json (só é usada dentro do event loop)
+json_buffer = np.empty((JSON_MAX_CANDIDATES, len(model.FEATURES_MODELO)))
+
+# Tempo por etapa (GET /metrics); EXO_SERVER_TIMING=1 também manda os tempos no header Server-Timing
+SERVER_TIMING = os.environ.get("EXO_SERVER_TIMING", "0") == "1"
+registro_metricas = metricas.Registro()
+
+# Modelos servidos (ver model_registry.py): o ativo e as versões de EXO_MODEL_DIR,
+# verificados no disco a cada EXO_MODEL_RELOAD_S segundos (0 desliga a verificação periódica)
+MODEL_RELOAD_S = float(os.environ.get("EXO_MODEL_RELOAD_S", "5"))
+model_registry = None
 
 # --- Treina o modelo uma vez ao iniciar o app ---
 @app.on_event("startup")
 async def startup_event():
-    global modelo_final, escalonador_final, features_usadas
+    global model_registry, inference_pool, micro_batcher
     
     print("\n" + "=" * 70)
     print("🚀 INICIANDO SERVIDOR - EXOPLANET PREDICTION API")
@@ -36,7 +94,21 @@ async def startup_event():
     
     try:
         print("\n🔄 Carregando/treinando modelo de Machine Learning...")
-        modelo_final, escalonador_final, features_usadas = model.treinar_modelo_final()
+        model_registry = ModelRegistry(model.BUNDLE_PATH, model.MODELOS_DIR, MODEL_RELOAD_S)
+        ativo = model_registry.carregar_inicial()
+        inference_pool = InferencePool(
+            POOL_KIND,
+            POOL_WORKERS,
+            POOL_QUEUE_DEPTH,
+            initializer=pipeline.init_worker if POOL_KIND == "process" else None
+        )
+        print(f"⚙️  Pool de inferência: {POOL_KIND}, {inference_pool.workers} workers, fila {POOL_QUEUE_DEPTH}")
+        if MICROBATCH_MAX_UPLOAD_BYTES > 0:
+            micro_batcher = MicroBatcher(score_matrix, MICROBATCH_MAX_ROWS, MICROBATCH_WAIT_MS)
+            print(f"⚙️  Micro-batching: até {MICROBATCH_MAX_ROWS} linhas ou {MICROBATCH_WAIT_MS} ms por lote")
+        model_registry.iniciar()
+        outras = [v["version"] for v in model_registry.versoes() if not v["active"]]
+        print(f"🗂️  Modelo ativo: {ativo.versao}; outras versões: {', '.join(outras) or 'nenhuma'} ({model.MODELOS_DIR})")
         print("\n✅ SERVIDOR PRONTO!")
         print("=" * 70)
     except Exception as e:
@@ -44,104 +116,308 @@ async def startup_event():
         print("\n⚠️  O servidor vai iniciar, mas o endpoint /predict NÃO funcionará!")
         print("⚠️  Verifique os logs acima para mais detalhes.")
         print("=" * 70)
-        modelo_final, escalonador_final, features_usadas = None, None, None
+        if model_registry is not None:
+            model_registry.shutdown()
+        model_registry = None
 
-def detect_separator(sample: str) -> str:
-    """Detecta o delimitador do CSV; fallback para vírgula."""
+@app.on_event("shutdown")
+async def shutdown_event():
+    if inference_pool is not None:
+        inference_pool.shutdown(wait=False)
+    if micro_batcher is not None:
+        micro_batcher.shutdown()
+    if model_registry is not None:
+        model_registry.shutdown()
+
+def served_model(version=None):
+    """
+    Modelo usado pela requisição: o ativo ou a versão pedida em ?model=.
+    A requisição usa essa referência até o fim, mesmo que o ativo seja trocado no meio.
+    """
+    if model_registry is None or model_registry.ativo is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Modelo não está carregado. Verifique os logs do servidor e reinicie."
+        )
     try:
-        dialect = csv.Sniffer().sniff(sample)
-        return dialect.delimiter
-    except Exception:
-        return ","
+        return model_registry.obter(version)
+    except KeyError:
+        disponiveis = ", ".join(v["version"] for v in model_registry.versoes())
+        raise HTTPException(status_code=404, detail=f"Versão de modelo '{version}' não encontrada. Disponíveis: {disponiveis}")
+
+def model_metadata(servido):
+    """Versão do modelo usado e acurácia dele no conjunto de teste (None se não foi medida)."""
+    acuracia = servido.metadados.get("acuracia")
+    return {
+        "modelVersion": servido.versao,
+        "accuracy": round(acuracia, 4) if acuracia is not None else None
+    }
+
+def score_matrix(X, servido=None):
+    """Probabilidades para uma matriz de features já preenchida (usado pelo micro-batcher)."""
+    servido = servido or model_registry.ativo
+    return model.pontuar_candidatos(X, servido.modelo, servido.escalonador, servido.features)[0]
+
+async def analyze_small_upload(content_bytes, filename, servido, content_type=None, cronometro=None):
+    """Uploads pequenos: leitura no pool, pontuação em lote junto com outras requisições."""
+    cronometro = cronometro or metricas.Cronometro()
+    (ids, X), tempos = await inference_pool.run(
+        metricas.com_tempos, pipeline.preparar_upload, content_bytes, filename, servido.features,
+        model.medianas_do_treino(servido.escalonador), content_type
+    )
+    cronometro.somar(tempos)
+    # Espera pelo lote + escalonamento e modelo do lote inteiro
+    with cronometro.etapa("microbatch"):
+        confianca = await micro_batcher.score(X, servido)
+    return model.montar_resultados(ids, confianca)
+
+def registrar_metricas(resposta, endpoint, cronometro, linhas, inicio):
+    """Acumula os tempos da requisição em /metrics e, se ligado, no header Server-Timing."""
+    total = time.perf_counter() - inicio
+    registro_metricas.registrar(endpoint, cronometro.tempos, linhas, total)
+    if SERVER_TIMING:
+        resposta.headers["Server-Timing"] = metricas.server_timing(cronometro.tempos, total)
+    return resposta
+
+def sniff_upload(arquivo):
+    """
+    Lê só o início do upload para detectar encoding e delimitador,
+    ignorando o bloco de comentários (#). Volta o arquivo para o início.
+    """
+    amostra = arquivo.read(SNIFF_BYTES)
+    arquivo.seek(0)
+
+    encoding = "utf-8"
+    try:
+        # final=False tolera um caractere multibyte cortado no fim da amostra
+        texto = codecs.getincrementaldecoder("utf-8")().decode(amostra, final=False)
+    except UnicodeDecodeError:
+        encoding = "latin-1"
+        texto = amostra.decode("latin-1")
+
+    data_lines = [line for line in texto.split('\n') if not line.strip().startswith('#')]
+    sep = leitor.detectar_separador('\n'.join(data_lines)[:2048])
+    return sep, encoding
+
+def build_predictions(resultados, orient="records", inicio=0):
+    """
+    Monta a lista de predições a partir das colunas do DataFrame de resultados,
+    sem iterar linha a linha no pandas.
+
+    orient="records" gera [{"id", "name", "percent", "status"}, ...];
+    orient="columns" gera {"id": [...], "name": [...], "percent": [...], "status": [...]}.
+
+    Se os resultados têm as colunas de contribuição (explain=true), cada
+    predição ganha "contributions": {feature: log-odds, ..., "base": ...}
+    (em orient=columns, uma lista por feature).
+    """
+    n = len(resultados)
+    ids = np.arange(inicio + 1, inicio + n + 1)
+
+    nomes = resultados["kepoi_name"].to_numpy(dtype=object)
+    sem_nome = pd.isna(nomes)
+    if sem_nome.any():
+        nomes = nomes.copy()
+        nomes[sem_nome] = [f"ID_{i}" for i in ids[sem_nome]]
+
+    # NaN vira null na serialização
+    percent = np.round(resultados["Confianca_Calculada"].to_numpy(dtype=np.float64) * 100, 2)
+    status = resultados["Veredito_do_Modelo"].to_numpy(dtype=object)
+
+    prefixo = model.PREFIXO_CONTRIBUICAO
+    colunas_contribuicao = [c for c in resultados.columns if c.startswith(prefixo)]
+    contribuicoes = {
+        c[len(prefixo):]: np.round(resultados[c].to_numpy(dtype=np.float64), 4) for c in colunas_contribuicao
+    }
+
+    if orient == "columns":
+        colunas = {
+            "id": ids,
+            "name": nomes.tolist(),
+            "percent": percent,
+            "status": status.tolist()
+        }
+        if contribuicoes:
+            colunas["contributions"] = contribuicoes
+        return colunas
+
+    percent = [None if p != p else p for p in percent.tolist()]
+    predicoes = [
+        {"id": i, "name": name, "percent": p, "status": st}
+        for i, name, p, st in zip(ids.tolist(), nomes.tolist(), percent, status.tolist())
+    ]
+    if contribuicoes:
+        nomes_features = list(contribuicoes)
+        for predicao, valores in zip(predicoes, zip(*(v.tolist() for v in contribuicoes.values()))):
+            predicao["contributions"] = dict(zip(nomes_features, valores))
+    return predicoes
+
+def validate_upload(file: UploadFile, content_bytes=None):
+    """
+    Garante que o arquivo parece um CSV. Com o conteúdo em mãos, também
+    aceita Parquet/Arrow/.npy (ver `leitor.formato_binario`).
+    """
+    if content_bytes is not None and leitor.formato_binario(content_bytes, file.content_type) is not None:
+        return
+    if not file.filename.lower().endswith(".csv") and file.content_type not in ALLOWED_CONTENT_TYPES:
+        raise HTTPException(
+            status_code=400, 
+            detail="Arquivo inválido. Envie um CSV (.csv)"
+                   + (", Parquet, Arrow IPC ou .npy." if content_bytes is not None else ".")
+        )
 
 @app.get("/")
 async def root():
     """Endpoint raiz para verificar se a API está rodando."""
-    status = "✅ Online" if modelo_final is not None else "⚠️  Modelo não carregado"
+    ativo = model_registry.ativo if model_registry is not None else None
+    status = "✅ Online" if ativo is not None else "⚠️  Modelo não carregado"
     return {
         "message": "Exoplanet Prediction API",
         "status": status,
         "version": "1.0.0",
         "endpoints": {
             "predict": "/predict (POST)",
-            "health": "/health (GET)"
+            "predict_stream": "/predict/stream (POST)",
+            "predict_batch": "/predict/batch (POST)",
+            "predict_json": "/predict/json (POST)",
+            "results": "/results/{id}.csv (GET)",
+            "models": "/models (GET), /models/reload (POST)",
+            "health": "/health (GET)",
+            "metrics": "/metrics (GET)"
         }
     }
 
 @app.get("/health")
 async def health():
     """Endpoint de health check."""
+    ativo = model_registry.ativo if model_registry is not None else None
     return {
-        "status": "healthy" if modelo_final is not None else "model_not_loaded",
-        "model_loaded": modelo_final is not None,
+        "status": "healthy" if ativo is not None else "model_not_loaded",
+        "model_loaded": ativo is not None,
+        "inference_engine": "compilado" if ativo is not None and isinstance(ativo.modelo, arvores.ModeloCompilado) else "xgboost",
+        "pool": inference_pool.stats() if inference_pool is not None else None,
+        "micro_batcher": micro_batcher.stats() if micro_batcher is not None else None,
+        "prediction_cache": model.cache_predicoes.stats(),
+        "model_registry": model_registry.stats() if model_registry is not None else None,
+        "features": ativo.features if ativo is not None else None,
+        "model": {
+            **model_metadata(ativo),
+            "metrics": ativo.metadados.get("metricas_teste"),
+            "hyperparameters": ativo.metadados.get("hiperparametros"),
+            "cross_validation": ativo.metadados.get("validacao_cruzada")
+        } if ativo is not None else None,
         "timestamp": datetime.utcnow().isoformat() + "Z"
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Métricas no formato do Prometheus: tempo por etapa, duração, linhas/s, pool e cache."""
+    contadores = [
+        ("exo_pool_workers", "gauge", "Workers do pool de inferência.", inference_pool.workers if inference_pool else 0),
+        ("exo_pool_pending", "gauge", "Tarefas no pool (rodando ou na fila).", inference_pool.pending if inference_pool else 0),
+        ("exo_pool_rejected_total", "counter", "Requisições recusadas com 429.", inference_pool.rejected if inference_pool else 0),
+        ("exo_microbatch_batches_total", "counter", "Lotes pontuados pelo micro-batcher.", micro_batcher.batches if micro_batcher else 0),
+        ("exo_prediction_cache_hits_total", "counter", "Linhas servidas pelo cache de predições.", model.cache_predicoes.hits),
+        ("exo_prediction_cache_misses_total", "counter", "Linhas pontuadas pelo modelo.", model.cache_predicoes.misses),
+        ("exo_model_reloads_total", "counter", "Bundles de modelo (re)carregados sem reiniciar.", model_registry.recargas if model_registry else 0),
+    ]
+    texto = registro_metricas.prometheus() + "".join(
+        f"# HELP {nome} {ajuda}\n# TYPE {nome} {tipo}\n{nome} {valor}\n" for nome, tipo, ajuda, valor in contadores
+    )
+    return PlainTextResponse(texto, media_type="text/plain; version=0.0.4")
+
+@app.get("/models")
+async def list_models():
+    """Versões de modelo disponíveis em /predict?model=; sem o parâmetro, a ativa é usada."""
+    if model_registry is None:
+        raise HTTPException(status_code=503, detail="Modelo não está carregado.")
+    return {"models": model_registry.versoes(), **model_registry.stats()}
+
+@app.post("/models/reload")
+async def reload_models():
+    """
+    Verifica os bundles no disco agora (sem esperar a verificação periódica).
+    Versões novas ou alteradas são carregadas e trocadas sem interromper requisições em andamento.
+    """
+    if model_registry is None:
+        raise HTTPException(status_code=503, detail="Modelo não está carregado.")
+    carregadas = await run_in_threadpool(model_registry.verificar)
+    return {"loaded": carregadas, "models": model_registry.versoes(), **model_registry.stats()}
+
 @app.post("/predict")
-async def predict(file: UploadFile = File(...)):
-    """Recebe um CSV, roda o modelo e retorna JSON + CSV codificado em Base64."""
-    
-    # Verifica se o modelo está carregado
-    if modelo_final is None:
-        raise HTTPException(
-            status_code=503, 
-            detail="Modelo não está carregado. Verifique os logs do servidor e reinicie."
-        )
-    
-    # Valida o arquivo
-    if not file.filename.lower().endswith(".csv") and file.content_type not in ALLOWED_CONTENT_TYPES:
-        raise HTTPException(
-            status_code=400, 
-            detail="Arquivo inválido. Envie um CSV (.csv)."
-        )
+async def predict(
+    file: UploadFile = File(...),
+    orient: Literal["records", "columns"] = "records",
+    csv_mode: Literal["base64", "link"] = "base64",
+    explain: bool = False,
+    model_version: Optional[str] = Query(None, alias="model")
+):
+    """
+    Recebe um CSV, roda o modelo e retorna JSON + CSV codificado em Base64.
+
+    Também aceita Parquet, Arrow IPC (arquivo ou stream) e .npy, reconhecidos
+    pelos bytes iniciais ou pelo content type: as colunas vão direto para a
+    matriz do modelo, sem texto nem DataFrame. Um .npy 2D (n x features, na
+    ordem de `features` em /health) é pontuado sem cópia; os nomes são os números das linhas.
+
+    Com orient=columns, `predictions` vem orientado a colunas (uma lista por campo).
+    Com csv_mode=link, a resposta traz só o JSON e um `result_id`; o CSV é
+    baixado depois em GET /results/{result_id}.csv.
+
+    Com model=vX, usa essa versão em vez da ativa (ver GET /models).
 
+    Com explain=true, cada predição traz a contribuição de cada feature
+    (valores SHAP do XGBoost, em log-odds; positivo puxa para "Planeta
+    Confirmado") e o CSV ganha as colunas Contribuicao_<feature>. Custa
+    mais que a pontuação; compare com python benchmark.py explicar.
+    """
+    
+    servido = served_model(model_version)
+    inicio_requisicao = time.perf_counter()
+    cronometro = metricas.Cronometro()
     try:
-        # Lê o conteúdo do CSV
         content_bytes = await file.read()
-        try:
-            text = content_bytes.decode("utf-8")
-        except UnicodeDecodeError:
-            try:
-                text = content_bytes.decode("iso-8859-1")
-            except:
-                text = content_bytes.decode("latin-1")
-
-        # Remove linhas de comentário (começam com #)
-        lines = text.split('\n')
-        data_lines = [line for line in lines if not line.strip().startswith('#')]
-        clean_text = '\n'.join(data_lines)
-        
-        # Detecta o separador no conteúdo limpo
-        sep = detect_separator(clean_text[:2048])
-        
-        # Carrega o CSV
-        df = pd.read_csv(
-            io.StringIO(clean_text), 
-            sep=sep,
-            on_bad_lines='skip'
-        )
-        
-        print(f"\n📄 Arquivo recebido: {file.filename}")
-        print(f"   Delimitador: '{sep}'")
-        print(f"   Linhas: {len(df)}, Colunas: {len(df.columns)}")
-        print(f"   Colunas principais: {', '.join(df.columns[:5].tolist())}...")
-        
-    except Exception as e:
-        await file.close()
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Erro ao processar CSV: {str(e)}. Verifique se o arquivo está bem formatado."
-        )
     finally:
         await file.close()
 
-    # Roda o modelo de análise
+    # Verifica o modelo e valida o arquivo (CSV ou binário, pelos bytes iniciais)
+    validate_upload(file, content_bytes)
+
+    # Leitura e pontuação rodam no pool; o event loop continua livre para outras requisições.
+    # No modo link o CSV só é renderizado se for baixado depois.
+    argumentos = {"incluir_csv_base64": csv_mode == "base64", "content_type": file.content_type, "explicar": explain}
+    if inference_pool.kind == "thread":
+        # Em threads o modelo é compartilhado; em processos cada worker carrega o bundle da versão
+        argumentos.update(
+            modelo=servido.modelo,
+            escalonador=servido.escalonador,
+            features=servido.features
+        )
+    elif servido.caminho is not None:
+        argumentos["bundle_ref"] = (servido.caminho, servido.assinatura)
+
     try:
-        resultados = model.analisar_novo_csv(
-            io.StringIO(text), 
-            modelo_final, 
-            escalonador_final, 
-            features_usadas
+        # O micro-batcher só pontua: com explain o upload vai inteiro para o pool
+        if micro_batcher is not None and not explain and len(content_bytes) <= MICROBATCH_MAX_UPLOAD_BYTES:
+            resultados = await analyze_small_upload(content_bytes, file.filename, servido, file.content_type, cronometro)
+            csv_base64 = None
+        else:
+            (resultados, csv_base64), tempos = await inference_pool.run(
+                metricas.com_tempos,
+                pipeline.analisar_upload,
+                content_bytes,
+                file.filename,
+                **argumentos
+            )
+            cronometro.somar(tempos)
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except ModelUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except pipeline.UploadParseError as e:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Erro ao processar CSV: {str(e)}. Verifique se o arquivo está bem formatado."
         )
     except Exception as e:
         print(f"❌ Erro durante análise: {e}")
@@ -153,40 +429,360 @@ async def predict(file: UploadFile = File(...)):
             detail="Erro ao analisar CSV. Verifique se o formato está correto."
         )
 
-    # Cria o CSV de saída com predições
-    csv_output = io.StringIO()
-    resultados.to_csv(csv_output, index=False)
-    csv_bytes = csv_output.getvalue().encode("utf-8")
-
-    # Codifica o CSV em base64
-    csv_base64 = base64.b64encode(csv_bytes).decode("utf-8")
-
     # Cria o JSON de resposta
-    predictions = []
-    for idx, row in resultados.iterrows():
-        try:
-            percent = float(row["Confianca_Calculada"]) * 100 if isinstance(row["Confianca_Calculada"], (float, int)) else None
-        except Exception:
-            percent = None
-        predictions.append({
-            "id": idx + 1,
-            "name": row.get("kepoi_name", f"ID_{idx+1}"),
-            "percent": round(percent, 2) if percent else None,
-            "status": row.get("Veredito_do_Modelo", "Desconhecido")
-        })
+    with cronometro.etapa("serialize"):
+        predictions = build_predictions(resultados, orient)
+    filename = f"predicoes_{file.filename}"
 
     json_response = {
         "predictions": predictions,
         "metadata": {
-            "totalSamples": len(predictions),
+            "totalSamples": len(resultados),
             "processedAt": datetime.utcnow().isoformat() + "Z",
-            "modelVersion": "v1.0.0",
-            "accuracy": 0.85
+            **model_metadata(servido)
         },
-        "csv_base64": csv_base64,
-        "filename": f"predicoes_{file.filename}"
+        "filename": filename
     }
+
+    result_id = result_store.put(resultados, filename) if csv_mode == "link" else None
+    if result_id is not None:
+        json_response["result_id"] = result_id
+        json_response["csv_url"] = f"/results/{result_id}.csv"
+    else:
+        # Modo padrão (ou resultado maior que o limite do armazenamento): CSV embutido em Base64
+        if csv_base64 is None:
+            with cronometro.etapa("base64"):
+                csv_base64 = await run_in_threadpool(pipeline.render_csv_base64, resultados)
+        json_response["csv_base64"] = csv_base64
     
-    print(f"✅ Análise concluída: {len(predictions)} predições geradas")
+    print(f"✅ Análise concluída: {len(resultados)} predições geradas")
+
+    with cronometro.etapa("serialize"):
+        resposta = ORJSONResponse(content=json_response)
+    return registrar_metricas(resposta, "predict", cronometro, len(resultados), inicio_requisicao)
+
+@app.get("/results/{result_id}.csv")
+async def download_results(result_id: str, gzip: bool = False):
+    """
+    Baixa em streaming o CSV de um resultado gerado com /predict?csv_mode=link.
+    Com gzip=true o corpo vai comprimido (Content-Encoding: gzip).
+    """
+    item = result_store.get(result_id)
+    if item is None:
+        raise HTTPException(
+            status_code=404, 
+            detail="Resultado não encontrado ou expirado. Refaça a predição."
+        )
+
+    resultados, filename = item
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(iter_csv(resultados, gzip=gzip), media_type="text/csv", headers=headers)
+
+async def _membros_do_lote(files):
+    """
+    Gera (nome, conteúdo, erro) dos CSVs do lote: os arquivos enviados ou os
+    membros de um único ZIP/tar.gz, lidos um de cada vez fora do event loop.
+    Levanta pipeline.BatchTooLargeError se o lote passa de
+    BATCH_MAX_TOTAL_BYTES ou, compactado, de BATCH_MAX_RATIO.
+    """
+    if len(files) == 1 and pipeline.eh_arquivo_compactado(files[0].filename):
+        membros = pipeline.iterar_membros(files[0].file, files[0].filename, BATCH_MAX_FILE_BYTES,
+                                          BATCH_MAX_TOTAL_BYTES, BATCH_MAX_RATIO)
+        while True:
+            try:
+                membro = await run_in_threadpool(next, membros, None)
+            except pipeline.UploadParseError:
+                raise
+            except Exception as e:
+                raise pipeline.UploadParseError(f"Arquivo compactado inválido: {e}") from e
+            if membro is None:
+                return
+            yield membro
+        return
+
+    lote = pipeline.BytesDoLote(BATCH_MAX_TOTAL_BYTES)
+    for file in files:
+        if not file.filename.lower().endswith(".csv") and file.content_type not in ALLOWED_CONTENT_TYPES:
+            yield file.filename, None, pipeline.UploadParseError("não é um CSV")
+            continue
+        conteudo = await file.read(BATCH_MAX_FILE_BYTES + 1)
+        lote.somar(len(conteudo))
+        if len(conteudo) > BATCH_MAX_FILE_BYTES:
+            yield file.filename, None, pipeline.UploadParseError(
+                f"passa do limite de {BATCH_MAX_FILE_BYTES // (1 << 20)} MB por arquivo"
+            )
+        else:
+            yield file.filename, conteudo, None
+
+@app.post("/predict/batch")
+async def predict_batch(
+    files: List[UploadFile] = File(...),
+    orient: Literal["records", "columns"] = "records",
+    model_version: Optional[str] = Query(None, alias="model")
+):
+    """
+    Pontua vários CSVs de uma vez: vários arquivos no campo `files` ou um
+    único ZIP/tar.gz com os CSVs dentro.
+
+    Os arquivos são lidos em paralelo no pool (no máximo um por worker em
+    memória ao mesmo tempo), todas as linhas são pontuadas em uma única
+    chamada ao modelo e a resposta traz os resultados separados por arquivo.
+    Arquivos com erro aparecem com `error` sem derrubar o lote.
+    Com model=vX, usa essa versão em vez da ativa.
+    """
+    servido = served_model(model_version)
+
+    inicio_requisicao = time.perf_counter()
+    cronometro = metricas.Cronometro()
+    medianas = model.medianas_do_treino(servido.escalonador)
+    vagas = asyncio.Semaphore(inference_pool.workers)
+    arquivos = []
+    tarefas = []
+
+    async def preparar(indice, nome, conteudo):
+        try:
+            arquivos[indice]["dados"], tempos = await inference_pool.run(
+                metricas.com_tempos, pipeline.preparar_upload, conteudo, nome, servido.features, medianas
+            )
+            cronometro.somar(tempos)
+        except pipeline.UploadParseError as e:
+            arquivos[indice]["error"] = str(e)
+        finally:
+            vagas.release()
+
+    try:
+        async for nome, conteudo, erro in _membros_do_lote(files):
+            if len(arquivos) >= BATCH_MAX_FILES:
+                raise HTTPException(status_code=413, detail=f"Lote com mais de {BATCH_MAX_FILES} arquivos")
+            arquivos.append({"filename": nome})
+            if erro is not None:
+                arquivos[-1]["error"] = str(erro)
+                continue
+            # Limita quantos membros ficam em memória esperando o parse
+            await vagas.acquire()
+            tarefas.append(asyncio.create_task(preparar(len(arquivos) - 1, nome, conteudo)))
+        await asyncio.gather(*tarefas)
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except pipeline.BatchTooLargeError as e:
+        raise HTTPException(status_code=413, detail=f"Lote grande demais: {e}")
+    except pipeline.UploadParseError as e:
+        raise HTTPException(status_code=400, detail=f"Erro ao ler o lote: {e}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Erro durante leitura do lote: {e}")
+        raise HTTPException(status_code=500, detail=f"Erro ao ler lote: {e}")
+    finally:
+        for tarefa in tarefas:
+            tarefa.cancel()
+        for file in files:
+            await file.close()
+
+    if not arquivos:
+        raise HTTPException(status_code=400, detail="Nenhum CSV encontrado no lote.")
+
+    # Uma única pontuação para as linhas de todos os arquivos
+    lidos = [a for a in arquivos if "dados" in a]
+    X = np.concatenate([a["dados"][1] for a in lidos]) if lidos else np.empty((0, len(servido.features)))
+    confianca = np.empty(0, dtype=np.float32)
+    if len(X):
+        try:
+            confianca, tempos = await run_in_threadpool(metricas.com_tempos, score_matrix, X, servido)
+            cronometro.somar(tempos)
+        except Exception as e:
+            print(f"❌ Erro durante análise do lote: {e}")
+            raise HTTPException(status_code=500, detail=f"Erro ao analisar lote: {e}")
+
+    inicio = 0
+    total = 0
+    with cronometro.etapa("serialize"):
+        for arquivo in lidos:
+            ids, X_arquivo = arquivo.pop("dados")
+            fim = inicio + len(X_arquivo)
+            resultados = model.montar_resultados(ids, confianca[inicio:fim])
+            arquivo["totalSamples"] = len(resultados)
+            arquivo["predictions"] = build_predictions(resultados, orient)
+            inicio = fim
+            total += len(resultados)
+
+    print(f"✅ Lote concluído: {len(arquivos)} arquivos, {total} predições geradas")
+    with cronometro.etapa("serialize"):
+        resposta = ORJSONResponse(content={
+            "files": arquivos,
+            "metadata": {
+                "totalFiles": len(arquivos),
+                "totalSamples": total,
+                "processedAt": datetime.utcnow().isoformat() + "Z",
+                **model_metadata(servido)
+            }
+        })
+    return registrar_metricas(resposta, "predict_batch", cronometro, total, inicio_requisicao)
+
+@app.post("/predict/json")
+async def predict_json(
+    candidates: Union[List[Candidate], Candidate] = Body(...),
+    model_version: Optional[str] = Query(None, alias="model")
+):
+    """
+    Pontua um ou poucos candidatos enviados como JSON: um objeto (ou uma
+    lista de objetos) com as features `koi_*` e, opcionalmente, `kepoi_name`.
+
+    Caminho de menor latência para clientes interativos: sem CSV, pandas nem
+    pool. Os valores vão direto para uma matriz pré-alocada e o modelo roda
+    no próprio event loop, com o motor compilado quando disponível (ver
+    model.motor_rapido). Features ausentes ou null são preenchidas como nos
+    uploads (medianas do treino). Aceita até EXO_JSON_MAX_CANDIDATES candidatos.
+    """
+    servido = served_model(model_version)
+    inicio_requisicao = time.perf_counter()
+    if not isinstance(candidates, list):
+        candidates = [candidates]
+    n = len(candidates)
+    if not 0 < n <= JSON_MAX_CANDIDATES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Envie de 1 a {JSON_MAX_CANDIDATES} candidatos (recebido {n}); para mais, use /predict"
+        )
+
+    features = servido.features
+    with metricas.cronometrar() as cronometro:
+        with cronometro.etapa("parse"):
+            X = json_buffer[:n] if json_buffer.shape[1] == len(features) else np.empty((n, len(features)))
+            # None vira NaN na atribuição
+            X[:] = [[candidato.__dict__.get(nome) for nome in features] for candidato in candidates]
+        vazios = np.isnan(X).all(axis=1)
+        if vazios.any():
+            raise HTTPException(
+                status_code=422,
+                detail=f"Candidato {int(np.argmax(vazios)) + 1} sem nenhuma das features: {', '.join(features)}"
+            )
+        X = model.preparar_matriz(X, features, medianas=model.medianas_do_treino(servido.escalonador))
+        confianca = model.pontuar_direto(X, servido.rapido, servido.escalonador)
+
+        with cronometro.etapa("serialize"):
+            percent = np.round(confianca.astype(np.float64) * 100, 2).tolist()
+            predictions = [
+                {"id": i, "name": candidato.kepoi_name or f"ID_{i}", "percent": p, "status": st}
+                for i, candidato, p, st in zip(range(1, n + 1), candidates, percent, model.vereditos(confianca).tolist())
+            ]
+            resposta = ORJSONResponse(content={
+                "predictions": predictions,
+                "metadata": {
+                    "totalSamples": n,
+                    "processedAt": datetime.utcnow().isoformat() + "Z",
+                    **model_metadata(servido)
+                }
+            })
+    return registrar_metricas(resposta, "predict_json", cronometro, n, inicio_requisicao)
+
+@app.post("/predict/stream")
+async def predict_stream(
+    file: UploadFile = File(...),
+    model_version: Optional[str] = Query(None, alias="model")
+):
+    """
+    Versão em streaming do /predict para arquivos grandes.
+
+    O upload é lido e pontuado em blocos; cada predição é enviada como uma
+    linha JSON (NDJSON) assim que seu bloco fica pronto, e a última linha
+    traz os metadados. O uso de memória não cresce com o tamanho do arquivo.
+    Com model=vX, usa essa versão em vez da ativa.
+
+    Cada bloco é pontuado no mesmo pool do /predict. O primeiro é pontuado
+    antes de responder (pool cheio vira 429, CSV inválido 400); os seguintes
+    esperam vaga no pool. Se um bloco falhar depois que o status 200 já foi
+    enviado, a última linha é {"error": {"message", "processedSamples"}}
+    no lugar dos metadados. Os tempos por etapa de todos os blocos vão para
+    GET /metrics (endpoint predict_stream) quando o stream termina; não há
+    Server-Timing, porque os headers saem antes do primeiro bloco.
+    """
+    servido = served_model(model_version)
+    validate_upload(file)
+    inicio_requisicao = time.perf_counter()
+    cronometro = metricas.Cronometro()
+
+    argumentos = {}
+    if inference_pool.kind == "thread":
+        argumentos.update(modelo=servido.modelo, escalonador=servido.escalonador, features=servido.features)
+    elif servido.caminho is not None:
+        argumentos["bundle_ref"] = (servido.caminho, servido.assinatura)
+    medianas = model.medianas_do_treino(servido.escalonador)
+    blocos = None
+
+    async def fechar():
+        # O leitor em blocos antes do arquivo que ele lê
+        if blocos is not None:
+            blocos.close()
+        await file.close()
+
+    async def pontuar_proximo(executar):
+        # Leitura na threadpool do Starlette (o arquivo só existe neste processo), pontuação no pool
+        bloco, tempos = await run_in_threadpool(
+            metricas.com_tempos, pipeline.preparar_bloco, blocos, servido.features, medianas
+        )
+        cronometro.somar(tempos)
+        if bloco is None:
+            return None
+        resultados, tempos = await executar(metricas.com_tempos, pipeline.pontuar_bloco, *bloco, **argumentos)
+        cronometro.somar(tempos)
+        return resultados
+
+    try:
+        with cronometro.etapa("sniff"):
+            sep, encoding = await run_in_threadpool(sniff_upload, file.file)
+        print(f"\n📄 Arquivo recebido (streaming): {file.filename}")
+        print(f"   Delimitador: '{sep}', encoding: {encoding}")
+        blocos = leitor.ler_csv_em_blocos(file.file, servido.features, sep, encoding, model.TAMANHO_BLOCO)
+        primeiro = await pontuar_proximo(inference_pool.run)
+    except Exception as e:
+        await fechar()
+        if isinstance(e, PoolSaturatedError):
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+        if isinstance(e, ModelUnavailableError):
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        if isinstance(e, pipeline.UploadParseError):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Erro ao processar CSV: {str(e)}. Verifique se o arquivo está bem formatado."
+            )
+        print(f"❌ Erro durante análise: {e}")
+        raise HTTPException(status_code=500, detail=f"Erro ao analisar CSV: {e}")
+
+    def linhas_ndjson(resultados, inicio):
+        return b"".join(orjson.dumps(p) + b"\n" for p in build_predictions(resultados, inicio=inicio))
+
+    async def gerar_linhas():
+        total = 0
+        resultados = primeiro
+        try:
+            while resultados is not None:
+                with cronometro.etapa("serialize"):
+                    linhas = await run_in_threadpool(linhas_ndjson, resultados, total)
+                yield linhas
+                total += len(resultados)
+                # A requisição já foi aceita: os próximos blocos esperam vaga em vez de levar 429
+                resultados = await pontuar_proximo(inference_pool.run_waiting)
+        except Exception as e:
+            # O status 200 já foi enviado; o erro vira a última linha, sem os metadados
+            print(f"❌ Erro durante análise em streaming após {total} predições: {e}")
+            yield orjson.dumps({"error": {"message": str(e), "processedSamples": total}}) + b"\n"
+            return
+        finally:
+            await fechar()
+            registro_metricas.registrar("predict_stream", cronometro.tempos, total,
+                                        time.perf_counter() - inicio_requisicao)
+
+        yield orjson.dumps({
+            "metadata": {
+                "totalSamples": total,
+                "processedAt": datetime.utcnow().isoformat() + "Z",
+                **model_metadata(servido)
+            }
+        }) + b"\n"
+        print(f"✅ Análise em streaming concluída: {total} predições geradas")
 
-    return JSONResponse(content=json_response)
\ No newline at end of file
+    return StreamingResponse(gerar_linhas(), media_type="application/x-ndjson")
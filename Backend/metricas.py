@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Tempo por etapa do /predict e métricas no formato texto do Prometheus.
+
+As etapas (decode, comment_strip, sniff, parse, impute, cache, scale,
+infer, microbatch, serialize, base64) são marcadas no código com `with metricas.etapa(nome)`.
+Fora de um `cronometrar()` a marcação não faz nada, então leitor e modelo
+podem ser usados sem servidor (CLI, benchmarks) sem custo.
+
+`cronometrar()` ativa um Cronometro no contexto atual (contextvars), de
+forma que cada requisição soma só os próprios tempos mesmo com várias
+threads no pool. Os tempos voltam para o processo do servidor como um dict
+simples (funciona também no pool de processos) e são acumulados em
+histogramas por `Registro.registrar`.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+ETAPAS = ("decode", "comment_strip", "sniff", "parse", "impute", "cache", "scale", "infer", "explain",
+          "microbatch", "serialize", "base64")
+
+# Limites (em segundos) dos buckets dos histogramas de duração
+BUCKETS_SEGUNDOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Limites (linhas/s) do histograma de vazão por requisição
+BUCKETS_LINHAS_POR_SEGUNDO = (1e2, 1e3, 1e4, 3e4, 1e5, 3e5, 1e6, 3e6, 1e7)
+
+_cronometro_atual = contextvars.ContextVar("cronometro", default=None)
+
+
+class Cronometro:
+    """Soma o tempo gasto em cada etapa de uma requisição."""
+
+    def __init__(self):
+        self.tempos = {}
+
+    @contextmanager
+    def etapa(self, nome):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.tempos[nome] = self.tempos.get(nome, 0.0) + time.perf_counter() - inicio
+
+    def somar(self, tempos):
+        for nome, segundos in tempos.items():
+            self.tempos[nome] = self.tempos.get(nome, 0.0) + segundos
+
+
+@contextmanager
+def cronometrar():
+    """Ativa um Cronometro novo no contexto atual e o entrega ao bloco."""
+    cronometro = Cronometro()
+    token = _cronometro_atual.set(cronometro)
+    try:
+        yield cronometro
+    finally:
+        _cronometro_atual.reset(token)
+
+
+def etapa(nome):
+    """Mede o bloco como a etapa `nome` da requisição em andamento, se houver uma."""
+    cronometro = _cronometro_atual.get()
+    return cronometro.etapa(nome) if cronometro is not None else nullcontext()
+
+
+def com_tempos(func, *args, **kwargs):
+    """Executa func(*args, **kwargs) cronometrado. Retorna (resultado, {etapa: segundos})."""
+    with cronometrar() as cronometro:
+        resultado = func(*args, **kwargs)
+    return resultado, cronometro.tempos
+
+
+def server_timing(tempos, total=None):
+    """Valor do header Server-Timing (durações em ms)."""
+    partes = [f"{nome};dur={segundos * 1e3:.2f}" for nome, segundos in tempos.items()]
+    if total is not None:
+        partes.append(f"total;dur={total * 1e3:.2f}")
+    return ", ".join(partes)
+
+
+class Histograma:
+    """Histograma cumulativo no modelo do Prometheus (buckets `le`, soma e contagem)."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.contagens = [0] * len(buckets)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.contagens[i] += 1
+        self.soma += valor
+        self.total += 1
+
+    def linhas(self, nome, rotulos):
+        prefixo = ",".join(f'{k}="{v}"' for k, v in rotulos.items())
+        separador = "," if prefixo else ""
+        for limite, contagem in zip(self.buckets, self.contagens):
+            yield f'{nome}_bucket{{{prefixo}{separador}le="{limite:g}"}} {contagem}'
+        yield f'{nome}_bucket{{{prefixo}{separador}le="+Inf"}} {self.total}'
+        yield f"{nome}_sum{{{prefixo}}} {self.soma:.6f}"
+        yield f"{nome}_count{{{prefixo}}} {self.total}"
+
+
+def _ordem(item):
+    (endpoint, nome), _ = item
+    return endpoint, ETAPAS.index(nome) if nome in ETAPAS else len(ETAPAS), nome
+
+
+class Registro:
+    """Histogramas por endpoint: duração total, duração de cada etapa e linhas/s."""
+
+    def __init__(self):
+        self._etapas = {}
+        self._duracoes = {}
+        self._vazoes = {}
+        self._linhas = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, endpoint, tempos, linhas, total):
+        with self._lock:
+            for nome, segundos in tempos.items():
+                chave = (endpoint, nome)
+                if chave not in self._etapas:
+                    self._etapas[chave] = Histograma(BUCKETS_SEGUNDOS)
+                self._etapas[chave].observar(segundos)
+            if endpoint not in self._duracoes:
+                self._duracoes[endpoint] = Histograma(BUCKETS_SEGUNDOS)
+                self._vazoes[endpoint] = Histograma(BUCKETS_LINHAS_POR_SEGUNDO)
+                self._linhas[endpoint] = 0
+            self._duracoes[endpoint].observar(total)
+            if linhas and total > 0:
+                self._vazoes[endpoint].observar(linhas / total)
+            self._linhas[endpoint] += linhas
+
+    def prometheus(self):
+        """Métricas no formato de exposição texto do Prometheus (0.0.4)."""
+        saida = [
+            "# HELP exo_stage_duration_seconds Tempo gasto em cada etapa da predição.",
+            "# TYPE exo_stage_duration_seconds histogram",
+        ]
+        with self._lock:
+            for (endpoint, nome), histograma in sorted(self._etapas.items(), key=_ordem):
+                saida.extend(histograma.linhas("exo_stage_duration_seconds", {"endpoint": endpoint, "stage": nome}))
+
+            saida += [
+                "# HELP exo_request_duration_seconds Duração total das requisições de predição.",
+                "# TYPE exo_request_duration_seconds histogram",
+            ]
+            for endpoint, histograma in sorted(self._duracoes.items()):
+                saida.extend(histograma.linhas("exo_request_duration_seconds", {"endpoint": endpoint}))
+
+            saida += [
+                "# HELP exo_rows_per_second Vazão de cada requisição (linhas pontuadas por segundo).",
+                "# TYPE exo_rows_per_second histogram",
+            ]
+            for endpoint, histograma in sorted(self._vazoes.items()):
+                saida.extend(histograma.linhas("exo_rows_per_second", {"endpoint": endpoint}))
+
+            saida += [
+                "# HELP exo_rows_total Linhas pontuadas.",
+                "# TYPE exo_rows_total counter",
+            ]
+            for endpoint, linhas in sorted(self._linhas.items()):
+                saida.append(f'exo_rows_total{{endpoint="{endpoint}"}} {linhas}')
+        return "\n".join(saida) + "\n"
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-batching de predições pequenas vindas de requisições concorrentes.
+
+Cada chamada a `escalonador.transform` + `modelo.predict_proba` tem um custo
+fixo alto perto do custo de pontuar poucas linhas. O MicroBatcher junta as
+matrizes de features de várias requisições por até `max_wait_ms` ou até
+somar `max_rows` linhas, pontua tudo em uma única chamada e devolve a cada
+requisição a sua fatia do resultado.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Agrupa matrizes de features e pontua em lote.
+
+    `score_fn(X)` recebe a matriz concatenada e retorna um array com uma
+    probabilidade por linha. Os lotes rodam em uma thread dedicada, um de
+    cada vez: enquanto um lote é pontuado, o próximo vai se formando.
+
+    Requisições para modelos diferentes (`score(X, modelo)`) entram na mesma
+    janela, mas cada modelo é pontuado separadamente com `score_fn(X, modelo)`.
+    """
+
+    def __init__(self, score_fn, max_rows=512, max_wait_ms=2.0):
+        self.score_fn = score_fn
+        self.max_rows = max_rows
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.rows = 0
+        self._pendentes = []
+        self._linhas_pendentes = 0
+        self._timer = None
+        self._tarefas = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="microlote")
+
+    async def score(self, X, modelo=None):
+        """Pontua X junto com as outras requisições do mesmo lote (e do mesmo modelo)."""
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        self._pendentes.append((X, futuro, modelo))
+        self._linhas_pendentes += len(X)
+
+        if self._linhas_pendentes >= self.max_rows:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await futuro
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        lote, self._pendentes, self._linhas_pendentes = self._pendentes, [], 0
+        if not lote:
+            return
+
+        grupos = {}
+        for item in lote:
+            grupos.setdefault(id(item[2]), []).append(item)
+        for grupo in grupos.values():
+            tarefa = asyncio.get_running_loop().create_task(self._executar(grupo))
+            # Guarda a referência para a tarefa não ser coletada antes de terminar
+            self._tarefas.add(tarefa)
+            tarefa.add_done_callback(self._tarefas.discard)
+
+    async def _executar(self, lote):
+        X = np.concatenate([x for x, _, _ in lote]) if len(lote) > 1 else lote[0][0]
+        modelo = lote[0][2]
+        argumentos = (X,) if modelo is None else (X, modelo)
+        try:
+            loop = asyncio.get_running_loop()
+            confianca = await loop.run_in_executor(self._executor, self.score_fn, *argumentos)
+        except Exception as e:
+            for _, futuro, _ in lote:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            return
+
+        self.batches += 1
+        self.rows += len(X)
+
+        inicio = 0
+        for x, futuro, _ in lote:
+            fim = inicio + len(x)
+            if not futuro.done():
+                futuro.set_result(confianca[inicio:fim])
+            inicio = fim
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "avg_batch_rows": round(self.rows / self.batches, 2) if self.batches else 0.0,
+            "max_rows": self.max_rows,
+            "max_wait_ms": self.max_wait * 1000
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
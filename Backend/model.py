@@ -6,41 +6,85 @@ Este script treina (ou carrega) um modelo XGBoost para analisar um novo
 arquivo CSV de candidatos, adicionando predições e scores de confiança.
 """
 import pandas as pd
-import io
+import numpy as np
 import os
-import requests
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-from xgboost import XGBClassifier
-import joblib
+import shutil
+import hashlib
+import importlib.util
+import json
+# Só o necessário para servir: scikit-learn, xgboost, joblib, requests e os
+# módulos de treino (ajuste, dados_nasa) são importados nas funções que os usam
+import bundle
+import leitor
+import metricas
+from cache_predicoes import CachePredicoes
 
 # Caminhos dos arquivos
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_PATH = os.path.join(SCRIPT_DIR, "modelo_exoplanetas.joblib")
 SCALER_PATH = os.path.join(SCRIPT_DIR, "scaler_exoplanetas.joblib")
 FEATURES_PATH = os.path.join(SCRIPT_DIR, "features_exoplanetas.joblib")
+BUNDLE_PATH = os.path.join(SCRIPT_DIR, "modelo_exoplanetas.exob")
 DATASET_PATH = os.path.join(SCRIPT_DIR, "cumulative_dataset.csv")
+CACHE_TREINO_PATH = os.path.join(SCRIPT_DIR, "cache_treino.npz")
+# Bundles de outras versões, servidos lado a lado com o ativo (/predict?model=vX)
+MODELOS_DIR = os.getenv("EXO_MODEL_DIR", os.path.join(SCRIPT_DIR, "modelos"))
 
-# URL do dataset da NASA (Kepler KOI Cumulative Table)
-DATASET_URL = "https://exoplanetarchive.ipac.caltech.edu/TAP/sync?query=select+*+from+cumulative&format=csv"
+# Features usadas pelo modelo, na ordem da matriz de treino
+FEATURES_MODELO = [
+    'koi_period', 'koi_duration', 'koi_depth', 'koi_prad', 'koi_teq',
+    'koi_insol', 'koi_model_snr', 'koi_impact',
+    'koi_fpflag_nt', 'koi_fpflag_ss', 'koi_fpflag_co', 'koi_fpflag_ec',
+    'koi_steff', 'koi_slogg', 'koi_srad'
+]
+
+# Linhas por bloco na análise em streaming
+TAMANHO_BLOCO = 5000
+
+# Motor de inferência: "xgboost" (predict_proba do XGBClassifier) ou
+# "compilado" (árvores compiladas em arrays, ver arvores.py)
+MOTOR_INFERENCIA = os.getenv("EXO_MOTOR_INFERENCIA", "xgboost").lower()
+
+# Predições guardadas por vetor de features (LRU); 0 desliga
+CACHE_PREDICOES_MAX = int(os.getenv("EXO_CACHE_PREDICOES", "100000"))
+cache_predicoes = CachePredicoes(CACHE_PREDICOES_MAX)
+
+# Prefixo das colunas de contribuição por feature nos resultados (explain=true)
+PREFIXO_CONTRIBUICAO = "Contribuicao_"
+
+# Opções do treino: threads do XGBoost (padrão: todos os núcleos) e algoritmo das árvores
+TREINO_N_JOBS = int(os.getenv("EXO_TREINO_N_JOBS", "0")) or None
+TREINO_TREE_METHOD = os.getenv("EXO_TREINO_TREE_METHOD", "hist")
+
+# Metadados do modelo carregado (versão, origem e métricas no conjunto de teste, quando conhecidas)
+metadados_modelo = {}
+
+# Colunas pedidas ao NASA Exoplanet Archive (Kepler KOI Cumulative Table)
+COLUNAS_DATASET = ['kepoi_name', 'koi_disposition'] + FEATURES_MODELO
 
 def baixar_dataset():
     """
-    Baixa o dataset de exoplanetas da NASA.
+    Baixa ou atualiza o dataset de exoplanetas da NASA.
+
+    Só as colunas do modelo são baixadas, e o arquivo local só é reescrito
+    se alguma linha mudou (ver dados_nasa.atualizar_dataset). Retorna True
+    se o arquivo mudou, ou seja, se há o que retreinar.
     """
-    print("📥 Baixando dataset da NASA Exoplanet Archive...")
-    print(f"   URL: {DATASET_URL}")
+    import requests
+    import dados_nasa
+
+    print("📥 Atualizando dataset da NASA Exoplanet Archive...")
+    print(f"   URL: {dados_nasa.TAP_URL}")
     
     try:
-        response = requests.get(DATASET_URL, timeout=60)
-        response.raise_for_status()
-        
-        with open(DATASET_PATH, 'wb') as f:
-            f.write(response.content)
-        
-        print(f"✅ Dataset baixado com sucesso!")
+        diferenca = dados_nasa.atualizar_dataset(DATASET_PATH, COLUNAS_DATASET)
+        if diferenca["arquivo_alterado"]:
+            print(f"✅ Dataset atualizado: {len(diferenca['novas'])} novas, "
+                  f"{len(diferenca['alteradas'])} alteradas, {len(diferenca['removidas'])} removidas")
+        else:
+            print("✅ Dataset local já está atualizado")
         print(f"   Salvo em: {DATASET_PATH}")
-        return DATASET_PATH
+        return diferenca["arquivo_alterado"]
     except requests.exceptions.RequestException as e:
         print(f"❌ ERRO ao baixar dataset: {e}")
         print("\n⚠️  SOLUÇÃO ALTERNATIVA:")
@@ -49,73 +93,100 @@ def baixar_dataset():
         print("   3. Salve como 'cumulative_dataset.csv' na pasta Backend")
         raise
 
-def treinar_modelo_final(caminho_arquivo_treino=None):
+def treinar_modelo_final(caminho_arquivo_treino=None, retreinar=False, n_jobs=None, tree_method=None,
+                         ajustar=False, folds=None, orcamento_s=None, versao=None):
     """
     Treina o modelo XGBoost com o dataset base ou carrega de disco.
+
+    Prefere o bundle .exob (mmap, sem unpickling); se só existirem os
+    artefatos joblib, carrega-os (o bundle é gerado pelo treino ou por
+    `exportar_bundle`, nunca ao carregar).
+
+    Com `retreinar=True` ignora os artefatos salvos e treina de novo com
+    `caminho_arquivo_treino` (padrão: dataset da NASA). `n_jobs` e
+    `tree_method` sobrescrevem EXO_TREINO_N_JOBS / EXO_TREINO_TREE_METHOD.
+
+    Com `ajustar=True` (só ao treinar) os hiperparâmetros saem de uma busca
+    com validação cruzada de `folds` folds (padrão: ajuste.FOLDS_PADRAO),
+    limitada a `orcamento_s` segundos (ver ajuste.py). As métricas no conjunto de teste vão para os
+    metadados do bundle e para `metadados_modelo`.
+
+    O modelo treinado é gravado como `versao` (padrão: v1.0.0); se o bundle
+    atual tinha outra versão, ele é arquivado antes em MODELOS_DIR.
     """
+    global metadados_modelo
+    joblib_existe = all(os.path.exists(p) for p in (MODEL_PATH, SCALER_PATH, FEATURES_PATH))
+
+    # Bundle: caminho rápido. Ele é a fonte de verdade ao carregar e nunca é regravado aqui
+    # (só pelo treino ou por `python bundle.py converter`)
+    if not retreinar and os.path.exists(BUNDLE_PATH):
+        print(f"🧠 Bundle do modelo encontrado em: {BUNDLE_PATH}")
+        carregado = bundle.carregar_bundle(BUNDLE_PATH, MOTOR_INFERENCIA)
+        print(f"✅ Modelo {carregado.metadados['versao_modelo']} carregado com sucesso!")
+        metadados_modelo = carregado.metadados
+        return aplicar_motor(carregado.modelo), carregado.escalonador, carregado.features
+
     # Se já existir modelo salvo, carrega direto
-    if os.path.exists(MODEL_PATH) and os.path.exists(SCALER_PATH) and os.path.exists(FEATURES_PATH):
+    if not retreinar and joblib_existe:
         print(f"🧠 Modelo encontrado em: {MODEL_PATH}")
         print("📂 Carregando modelo do disco...")
-        modelo = joblib.load(MODEL_PATH)
-        escalonador = joblib.load(SCALER_PATH)
-        features = joblib.load(FEATURES_PATH)
+        modelo, escalonador, features, metadados = _carregar_joblib()
         print("✅ Modelo carregado com sucesso!")
-        return modelo, escalonador, features
+        print("💡 Gere o bundle .exob para carregar mais rápido: python bundle.py converter")
+        metadados_modelo = {"versao_modelo": bundle.VERSAO_PADRAO, **metadados}
+        return aplicar_motor(modelo), escalonador, features
 
     print("=" * 70)
     print("FASE 1: TREINAMENTO DO MODELO FINAL (XGBOOST)")
     print("=" * 70)
     
+    csv_path = caminho_arquivo_treino or DATASET_PATH
+
     # Se não tiver dataset, baixa automaticamente
-    if not os.path.exists(DATASET_PATH):
+    if caminho_arquivo_treino is None and not os.path.exists(DATASET_PATH):
         print("📂 Dataset não encontrado localmente.")
         baixar_dataset()
-    
-    csv_path = DATASET_PATH
-    
-    print(f"\n📖 Carregando dataset de: {csv_path}")
-    try:
-        df = pd.read_csv(csv_path, comment='#')
-        print(f"✅ Dataset carregado: {len(df)} registros")
-    except Exception as e:
-        print(f"❌ ERRO ao ler CSV: {e}")
-        raise
-
-    # Filtra apenas CONFIRMED e FALSE POSITIVE
-    df_model = df[df['koi_disposition'].isin(['CONFIRMED', 'FALSE POSITIVE'])].copy()
-    print(f"📊 Registros após filtro: {len(df_model)} (CONFIRMED + FALSE POSITIVE)")
 
-    features = [
-        'koi_period', 'koi_duration', 'koi_depth', 'koi_prad', 'koi_teq',
-        'koi_insol', 'koi_model_snr', 'koi_impact',
-        'koi_fpflag_nt', 'koi_fpflag_ss', 'koi_fpflag_co', 'koi_fpflag_ec',
-        'koi_steff', 'koi_slogg', 'koi_srad'
-    ]
-    
-    df_model.dropna(subset=features, inplace=True)
-    df_model['target'] = df_model['koi_disposition'].apply(lambda x: 1 if x == 'CONFIRMED' else 0)
+    features = list(FEATURES_MODELO)
+    X, y = carregar_dados_treino(csv_path, features)
 
-    X = df_model[features]
-    y = df_model['target']
-    
     print(f"🎯 Dados prontos para treino: {X.shape[0]} amostras e {X.shape[1]} features")
     print(f"   - Confirmados: {y.sum()}")
     print(f"   - Falsos Positivos: {len(y) - y.sum()}")
 
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.3, random_state=42, stratify=y
-    )
+    from sklearn.preprocessing import StandardScaler
+    from xgboost import XGBClassifier
+    import joblib
+    import ajuste
+
+    X_train, X_test, y_train, y_test = _dividir_treino_teste(X, y)
     scaler = StandardScaler()
     X_train_scaled = scaler.fit_transform(X_train)
+    # Estatísticas de imputação do treino: gravadas junto com o escalonador
+    scaler.medianas_ = X_train.median().to_numpy(dtype=np.float64)
     
-    print("\n🚀 Treinando o modelo XGBoost...")
-    model = XGBClassifier(use_label_encoder=False, eval_metric='logloss', random_state=42)
+    n_jobs = n_jobs or TREINO_N_JOBS
+    tree_method = tree_method or TREINO_TREE_METHOD
+    parametros = {}
+    busca = None
+    if ajustar:
+        folds = folds or ajuste.FOLDS_PADRAO
+        limite = f"{orcamento_s:g} s" if orcamento_s else "sem limite de tempo"
+        print(f"\n🔎 Buscando hiperparâmetros ({folds} folds, {limite})...")
+        busca = ajuste.buscar_hiperparametros(X_train, y_train, folds=folds, orcamento_s=orcamento_s,
+                                              n_jobs=n_jobs, tree_method=tree_method)
+        parametros = busca["melhores_parametros"]
+
+    print(f"\n🚀 Treinando o modelo XGBoost (tree_method={tree_method}, n_jobs={n_jobs or 'todos os núcleos'})...")
+    model = XGBClassifier(use_label_encoder=False, eval_metric='logloss', random_state=42,
+                          n_jobs=n_jobs, tree_method=tree_method, **parametros)
     model.fit(X_train_scaled, y_train)
     print("✅ Modelo treinado com sucesso!")
     
-    accuracy = model.score(scaler.transform(X_test), y_test)
+    metricas_teste = ajuste.avaliar(y_test, model.predict_proba(scaler.transform(X_test))[:, 1])
+    accuracy = metricas_teste["acuracia"]
     print(f"\n📈 ACURÁCIA FINAL DO MODELO: {accuracy * 100:.2f}%")
+    print(f"   AUC {metricas_teste['auc']:.4f} | F1 {metricas_teste['f1']:.4f} | logloss {metricas_teste['logloss']:.4f}")
 
     # Salvar os arquivos
     joblib.dump(model, MODEL_PATH)
@@ -125,44 +196,289 @@ def treinar_modelo_final(caminho_arquivo_treino=None):
     print(f"   - Modelo: {MODEL_PATH}")
     print(f"   - Scaler: {SCALER_PATH}")
     print(f"   - Features: {FEATURES_PATH}")
+    metadados = {
+        "origem": "treino", "acuracia": accuracy, "tree_method": tree_method,
+        "metricas_teste": metricas_teste,
+        "hiperparametros": _hiperparametros(model),
+    }
+    if busca is not None:
+        metadados["validacao_cruzada"] = busca["cv"]
+        metadados["busca"] = {k: busca[k] for k in ("avaliadas", "total_grade", "segundos", "n_jobs")}
+    versao = versao or bundle.VERSAO_PADRAO
+    _arquivar_bundle_ativo(versao)
+    _salvar_bundle(model, scaler, features, metadados, versao)
+    metadados_modelo = {"versao_modelo": versao, **metadados}
+
+    return aplicar_motor(model), scaler, features
+
+def _hiperparametros(modelo):
+    """max_depth, learning_rate e n_estimators efetivos (inclusive os padrões do XGBoost)."""
+    booster = modelo.get_booster()
+    arvore = json.loads(booster.save_config())["learner"]["gradient_booster"]["tree_train_param"]
+    return {"max_depth": int(arvore["max_depth"]), "learning_rate": round(float(arvore["eta"]), 6),
+            "n_estimators": booster.num_boosted_rounds()}
 
-    return model, scaler, features
+def _ler_joblib():
+    import joblib
+    return joblib.load(MODEL_PATH), joblib.load(SCALER_PATH), list(joblib.load(FEATURES_PATH))
 
-def analisar_novo_csv(caminho_arquivo_analise, modelo, escalonador, features):
+def _carregar_joblib():
+    """
+    Artefatos joblib: (modelo, escalonador, features, metadados). O
+    escalonador precisa trazer as medianas do treino (gravadas pelo treino
+    desde que a imputação passou a usá-las); artefatos antigos levantam
+    ValueError e devem ser exportados com `exportar_bundle`.
+    """
+    modelo, escalonador, features = _ler_joblib()
+    if getattr(escalonador, 'medianas_', None) is None:
+        raise ValueError(
+            f"{SCALER_PATH} não tem as medianas do treino, usadas para preencher valores faltantes. "
+            "Gere o bundle com elas a partir do dataset de treino: python bundle.py converter --dataset CSV"
+        )
+    return modelo, escalonador, features, {"origem": "joblib"}
+
+def exportar_bundle(caminho=None, versao=bundle.VERSAO_PADRAO, dataset=None):
+    """
+    Gera o bundle .exob a partir dos artefatos joblib e retorna o caminho
+    gravado (padrão: BUNDLE_PATH).
+
+    Artefatos antigos, sem as medianas do treino ou sem métricas, as
+    recebem aqui a partir do `dataset` de treino (padrão: DATASET_PATH); ver
+    `_completar_medianas` e `_completar_metricas`.
+    """
+    dataset = dataset or DATASET_PATH
+    modelo, escalonador, features = _ler_joblib()
+    _completar_medianas(escalonador, features, dataset)
+    metadados = {"origem": "joblib"}
+    _completar_metricas(modelo, escalonador, features, metadados, dataset)
+    return bundle.salvar_bundle(caminho or BUNDLE_PATH, modelo, escalonador, features, versao, metadados)
+
+def _dividir_treino_teste(X, y):
+    """Divisão treino/teste determinística (mesma usada para recalcular as medianas)."""
+    from sklearn.model_selection import train_test_split
+    return train_test_split(X, y, test_size=0.3, random_state=42, stratify=y)
+
+def _divisao_do_treino(escalonador, features, dataset):
+    """
+    (X_train, X_test, y_train, y_test) do `dataset` com a divisão do treino,
+    conferida contra o escalonador: média e desvio de X_train têm de bater
+    com mean_ e scale_ (ajustados sobre o X_train original). ValueError se o
+    dataset não existe ou não é o usado no treino.
+    """
+    if not os.path.exists(dataset):
+        raise ValueError(f"Dataset de treino não encontrado: {dataset}")
+    X, y = carregar_dados_treino(dataset, features)
+    divisao = _dividir_treino_teste(X, y)
+    X_train = divisao[0].to_numpy(dtype=np.float64)
+    if (X_train.shape[1] != len(escalonador.mean_)
+            or not np.allclose(X_train.mean(axis=0), escalonador.mean_, rtol=1e-6, atol=0)
+            or not np.allclose(X_train.std(axis=0), escalonador.scale_, rtol=1e-6, atol=0)):
+        raise ValueError(f"{dataset} não reproduz o conjunto de treino do modelo (média/escala do escalonador não batem)")
+    return divisao
+
+def _completar_medianas(escalonador, features, dataset):
+    """
+    Artefatos antigos não têm as medianas do treino: recalcula a partir do
+    dataset de treino, com a mesma divisão (ver `_divisao_do_treino`).
+    Retorna True se recalculou.
+    """
+    if getattr(escalonador, 'medianas_', None) is not None:
+        return False
+    X_train = _divisao_do_treino(escalonador, features, dataset)[0]
+    escalonador.medianas_ = X_train.median().to_numpy(dtype=np.float64)
+    print(f"📐 Medianas do treino recalculadas a partir de: {dataset}")
+    return True
+
+def _completar_metricas(modelo, escalonador, features, metadados, dataset):
+    """
+    Artefatos sem métricas gravadas: mede o modelo no conjunto de teste da
+    divisão do treino e guarda em `metadados`. Só mede se o `dataset`
+    reproduz o treino (ver `_divisao_do_treino`): assim nenhuma linha usada
+    no ajuste entra nas métricas. Retorna True se mediu; senão as métricas
+    ficam desconhecidas.
+    """
+    if "metricas_teste" in metadados:
+        return False
+    try:
+        _, X_test, _, y_test = _divisao_do_treino(escalonador, features, dataset)
+    except ValueError as e:
+        print(f"⚠️  Métricas do modelo desconhecidas: {e}")
+        return False
+    import ajuste
+    metadados["metricas_teste"] = ajuste.avaliar(y_test, modelo.predict_proba(escalonador.transform(X_test))[:, 1])
+    metadados["acuracia"] = metadados["metricas_teste"]["acuracia"]
+    print(f"📏 Métricas do modelo medidas nas {len(X_test)} linhas de teste (fora do treino) de: {dataset}")
+    return True
+
+def carregar_dados_treino(csv_path, features):
+    """
+    Matriz de features e rótulos (1 = CONFIRMED, 0 = FALSE POSITIVE) do CSV
+    de treino, já filtrados e sem valores ausentes.
+
+    O resultado fica em CACHE_TREINO_PATH (.npz), chaveado pelo sha256 do CSV
+    e pela lista de features: retreinar com o mesmo arquivo não relê o CSV.
+    """
+    chave = _hash_arquivo(csv_path)
+    try:
+        with np.load(CACHE_TREINO_PATH, allow_pickle=False) as cache:
+            if str(cache['sha256']) == chave and cache['features'].tolist() == list(features):
+                print(f"\n⚡ Dataset pré-processado em cache: {CACHE_TREINO_PATH}")
+                return pd.DataFrame(cache['X'], columns=features), pd.Series(cache['y'], name='target')
+    except (OSError, KeyError, ValueError):
+        pass
+
+    print(f"\n📖 Carregando dataset de: {csv_path}")
+    try:
+        colunas = set(features) | {'koi_disposition'}
+        df = pd.read_csv(csv_path, comment='#', usecols=lambda col: col in colunas)
+        print(f"✅ Dataset carregado: {len(df)} registros")
+    except Exception as e:
+        print(f"❌ ERRO ao ler CSV: {e}")
+        raise
+
+    # Filtra apenas CONFIRMED e FALSE POSITIVE
+    df_model = df[df['koi_disposition'].isin(['CONFIRMED', 'FALSE POSITIVE'])].copy()
+    print(f"📊 Registros após filtro: {len(df_model)} (CONFIRMED + FALSE POSITIVE)")
+
+    df_model.dropna(subset=features, inplace=True)
+    X = df_model[features].astype(np.float64).reset_index(drop=True)
+    y = (df_model['koi_disposition'] == 'CONFIRMED').astype(np.int64).reset_index(drop=True).rename('target')
+
+    try:
+        # Grava em arquivo temporário e renomeia: outro processo nunca lê um cache pela metade
+        caminho_tmp = CACHE_TREINO_PATH + ".tmp.npz"
+        np.savez(caminho_tmp, X=X.to_numpy(), y=y.to_numpy(), features=np.array(features), sha256=chave)
+        os.replace(caminho_tmp, CACHE_TREINO_PATH)
+    except OSError as e:
+        print(f"⚠️  Não foi possível gravar o cache de treino {CACHE_TREINO_PATH}: {e}")
+    return X, y
+
+def _hash_arquivo(caminho):
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+def aplicar_motor(modelo, motor=None):
+    """
+    Troca o XGBClassifier pelo motor compilado quando `motor` (ou
+    EXO_MOTOR_INFERENCIA) é "compilado". Se a compilação falhar (ex.: sem
+    numba), segue com o XGBoost e avisa; um ModeloCompilado vindo do bundle
+    vira o booster dele (ver `_motor_xgboost`).
+    """
+    motor = motor or MOTOR_INFERENCIA
+    if motor == "xgboost":
+        return _motor_xgboost(modelo)
+    if motor != "compilado":
+        print(f"⚠️  Motor de inferência desconhecido '{motor}'; usando xgboost")
+        return _motor_xgboost(modelo)
+
+    try:
+        compilado = _compilar(modelo)
+    except Exception as e:
+        print(f"⚠️  Não foi possível usar o motor compilado ({e}); usando xgboost")
+        return _motor_xgboost(modelo)
+    print("⚡ Motor de inferência compilado ativo")
+    return compilado
+
+def _motor_xgboost(modelo):
+    """
+    O modelo pontuando com o XGBoost. Com o motor compilado, o bundle não
+    carrega o booster: aqui ele é lido do bundle (ModeloCompilado.booster)
+    e embrulhado em um ModeloBooster.
+    """
+    import arvores
+    if isinstance(modelo, arvores.ModeloCompilado):
+        return bundle.ModeloBooster(modelo.booster)
+    return modelo
+
+def _compilar(modelo, aquecer=True):
+    import arvores
+    if isinstance(modelo, arvores.ModeloCompilado):
+        compilado = modelo
+    else:
+        compilado = arvores.ModeloCompilado.de_booster(modelo)
+    if aquecer:
+        # Compila o kernel agora, não na primeira requisição
+        compilado.predict_proba(np.zeros((1, compilado.n_features), dtype=np.float32))
+    return compilado
+
+def motor_rapido(modelo):
+    """
+    Motor para pontuar uma ou poucas linhas com a menor latência: o
+    compilado (~15 µs por chamada) em vez do XGBoost, que tem ~0,4 ms de
+    custo fixo por chamada. Sem numba (ou com um numba que não importa),
+    fica o XGBoost (ver `_motor_xgboost`). As probabilidades diferem das do
+    XGBoost em menos de 1e-6.
+
+    O kernel é carregado aqui (numba: ~1 s entre import e leitura do
+    cache), para que um numba quebrado apareça na carga do modelo e não na
+    primeira requisição.
+    """
+    if importlib.util.find_spec("numba") is None:
+        print("⚠️  numba não instalado: pontuação rápida usa xgboost")
+        return _motor_xgboost(modelo)
+    try:
+        return _compilar(modelo)
+    except Exception as e:
+        print(f"⚠️  Motor compilado indisponível para pontuação rápida ({e}); usando xgboost")
+        return _motor_xgboost(modelo)
+
+def _arquivar_bundle_ativo(nova_versao):
+    """
+    Copia o bundle atual para MODELOS_DIR/<versão>.exob antes de ele ser
+    substituído por outra versão, para que continue disponível na API.
+    """
+    try:
+        anterior = bundle.ler_versao(BUNDLE_PATH)
+    except (OSError, ValueError):
+        return
+    destino = os.path.join(MODELOS_DIR, f"{anterior}.exob")
+    if anterior == nova_versao or os.path.exists(destino):
+        return
+    try:
+        os.makedirs(MODELOS_DIR, exist_ok=True)
+        temporario = destino + ".tmp"
+        shutil.copyfile(BUNDLE_PATH, temporario)
+        os.replace(temporario, destino)
+        print(f"🗄️  Versão anterior {anterior} arquivada em: {destino}")
+    except OSError as e:
+        print(f"⚠️  Não foi possível arquivar a versão anterior {anterior}: {e}")
+
+def _salvar_bundle(modelo, escalonador, features, metadados, versao=bundle.VERSAO_PADRAO):
+    """Gera o bundle .exob; falhas (ex.: disco somente leitura) não impedem o uso do modelo."""
+    try:
+        bundle.salvar_bundle(BUNDLE_PATH, modelo, escalonador, features, versao, metadados)
+        print(f"   - Bundle: {BUNDLE_PATH}")
+    except Exception as e:
+        print(f"⚠️  Não foi possível gerar o bundle {BUNDLE_PATH}: {e}")
+
+def analisar_novo_csv(caminho_arquivo_analise, modelo, escalonador, features, explicar=False):
     """
     Analisa um novo CSV com o modelo treinado e retorna DataFrame.
+    Com `explicar=True`, inclui as contribuições de cada feature (ver `calcular_contribuicoes`).
     """
     print("\n" + "=" * 70)
     print(f"FASE 2: ANALISANDO ARQUIVO")
     print("=" * 70)
 
     try:
-        # Se for StringIO ou arquivo, carrega com comment='#' para ignorar linhas de comentário
+        # Caminho, StringIO ou arquivo: o leitor trabalha sobre os bytes
         if isinstance(caminho_arquivo_analise, str) and '.csv' in caminho_arquivo_analise:
-            df_analise = pd.read_csv(
-                caminho_arquivo_analise, 
-                comment='#',  # Ignora linhas que começam com #
-                on_bad_lines='skip'
-            )
+            with open(caminho_arquivo_analise, 'rb') as f:
+                conteudo = f.read()
+        elif hasattr(caminho_arquivo_analise, 'getvalue'):
+            conteudo = caminho_arquivo_analise.getvalue()
+        elif hasattr(caminho_arquivo_analise, 'read'):
+            caminho_arquivo_analise.seek(0)
+            conteudo = caminho_arquivo_analise.read()
         else:
-            # Para StringIO, lê o conteúdo e remove comentários manualmente
-            if hasattr(caminho_arquivo_analise, 'getvalue'):
-                text = caminho_arquivo_analise.getvalue()
-            elif hasattr(caminho_arquivo_analise, 'read'):
-                caminho_arquivo_analise.seek(0)
-                text = caminho_arquivo_analise.read()
-            else:
-                text = str(caminho_arquivo_analise)
-            
-            # Remove linhas de comentário
-            lines = text.split('\n')
-            data_lines = [line for line in lines if not line.strip().startswith('#')]
-            clean_text = '\n'.join(data_lines)
-            
-            df_analise = pd.read_csv(
-                io.StringIO(clean_text),
-                on_bad_lines='skip'
-            )
+            conteudo = str(caminho_arquivo_analise)
+        if isinstance(conteudo, str):
+            conteudo = conteudo.encode('utf-8')
+
+        df_analise, _, _ = leitor.ler_csv(conteudo, features)
         
         print(f"📊 Arquivo carregado: {df_analise.shape[0]} candidatos, {df_analise.shape[1]} colunas")
         
@@ -171,42 +487,238 @@ def analisar_novo_csv(caminho_arquivo_analise, modelo, escalonador, features):
         print(f"   Tipo do erro: {type(e).__name__}")
         return None
         
+    return analisar_dataframe(df_analise, modelo, escalonador, features, explicar=explicar)
+
+def analisar_dataframe(df_analise, modelo, escalonador, features, avisar=True, explicar=False):
+    """
+    Analisa um DataFrame já carregado (sem reler nem decodificar o CSV)
+    e retorna o DataFrame de resultados, ou None se faltar `kepoi_name`.
+    Com `explicar=True`, inclui as colunas de contribuição por feature.
+    """
     # Valida se contém a coluna de identificação
     if 'kepoi_name' not in df_analise.columns:
         print("❌ ERRO: O arquivo CSV precisa conter a coluna 'kepoi_name'")
         return None
     
-    ids = df_analise['kepoi_name']
-    
-    # Preenche valores ausentes
-    X_analise = df_analise.copy()
-    for col in features:
-        if col not in X_analise.columns:
-            print(f"⚠️  Coluna '{col}' não encontrada, preenchendo com 0")
-            X_analise[col] = 0
-        elif X_analise[col].isnull().any():
-            median_val = X_analise[col].median()
-            X_analise.loc[:, col] = X_analise[col].fillna(median_val)
-            
-    X_analise_features = X_analise[features]
-    X_analise_scaled = escalonador.transform(X_analise_features)
-    
-    # Predição
-    print("🔮 Calculando probabilidades...")
-    probabilidades = modelo.predict_proba(X_analise_scaled)
-    confianca_exoplaneta = probabilidades[:, 1]
+    if avisar:
+        print("🔮 Calculando probabilidades...")
+    contribuicoes = None
+    if explicar:
+        # A mesma matriz preenchida vai para o modelo e para as contribuições
+        X = preparar_matriz(df_analise, features, avisar, medianas=medianas_do_treino(escalonador))
+        confianca_exoplaneta, _ = pontuar_candidatos(X, modelo, escalonador, features, avisar)
+        contribuicoes = calcular_contribuicoes(X, modelo, escalonador, features)
+    else:
+        confianca_exoplaneta, _ = pontuar_candidatos(
+            df_analise, modelo, escalonador, features, avisar
+        )
     
     # Monta DataFrame final
-    df_resultados = pd.DataFrame({
-        'kepoi_name': ids,
-        'Confianca_Calculada': confianca_exoplaneta,
-        'Veredito_do_Modelo': [
-            "Planeta Confirmado" if p > 0.5 else "Falso Positivo"
-            for p in confianca_exoplaneta
-        ]
-    })
+    df_resultados = montar_resultados(df_analise['kepoi_name'], confianca_exoplaneta, contribuicoes, features)
     
-    print("✅ Análise concluída!")
+    if avisar:
+        print("✅ Análise concluída!")
     return df_resultados
 
-__all__ = ["treinar_modelo_final", "analisar_novo_csv"]
\ No newline at end of file
+def _preparar_features(df_analise, features, avisar, medianas):
+    """
+    Matriz float64 com apenas as colunas de features, na ordem do modelo, e
+    os valores ausentes preenchidos.
+
+    Colunas inexistentes e valores faltantes recebem a mediana da feature no
+    treino (`medianas`) em um único preenchimento vetorizado, e o resultado
+    de cada linha não depende das outras linhas do arquivo.
+    """
+    if isinstance(df_analise, np.ndarray):
+        return _completar_matriz(df_analise, medianas)
+
+    ausentes = [col for col in features if col not in df_analise.columns]
+    if ausentes and avisar:
+        print(f"⚠️  Colunas não encontradas, preenchendo com a mediana do treino: {', '.join(ausentes)}")
+    X = df_analise.reindex(columns=features).to_numpy(dtype=np.float64)
+    _preencher_faltantes(X, medianas)
+    return X
+
+def _preencher_faltantes(X, medianas):
+    """Troca, no próprio X, cada NaN pela mediana da sua coluna."""
+    faltantes = np.isnan(X)
+    if faltantes.any():
+        np.copyto(X, np.broadcast_to(np.asarray(medianas, dtype=X.dtype), X.shape), where=faltantes)
+
+def _completar_matriz(X, medianas):
+    """
+    Preenche os NaN de uma matriz já na ordem das features com as medianas
+    do treino, copiando só se houver o que preencher (X pode ser uma view
+    somente leitura do upload).
+    """
+    faltantes = np.isnan(X)
+    if not faltantes.any():
+        return X
+    if not X.flags.writeable or X.base is not None:
+        X = X.copy()
+    np.copyto(X, np.broadcast_to(np.asarray(medianas, dtype=X.dtype), X.shape), where=faltantes)
+    return X
+
+def medianas_do_treino(escalonador):
+    """
+    Medianas das features no treino. Todo escalonador carregado as tem: o
+    bundle e os artefatos joblib sem elas não carregam (ver `exportar_bundle`).
+    """
+    return escalonador.medianas_
+
+def preparar_matriz(df_analise, features, avisar=False, *, medianas):
+    """
+    Matriz float64 (n x len(features)) já com os valores ausentes preenchidos
+    com `medianas` (use `medianas_do_treino(escalonador)`), pronta para
+    `pontuar_candidatos`.
+
+    Também aceita uma matriz já na ordem de `features` (ex.: de um upload
+    binário), que mantém o dtype float32/float64.
+    """
+    with metricas.etapa("impute"):
+        return _preparar_features(df_analise, features, avisar, medianas)
+
+def vereditos(confianca_exoplaneta):
+    """Veredito de cada candidato (limiar 0,5)."""
+    return np.where(confianca_exoplaneta > 0.5, "Planeta Confirmado", "Falso Positivo")
+
+def montar_resultados(ids, confianca_exoplaneta, contribuicoes=None, features=None):
+    """
+    DataFrame de resultados (nome, confiança e veredito) no formato da API.
+    Com `contribuicoes` (de `calcular_contribuicoes`), mais uma coluna por
+    feature e a da base, nomeadas por `colunas_contribuicao(features)`.
+    """
+    colunas = {
+        'kepoi_name': ids,
+        'Confianca_Calculada': confianca_exoplaneta,
+        'Veredito_do_Modelo': vereditos(confianca_exoplaneta)
+    }
+    if contribuicoes is not None:
+        colunas.update(zip(colunas_contribuicao(features), contribuicoes.T))
+    return pd.DataFrame(colunas)
+
+def colunas_contribuicao(features):
+    """Colunas de contribuição nos resultados: uma por feature e a base."""
+    return [PREFIXO_CONTRIBUICAO + f for f in features] + [PREFIXO_CONTRIBUICAO + "base"]
+
+def pontuar_candidatos(dados, modelo, escalonador, features, avisar=True):
+    """
+    Núcleo de pontuação: recebe um DataFrame já carregado ou uma matriz
+    (n_candidatos x n_features, na ordem de `features`, ex.: float32) e
+    retorna (probabilidades de ser exoplaneta, vereditos).
+
+    Matrizes float32 ou float64 são usadas como vieram; outros tipos viram float64.
+    NaN são preenchidos com as medianas do treino.
+    Linhas já vistas com o mesmo modelo saem do `cache_predicoes`.
+    """
+    medianas = medianas_do_treino(escalonador)
+    if isinstance(dados, pd.DataFrame):
+        with metricas.etapa("impute"):
+            X = _preparar_features(dados, features, avisar, medianas)
+    else:
+        X = np.asarray(dados)
+        if X.dtype not in (np.float32, np.float64):
+            X = X.astype(np.float64)
+        if X.ndim != 2 or X.shape[1] != len(features):
+            raise ValueError(
+                f"Matriz de features deve ter formato (n, {len(features)}), recebido {X.shape}"
+            )
+        if np.isnan(X).any():
+            with metricas.etapa("impute"):
+                X = X.copy()
+                _preencher_faltantes(X, medianas)
+
+    def pontuar(X_faltantes):
+        # Mantém os nomes de colunas com que o escalonador foi ajustado
+        with metricas.etapa("scale"):
+            X_scaled = escalonador.transform(pd.DataFrame(X_faltantes, columns=features, copy=False))
+        with metricas.etapa("infer"):
+            return modelo.predict_proba(X_scaled)[:, 1]
+
+    versao = cache_predicoes.versao(modelo, escalonador)
+    confianca_exoplaneta = cache_predicoes.pontuar(X, versao, pontuar)
+    return confianca_exoplaneta, vereditos(confianca_exoplaneta)
+
+def pontuar_direto(X, modelo, escalonador):
+    """
+    Probabilidades para poucas linhas já completas (float64, na ordem das
+    features), sem DataFrame e sem o cache de predições: para uma linha,
+    calcular o hash custa mais do que pontuá-la. Mesma aritmética do
+    escalonador em `pontuar_candidatos`.
+    """
+    with metricas.etapa("scale"):
+        X_scaled = (X - escalonador.mean_) / escalonador.scale_
+    with metricas.etapa("infer"):
+        return modelo.predict_proba(X_scaled)[:, 1]
+
+def calcular_contribuicoes(X, modelo, escalonador, features):
+    """
+    Contribuição de cada feature para a predição de cada linha de X (já
+    preenchida, como em `pontuar_candidatos`): valores SHAP exatos do
+    XGBoost (`pred_contribs`), calculados para a matriz inteira em uma
+    chamada. Ficam em log-odds: positivos puxam para "Planeta Confirmado",
+    negativos para "Falso Positivo"; a última coluna é a base (a predição
+    média do modelo) e a soma da linha é o logit da confiança.
+
+    O motor compilado só pontua: as contribuições vêm do booster de origem.
+    Não passam pelo cache de predições.
+    """
+    from xgboost import DMatrix
+
+    booster = modelo.get_booster() if hasattr(modelo, "get_booster") else getattr(modelo, "booster", None)
+    if booster is None:
+        raise ValueError("O modelo não tem o booster do XGBoost para calcular as contribuições")
+    with metricas.etapa("scale"):
+        X_scaled = escalonador.transform(pd.DataFrame(X, columns=features, copy=False))
+    with metricas.etapa("explain"):
+        # Mesmas árvores que o predict_proba usa (após early stopping, até a melhor iteração)
+        melhor_iteracao = booster.attr("best_iteration")
+        arvores = (0, int(melhor_iteracao) + 1) if melhor_iteracao is not None else (0, 0)
+        return booster.predict(DMatrix(X_scaled), pred_contribs=True, iteration_range=arvores)
+
+def analisar_csv_em_blocos(arquivo, modelo, escalonador, features, sep=',',
+                           encoding='utf-8', tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Analisa um CSV em blocos de `tamanho_bloco` linhas, gerando um DataFrame
+    de resultados por bloco assim que ele é pontuado.
+
+    Lê apenas `kepoi_name` e as colunas de features, deixando o pandas
+    descartar as linhas de comentário, então o uso de memória depende do
+    tamanho do bloco e não do tamanho do arquivo. Os valores ausentes são
+    preenchidos com as medianas do treino.
+    """
+    for bloco in leitor.ler_csv_em_blocos(arquivo, features, sep, encoding, tamanho_bloco):
+        yield analisar_dataframe(bloco, modelo, escalonador, features, avisar=False)
+
+__all__ = [
+    "treinar_modelo_final", "analisar_novo_csv", "analisar_dataframe",
+    "analisar_csv_em_blocos", "pontuar_candidatos", "pontuar_direto", "preparar_matriz",
+    "montar_resultados", "vereditos", "calcular_contribuicoes", "colunas_contribuicao", "aplicar_motor", "motor_rapido", "carregar_dados_treino",
+    "medianas_do_treino"
+]
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Retreina o modelo e regenera os artefatos (joblib e bundle).")
+    parser.add_argument("--arquivo", help="CSV de treino (padrão: dataset da NASA em cache)")
+    parser.add_argument("--n-jobs", type=int, help="threads do XGBoost (padrão: EXO_TREINO_N_JOBS ou todos os núcleos)")
+    parser.add_argument("--tree-method", help="algoritmo das árvores (padrão: EXO_TREINO_TREE_METHOD ou hist)")
+    parser.add_argument("--atualizar-dataset", action="store_true",
+                        help="atualiza o dataset da NASA antes de treinar (só baixa as colunas do modelo); "
+                             "se nada mudou, não retreina")
+    parser.add_argument("--ajustar", action="store_true",
+                        help="busca max_depth, learning_rate e n_estimators com validação cruzada antes do treino final")
+    parser.add_argument("--folds", type=int, default=None, help="folds da validação cruzada (padrão: 5)")
+    parser.add_argument("--orcamento", type=float, help="tempo máximo da busca, em segundos (padrão: sem limite)")
+    parser.add_argument("--versao", help=f"versão gravada no modelo (padrão: {bundle.VERSAO_PADRAO}); "
+                                         "a versão anterior é arquivada em EXO_MODEL_DIR")
+    args = parser.parse_args()
+
+    if args.atualizar_dataset and not baixar_dataset() and args.arquivo is None and os.path.exists(BUNDLE_PATH):
+        # Mesmo dataset, mesmo modelo: retreinar só gastaria tempo
+        print("✅ Nada mudou no dataset; modelo atual mantido (rode sem --atualizar-dataset para retreinar)")
+        raise SystemExit(0)
+
+    treinar_modelo_final(args.arquivo, retreinar=True, n_jobs=args.n_jobs, tree_method=args.tree_method,
+                         ajustar=args.ajustar, folds=args.folds, orcamento_s=args.orcamento, versao=args.versao)
\ No newline at end of file
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+Registro dos modelos servidos pela API, com recarga a quente.
+
+O modelo ativo é o bundle principal (model.BUNDLE_PATH); outras versões,
+para comparação lado a lado em /predict?model=vX, são os bundles .exob de
+EXO_MODEL_DIR (retreinar com `python model.py --versao vX` arquiva ali a
+versão que estava ativa). O registro é por processo do uvicorn.
+
+Cada versão carregada é um ServedModel imutável: a requisição pega a
+referência uma vez no início e usa o mesmo objeto até o fim, então trocar
+o modelo ativo não afeta requisições em andamento. Uma thread vigia os
+arquivos (mtime e tamanho) a cada EXO_MODEL_RELOAD_S segundos; um bundle
+novo ou alterado é carregado nessa thread, fora do event loop, e só então
+entra no registro, trocando a referência de uma vez. POST /models/reload
+força a verificação na hora.
+
+O motor de poucas linhas (`rapido`, ver model.motor_rapido) é montado junto
+com a versão, fora do event loop. Na partida, o do ativo é montado em uma
+thread (o numba leva ~1 s para carregar); até ficar pronto, /predict/json
+usa o próprio modelo servido.
+"""
+import os
+import threading
+from collections import namedtuple
+
+import bundle
+import model
+
+# `modelo` é o motor configurado (EXO_MOTOR_INFERENCIA); `rapido`, o usado para poucas linhas
+# (/predict/json, ver model.motor_rapido)
+ServedModel = namedtuple("ServedModel", "versao modelo escalonador features metadados caminho assinatura rapido")
+
+
+class ModelUnavailableError(RuntimeError):
+    """O bundle da versão pedida mudou ou sumiu do disco (a requisição pode ser repetida)."""
+
+
+def assinatura(caminho):
+    """(mtime_ns, tamanho) do arquivo, ou None se ele não existe."""
+    try:
+        st = os.stat(caminho)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def carregar_versao(caminho, rapido=True):
+    """
+    Carrega um bundle como ServedModel (com o motor de inferência
+    configurado). `rapido=False` pula a compilação do motor de poucas linhas
+    (`rapido` fica o próprio modelo).
+    """
+    servido, base = _ler_versao(caminho)
+    return servido._replace(rapido=model.motor_rapido(base)) if rapido else servido
+
+
+def _ler_versao(caminho):
+    """(ServedModel com `rapido` = o próprio modelo, modelo de onde montar o motor de poucas linhas)."""
+    # Assinatura antes da leitura: se o arquivo for trocado no meio, a próxima verificação recarrega
+    antes = assinatura(caminho)
+    carregado = bundle.carregar_bundle(caminho, model.MOTOR_INFERENCIA)
+    modelo = model.aplicar_motor(carregado.modelo)
+    servido = ServedModel(carregado.metadados["versao_modelo"], modelo, carregado.escalonador, carregado.features,
+                          carregado.metadados, caminho, antes, modelo)
+    # O motor de poucas linhas usa as tabelas mapeadas do bundle, quando existem, em vez de recompilar o booster
+    return servido, carregado.compilado or modelo
+
+
+class ModelRegistry:
+    """
+    Versões carregadas: a ativa e as do diretório, indexadas pela versão
+    gravada no bundle. Leituras (`obter`) não usam lock; as recargas são
+    serializadas e publicam um dicionário novo a cada mudança.
+    """
+
+    def __init__(self, caminho_ativo, diretorio=None, intervalo_s=5.0):
+        self.caminho_ativo = caminho_ativo
+        self.diretorio = diretorio
+        self.intervalo_s = intervalo_s
+        self.recargas = 0
+        self.falhas = 0
+        self._ativo = None
+        self._versoes = {}
+        self._assinaturas_com_erro = {}
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+        self._thread_rapido = None
+
+    @property
+    def ativo(self):
+        return self._ativo
+
+    def carregar_inicial(self):
+        """
+        Carrega o modelo ativo e as versões do diretório. Retorna o ativo.
+
+        O bundle ativo é aberto direto (`carregar_versao`: sem scikit-learn
+        nem joblib, e com o motor compilado sem XGBoost). Sem bundle no disco
+        (ex.: pasta somente leitura), usa `model.treinar_modelo_final`
+        (joblib ou treino), que grava o bundle se treinar.
+        """
+        if assinatura(self.caminho_ativo) is not None:
+            ativo, base = _ler_versao(self.caminho_ativo)
+            model.metadados_modelo = ativo.metadados
+            print(f"🧠 Modelo {ativo.versao} carregado do bundle: {self.caminho_ativo}")
+        else:
+            modelo, escalonador, features = model.treinar_modelo_final()
+            metadados = dict(model.metadados_modelo)
+            # Sem bundle gravado (ex.: pasta somente leitura) o ativo não tem arquivo para recarregar
+            atual = assinatura(self.caminho_ativo)
+            ativo = ServedModel(metadados.get("versao_modelo", bundle.VERSAO_PADRAO), modelo, escalonador,
+                                features, metadados, self.caminho_ativo if atual else None, atual, modelo)
+            base = modelo
+        with self._lock:
+            self._ativo = ativo
+        self._montar_rapido(ativo, base)
+        self.verificar()
+        return self._ativo
+
+    def _montar_rapido(self, servido, base):
+        """
+        Monta o motor de poucas linhas do ativo em uma thread e o publica
+        quando pronto, se `servido` ainda é o ativo.
+        """
+        def montar():
+            try:
+                rapido = model.motor_rapido(base)
+            except Exception as e:
+                print(f"⚠️  Motor de poucas linhas indisponível ({e}); usando o modelo servido")
+                return
+            with self._lock:
+                if self._ativo is servido:
+                    self._ativo = servido._replace(rapido=rapido)
+
+        self._thread_rapido = threading.Thread(target=montar, name="model-registry-rapido", daemon=True)
+        self._thread_rapido.start()
+
+    def aguardar_rapido(self, timeout=None):
+        """Espera o motor de poucas linhas do ativo montado na partida. Retorna False se o tempo acabou."""
+        if self._thread_rapido is not None:
+            self._thread_rapido.join(timeout)
+            return not self._thread_rapido.is_alive()
+        return True
+
+    def obter(self, versao=None):
+        """O modelo ativo (sem versão ou com a versão dele) ou a versão pedida; KeyError se não existe."""
+        ativo = self._ativo
+        if versao is None or (ativo is not None and versao == ativo.versao):
+            return ativo
+        return self._versoes[versao]
+
+    def versoes(self):
+        """Versões disponíveis, a ativa primeiro."""
+        servidos = ([self._ativo] if self._ativo is not None else []) + sorted(
+            self._versoes.values(), key=lambda s: s.versao
+        )
+        return [
+            {
+                "version": s.versao,
+                "active": s is self._ativo,
+                "createdAt": s.metadados.get("criado_em"),
+                "accuracy": s.metadados.get("acuracia"),
+                "path": s.caminho,
+            }
+            for s in servidos
+        ]
+
+    def verificar(self):
+        """Carrega bundles novos ou alterados e remove os apagados. Retorna as versões (re)carregadas."""
+        with self._lock:
+            carregadas = []
+            anteriores = [self._ativo, *self._versoes.values()]
+
+            atual = assinatura(self.caminho_ativo)
+            if atual is not None and (self._ativo is None or atual != self._ativo.assinatura):
+                novo = self._carregar(self.caminho_ativo, atual)
+                if novo is not None:
+                    self._ativo = novo
+                    carregadas.append(novo.versao)
+
+            por_caminho = {s.caminho: s for s in self._versoes.values()}
+            versoes = {}
+            for caminho in self._arquivos_do_diretorio():
+                atual = assinatura(caminho)
+                servido = por_caminho.get(caminho)
+                if servido is None or servido.assinatura != atual:
+                    try:
+                        # A versão ativa não é carregada duas vezes
+                        if self._ativo is not None and bundle.ler_versao(caminho) == self._ativo.versao:
+                            continue
+                    except (OSError, ValueError):
+                        pass
+                    novo = self._carregar(caminho, atual)
+                    if novo is not None:
+                        servido = novo
+                        carregadas.append(novo.versao)
+                    elif servido is None:
+                        continue
+                    # Se a nova leitura falhou, a versão já carregada continua servindo
+                if self._ativo is not None and servido.versao == self._ativo.versao:
+                    continue
+                if servido.versao in versoes:
+                    print(f"⚠️  Versão {servido.versao} repetida em {caminho}; usando {versoes[servido.versao].caminho}")
+                    continue
+                versoes[servido.versao] = servido
+            self._versoes = versoes
+
+            em_uso = [self._ativo, *versoes.values()]
+            self._descartar_predicoes([s for s in anteriores if s is not None and not any(s is u for u in em_uso)],
+                                      [s for s in em_uso if s is not None])
+            self.recargas += len(carregadas)
+            return carregadas
+
+    def _arquivos_do_diretorio(self):
+        if not self.diretorio or not os.path.isdir(self.diretorio):
+            return []
+        return sorted(
+            os.path.join(self.diretorio, nome) for nome in os.listdir(self.diretorio) if nome.endswith(".exob")
+        )
+
+    def _carregar(self, caminho, atual):
+        # Um arquivo que falhou só é tentado de novo quando mudar
+        if self._assinaturas_com_erro.get(caminho) == atual:
+            return None
+        try:
+            servido = carregar_versao(caminho)
+        except Exception as e:
+            self.falhas += 1
+            self._assinaturas_com_erro[caminho] = atual
+            print(f"⚠️  Não foi possível carregar o modelo {caminho}: {e}")
+            return None
+        self._assinaturas_com_erro.pop(caminho, None)
+        print(f"🔄 Modelo {servido.versao} carregado de {caminho}")
+        return servido
+
+    @staticmethod
+    def _descartar_predicoes(removidos, em_uso):
+        """Tira do cache de predições as versões que deixaram de ser servidas."""
+        cache = model.cache_predicoes
+        if not removidos or cache.max_entradas <= 0:
+            return
+        impressoes = {cache.versao(s.modelo, s.escalonador) for s in em_uso}
+        for servido in removidos:
+            impressao = cache.versao(servido.modelo, servido.escalonador)
+            if impressao not in impressoes:
+                cache.descartar(impressao)
+
+    def iniciar(self):
+        """Começa a vigiar os bundles em segundo plano (intervalo 0 desliga)."""
+        if self.intervalo_s <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._vigiar, name="model-registry", daemon=True)
+        self._thread.start()
+
+    def _vigiar(self):
+        while not self._parar.wait(self.intervalo_s):
+            try:
+                self.verificar()
+            except Exception as e:
+                print(f"⚠️  Erro ao verificar modelos: {e}")
+
+    def stats(self):
+        return {
+            "active": self._ativo.versao if self._ativo is not None else None,
+            "versions": len(self._versoes) + (self._ativo is not None),
+            "reloads": self.recargas,
+            "failures": self.falhas,
+            "reload_interval_s": self.intervalo_s
+        }
+
+    def shutdown(self):
+        self._parar.set()
+        self.aguardar_rapido()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+Etapas pesadas (CPU) do /predict: decodificação, detecção do delimitador,
+leitura do CSV (ou do upload Parquet/Arrow/.npy), pontuação e renderização
+do CSV de saída.
+
+Tudo aqui é síncrono e roda fora do event loop, dentro do InferencePool.
+As funções só recebem e retornam objetos serializáveis, para funcionarem
+tanto em threads quanto em processos separados.
+"""
+import io
+import os
+import base64
+import tarfile
+import zipfile
+
+import leitor
+import metricas
+import model
+import model_registry
+
+# Modelo carregado em cada processo do pool (modo "process")
+_modelo_worker = None
+# Versões carregadas sob demanda em cada processo do pool, por caminho do bundle
+_versoes_worker = {}
+
+
+# Membros de arquivos compactados são lidos em blocos deste tamanho, conferindo os limites do lote a cada bloco
+BLOCO_MEMBRO = 1 << 20
+# A taxa de compressão só é conferida depois deste tanto de bytes compactados (arquivos pequenos comprimem muito)
+PISO_COMPACTADO = 1 << 20
+
+
+class UploadParseError(ValueError):
+    """O upload não pôde ser lido como CSV (vira HTTP 400)."""
+
+
+class BatchTooLargeError(UploadParseError):
+    """O lote passa do limite de bytes descompactados ou da taxa de compressão (vira HTTP 413)."""
+
+
+class BytesDoLote:
+    """
+    Bytes descompactados de um /predict/batch, somados enquanto os membros
+    são lidos: levanta BatchTooLargeError ao passar de `max_total` ou, com
+    `compactados` (função que retorna os bytes compactados consumidos até
+    agora), de `max_taxa` bytes descompactados por byte compactado. Zero
+    desliga cada limite.
+    """
+
+    def __init__(self, max_total=0, max_taxa=0, compactados=None):
+        self.max_total = max_total
+        self.max_taxa = max_taxa
+        self.compactados = compactados
+        self.total = 0
+
+    def somar(self, n, taxa=True):
+        self.total += n
+        if self.max_total and self.total > self.max_total:
+            raise BatchTooLargeError(f"o lote passa do limite de {self.max_total // (1 << 20)} MB descompactados")
+        if taxa and self.max_taxa and self.compactados is not None:
+            compactados = self.compactados()
+            if self.total > self.max_taxa * max(compactados, PISO_COMPACTADO):
+                raise BatchTooLargeError(
+                    f"taxa de compressão acima de {self.max_taxa}:1 ({self.total} bytes de {compactados} compactados)"
+                )
+
+
+def init_worker():
+    """Inicializador dos processos do pool: carrega o modelo uma vez por processo."""
+    global _modelo_worker
+    _modelo_worker = model.treinar_modelo_final()
+
+
+def modelo_do_worker(caminho, assinatura):
+    """
+    (modelo, escalonador, features) do bundle `caminho` no processo atual,
+    recarregado quando o arquivo muda. Se o arquivo no disco não for mais o
+    que o registro do servidor publicou, levanta ModelUnavailableError.
+    """
+    servido = _versoes_worker.get(caminho)
+    if servido is None or servido.assinatura != assinatura:
+        servido = model_registry.carregar_versao(caminho, rapido=False)
+        if servido.assinatura != assinatura:
+            raise model_registry.ModelUnavailableError(f"O modelo em {caminho} mudou; tente novamente")
+        _versoes_worker[caminho] = servido
+    return servido.modelo, servido.escalonador, servido.features
+
+
+def ler_upload(content_bytes, filename, features=None):
+    """
+    Carrega o upload em um DataFrame só com `kepoi_name` e as features do
+    modelo (ver `leitor.ler_csv`); os comentários (#) do topo são pulados.
+    """
+    if features is None:
+        features = model.FEATURES_MODELO
+    try:
+        df, sep, _ = leitor.ler_csv(content_bytes, features)
+    except Exception as e:
+        raise UploadParseError(str(e)) from e
+
+    print(f"\n📄 Arquivo recebido: {filename}")
+    print(f"   Delimitador: '{sep}'")
+    print(f"   Linhas: {len(df)}, Colunas: {len(df.columns)}")
+    print(f"   Colunas principais: {', '.join(df.columns[:5].tolist())}...")
+    return df
+
+
+def ler_upload_binario(content_bytes, filename, features, formato):
+    """Lê um upload Parquet, Arrow IPC ou .npy (ver `leitor.ler_binario`) em (ids, X)."""
+    try:
+        ids, X = leitor.ler_binario(content_bytes, features, formato)
+    except Exception as e:
+        raise UploadParseError(str(e)) from e
+
+    print(f"\n📄 Arquivo recebido: {filename}")
+    print(f"   Formato: {formato}, linhas: {len(X)}, dtype: {X.dtype}")
+    return ids, X
+
+
+def preparar_upload(content_bytes, filename, features, medianas, content_type=None):
+    """
+    Lê o upload e retorna (ids, matriz de features já preenchida), sem pontuar.
+    Usado pelo caminho de micro-batching, que pontua várias requisições juntas.
+    """
+    formato = leitor.formato_binario(content_bytes, content_type)
+    if formato is not None:
+        ids, X = ler_upload_binario(content_bytes, filename, features, formato)
+        return ids, model.preparar_matriz(X, features, medianas=medianas)
+
+    df = ler_upload(content_bytes, filename, features)
+    if 'kepoi_name' not in df.columns:
+        raise UploadParseError("O arquivo CSV precisa conter a coluna 'kepoi_name'")
+    return df['kepoi_name'].to_numpy(dtype=object), model.preparar_matriz(df, features, medianas=medianas)
+
+
+def preparar_bloco(blocos, features, medianas):
+    """
+    Lê o próximo bloco do CSV em streaming (`blocos`, de leitor.ler_csv_em_blocos)
+    e retorna (ids, matriz de features já preenchida), ou None no fim do arquivo.
+    """
+    try:
+        with metricas.etapa("parse"):
+            df = next(blocos, None)
+    except Exception as e:
+        raise UploadParseError(str(e)) from e
+    if df is None:
+        return None
+    return df['kepoi_name'].to_numpy(dtype=object), model.preparar_matriz(df, features, medianas=medianas)
+
+
+def pontuar_bloco(ids, X, modelo=None, escalonador=None, features=None, bundle_ref=None):
+    """
+    Pontua um bloco do /predict/stream já lido por `preparar_bloco` e retorna
+    o DataFrame de resultados. O modelo é escolhido como em `analisar_upload`.
+    """
+    if modelo is None:
+        modelo, escalonador, features = modelo_do_worker(*bundle_ref) if bundle_ref else _modelo_worker
+    confianca, _ = model.pontuar_candidatos(X, modelo, escalonador, features, avisar=False)
+    return model.montar_resultados(ids, confianca)
+
+
+def eh_arquivo_compactado(filename):
+    """True para uploads ZIP ou tar(.gz) aceitos pelo /predict/batch."""
+    nome = (filename or "").lower()
+    return nome.endswith((".zip", ".tar", ".tar.gz", ".tgz"))
+
+def _ler_limitado(f, nome, max_bytes, lote):
+    """
+    Lê um membro do arquivo compactado em blocos, sem passar de `max_bytes`
+    e somando cada bloco em `lote` (BytesDoLote) antes de ler o próximo.
+    """
+    partes = []
+    lidos = 0
+    while lidos <= max_bytes:
+        parte = f.read(min(BLOCO_MEMBRO, max_bytes + 1 - lidos))
+        if not parte:
+            break
+        lote.somar(len(parte))
+        partes.append(parte)
+        lidos += len(parte)
+    if lidos > max_bytes:
+        return None, UploadParseError(f"{nome} passa do limite de {max_bytes // (1 << 20)} MB por arquivo")
+    return b"".join(partes), None
+
+def _membro_csv(nome):
+    base = os.path.basename(nome)
+    # Ignora metadados que o macOS coloca nos ZIPs
+    return nome.lower().endswith(".csv") and not nome.startswith("__MACOSX/") and not base.startswith("._")
+
+def iterar_membros(arquivo, filename, max_bytes, max_total=0, max_taxa=0):
+    """
+    Gera (nome, conteúdo, erro) para cada CSV de um ZIP ou tar(.gz), um
+    membro por vez: o arquivo nunca é extraído inteiro e cada membro é
+    lido com limite de `max_bytes`. O tar é lido em modo stream (sem seek).
+
+    Durante a extração, levanta BatchTooLargeError se a soma dos membros
+    passa de `max_total` bytes ou a taxa de compressão passa de `max_taxa`
+    (zip/tar bombs); o resto do arquivo não é descompactado.
+    """
+    if filename.lower().endswith(".zip"):
+        try:
+            zf = zipfile.ZipFile(arquivo)
+        except zipfile.BadZipFile as e:
+            raise UploadParseError(f"ZIP inválido: {e}") from e
+        compactados = 0
+        lote = BytesDoLote(max_total, max_taxa, lambda: compactados)
+        with zf:
+            for info in zf.infolist():
+                if info.is_dir() or not _membro_csv(info.filename):
+                    continue
+                # O ZipExtFile lê exatamente compress_size bytes do membro
+                compactados += info.compress_size
+                with zf.open(info) as f:
+                    yield (info.filename, *_ler_limitado(f, info.filename, max_bytes, lote))
+        return
+
+    try:
+        tf = tarfile.open(fileobj=arquivo, mode="r|*")
+    except tarfile.TarError as e:
+        raise UploadParseError(f"tar inválido: {e}") from e
+    lote = BytesDoLote(max_total, max_taxa, arquivo.tell)
+    with tf:
+        for membro in tf:
+            if not membro.isfile() or not _membro_csv(membro.name):
+                continue
+            if membro.size > max_bytes:
+                # Não é lido, mas o stream descompacta o membro inteiro para pulá-lo
+                lote.somar(membro.size, taxa=False)
+                yield membro.name, None, UploadParseError(
+                    f"{membro.name} passa do limite de {max_bytes // (1 << 20)} MB por arquivo"
+                )
+                continue
+            yield (membro.name, *_ler_limitado(tf.extractfile(membro), membro.name, max_bytes, lote))
+
+def render_csv_base64(resultados):
+    """CSV dos resultados codificado em Base64."""
+    with metricas.etapa("base64"):
+        csv_output = io.StringIO()
+        resultados.to_csv(csv_output, index=False)
+        return base64.b64encode(csv_output.getvalue().encode("utf-8")).decode("utf-8")
+
+
+def analisar_upload(content_bytes, filename, modelo=None, escalonador=None, features=None,
+                    incluir_csv_base64=True, content_type=None, bundle_ref=None, explicar=False):
+    """
+    Lê e pontua um upload (CSV ou binário). Retorna (resultados, csv_base64 ou None).
+    Com `explicar=True`, os resultados trazem as contribuições de cada feature.
+
+    Sem modelo explícito, usa o bundle `bundle_ref` = (caminho, assinatura)
+    ou, sem ele, o modelo carregado pelo `init_worker` do processo.
+    """
+    if modelo is None:
+        modelo, escalonador, features = modelo_do_worker(*bundle_ref) if bundle_ref else _modelo_worker
+
+    formato = leitor.formato_binario(content_bytes, content_type)
+    if formato is not None:
+        # Matriz direto para o modelo, sem DataFrame
+        ids, X = ler_upload_binario(content_bytes, filename, features, formato)
+        X = model.preparar_matriz(X, features, medianas=model.medianas_do_treino(escalonador))
+        confianca, _ = model.pontuar_candidatos(X, modelo, escalonador, features, avisar=False)
+        contribuicoes = model.calcular_contribuicoes(X, modelo, escalonador, features) if explicar else None
+        resultados = model.montar_resultados(ids, confianca, contribuicoes, features)
+    else:
+        df = ler_upload(content_bytes, filename, features)
+        resultados = model.analisar_dataframe(df, modelo, escalonador, features, explicar=explicar)
+
+    csv_base64 = None
+    if incluir_csv_base64 and resultados is not None and not resultados.empty:
+        csv_base64 = render_csv_base64(resultados)
+    return resultados, csv_base64
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Armazenamento em memória dos resultados de predição, para que o CSV seja
+baixado sob demanda em GET /results/{id}.csv em vez de ir embutido em Base64
+em toda resposta do /predict.
+
+O armazenamento é por processo: com vários workers do uvicorn, o download
+precisa cair no mesmo worker que gerou o resultado (sticky sessions) ou o
+cliente recebe 404 e deve refazer o /predict.
+"""
+import threading
+import uuid
+import zlib
+from collections import OrderedDict
+
+
+class ResultStore:
+    """
+    Cache LRU de DataFrames de resultados limitado pelo total de bytes.
+
+    Ao inserir, os resultados menos usados recentemente são descartados até
+    o total caber em `max_bytes`.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.evictions = 0
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, resultados, filename):
+        """Guarda os resultados e retorna o ID, ou None se não couberem no limite."""
+        tamanho = int(resultados.memory_usage(index=True, deep=True).sum())
+        if tamanho > self.max_bytes:
+            return None
+
+        result_id = uuid.uuid4().hex
+        with self._lock:
+            while self._itens and self.total_bytes + tamanho > self.max_bytes:
+                _, (_, _, tamanho_antigo) = self._itens.popitem(last=False)
+                self.total_bytes -= tamanho_antigo
+                self.evictions += 1
+            self._itens[result_id] = (resultados, filename, tamanho)
+            self.total_bytes += tamanho
+        return result_id
+
+    def get(self, result_id):
+        """Retorna (resultados, filename) ou None se o ID expirou ou não existe."""
+        with self._lock:
+            item = self._itens.get(result_id)
+            if item is None:
+                return None
+            self._itens.move_to_end(result_id)
+        return item[0], item[1]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "items": len(self._itens),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions
+            }
+
+
+def iter_csv(resultados, gzip=False, linhas_por_bloco=10000):
+    """Gera o CSV dos resultados em pedaços, opcionalmente comprimido com gzip."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if gzip else None
+
+    for inicio in range(0, max(len(resultados), 1), linhas_por_bloco):
+        bloco = resultados.iloc[inicio:inicio + linhas_por_bloco]
+        dados = bloco.to_csv(index=False, header=(inicio == 0)).encode("utf-8")
+        if compressor is not None:
+            dados = compressor.compress(dados)
+        if dados:
+            yield dados
+
+    if compressor is not None:
+        yield compressor.flush()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Fixtures dos testes do backend: um modelo pequeno treinado na hora (sobre
+dados sintéticos, com as features do modelo real) e a API servindo esse
+modelo a partir de um bundle em diretório temporário. Nenhum teste lê ou
+grava os artefatos do modelo em uso.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import bundle  # noqa: E402
+import model  # noqa: E402
+from cache_predicoes import CachePredicoes  # noqa: E402
+
+
+def treinar_pequeno(semente=0, n_estimators=20):
+    """(modelo, escalonador com medianas, features) treinados em dados sintéticos."""
+    from sklearn.preprocessing import StandardScaler
+    from xgboost import XGBClassifier
+
+    features = list(model.FEATURES_MODELO)
+    rng = np.random.default_rng(semente)
+    X = pd.DataFrame(rng.normal(size=(400, len(features))), columns=features)
+    y = (X["koi_period"] + 0.5 * X["koi_model_snr"] - X["koi_fpflag_nt"]
+         + rng.normal(scale=0.5, size=len(X)) > 0).astype(int)
+    escalonador = StandardScaler().fit(X)
+    escalonador.medianas_ = X.median().to_numpy(dtype=np.float64)
+    modelo = XGBClassifier(n_estimators=n_estimators, max_depth=3, random_state=semente, n_jobs=1)
+    modelo.fit(escalonador.transform(X), y)
+    return modelo, escalonador, features
+
+
+@pytest.fixture(scope="session")
+def modelo_pequeno():
+    return treinar_pequeno()
+
+
+@pytest.fixture
+def caminho_bundle(tmp_path, modelo_pequeno):
+    """Bundle v1.0.0 do modelo pequeno em um diretório temporário."""
+    caminho = str(tmp_path / "modelo.exob")
+    bundle.salvar_bundle(caminho, *modelo_pequeno, "v1.0.0")
+    return caminho
+
+
+@pytest.fixture
+def artefatos_temporarios(tmp_path, monkeypatch, caminho_bundle):
+    """Aponta os caminhos de model.py para o diretório temporário (bundle do modelo pequeno)."""
+    for nome in ("MODEL_PATH", "SCALER_PATH", "FEATURES_PATH", "CACHE_TREINO_PATH", "DATASET_PATH"):
+        monkeypatch.setattr(model, nome, str(tmp_path / os.path.basename(getattr(model, nome))))
+    monkeypatch.setattr(model, "BUNDLE_PATH", caminho_bundle)
+    monkeypatch.setattr(model, "MODELOS_DIR", str(tmp_path / "modelos"))
+    monkeypatch.setattr(model, "cache_predicoes", CachePredicoes(1000))
+    return tmp_path
+
+
+@pytest.fixture
+def cliente(artefatos_temporarios, monkeypatch):
+    """TestClient da API servindo o modelo pequeno (sem verificação periódica dos bundles)."""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    monkeypatch.setattr(main, "MODEL_RELOAD_S", 0)
+    monkeypatch.setattr(main, "POOL_KIND", "thread")
+    with TestClient(main.app) as c:
+        yield c
+
+
+def csv_candidatos(linhas=5, semente=1, features=None, comentarios=True, sep=","):
+    """CSV (bytes) no formato do cumulative: bloco de comentários, kepoi_name e features."""
+    features = list(model.FEATURES_MODELO) if features is None else features
+    rng = np.random.default_rng(semente)
+    df = pd.DataFrame(rng.normal(size=(linhas, len(features))), columns=features)
+    df.insert(0, "kepoi_name", [f"K{i:05d}.01" for i in range(linhas)])
+    df.insert(1, "koi_disposition", "CANDIDATE")
+    texto = df.to_csv(index=False, sep=sep)
+    if comentarios:
+        texto = "# Tabela de teste\n# COLUMN kepoi_name: KOI Name\n#\n" + texto
+    return texto.encode("utf-8")
+
+
+@pytest.fixture
+def gerar_csv():
+    return csv_candidatos
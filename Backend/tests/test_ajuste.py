@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+import ajuste
+
+GRADE = {"max_depth": [2, 3], "learning_rate": [0.3], "n_estimators": [40]}
+
+
+@pytest.fixture(scope="module")
+def dados():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, 4))
+    y = (X[:, 0] + 0.5 * X[:, 1] + rng.normal(scale=0.5, size=len(X)) > 0).astype(int)
+    return X, y
+
+
+def test_avaliar():
+    metricas = ajuste.avaliar([0, 1, 1, 0], np.array([0.1, 0.9, 0.4, 0.2]))
+    assert metricas["acuracia"] == 0.75
+    assert metricas["precisao"] == 1.0
+    assert metricas["recall"] == 0.5
+    assert metricas["auc"] == 1.0
+    assert set(metricas) == {"acuracia", "precisao", "recall", "f1", "auc", "logloss"}
+
+
+def test_combinacoes_cobrem_a_grade_em_ordem_reprodutivel():
+    grade = {"a": [1, 2], "b": [3, 4, 5]}
+    lista = ajuste.combinacoes(grade)
+    assert len(lista) == 6
+    assert sorted(map(lambda c: (c["a"], c["b"]), lista)) == [(a, b) for a in (1, 2) for b in (3, 4, 5)]
+    assert ajuste.combinacoes(grade) == lista
+
+
+def test_busca_escolhe_pelo_logloss_e_usa_a_melhor_iteracao(dados):
+    resultado = ajuste.buscar_hiperparametros(*dados, grade=GRADE, folds=3, n_jobs=2, avisar=False)
+    assert resultado["avaliadas"] == resultado["total_grade"] == 2
+    ranking = resultado["ranking"]
+    assert [r["logloss"] for r in ranking] == sorted(r["logloss"] for r in ranking)
+    melhor = resultado["melhores_parametros"]
+    assert melhor["max_depth"] == ranking[0]["parametros"]["max_depth"]
+    # n_estimators é o número de árvores após o early stopping, não o teto da grade
+    assert 1 <= melhor["n_estimators"] <= 40
+    assert melhor["n_estimators"] == ranking[0]["arvores"]
+    assert resultado["cv"]["folds"] == 3
+
+
+def test_busca_paralela_igual_a_sequencial(dados):
+    sequencial = ajuste.buscar_hiperparametros(*dados, grade=GRADE, folds=3, n_jobs=1, avisar=False)
+    paralela = ajuste.buscar_hiperparametros(*dados, grade=GRADE, folds=3, n_jobs=4, avisar=False)
+    assert paralela["melhores_parametros"] == sequencial["melhores_parametros"]
+    assert paralela["ranking"] == sequencial["ranking"]
+
+
+def test_orcamento_para_de_comecar_combinacoes(dados):
+    grade = {"max_depth": [2, 3, 4], "learning_rate": [0.1, 0.3], "n_estimators": [40]}
+    resultado = ajuste.buscar_hiperparametros(*dados, grade=grade, folds=2, n_jobs=1, orcamento_s=0, avisar=False)
+    # Com orçamento zero, só a primeira combinação roda
+    assert resultado["avaliadas"] == 1
+    assert resultado["total_grade"] == 6
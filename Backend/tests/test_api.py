@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import base64
+import io
+
+import numpy as np
+import orjson
+import pandas as pd
+
+import main
+import model
+
+
+def test_predict_csv(cliente, gerar_csv):
+    resposta = cliente.post("/predict", files={"file": ("a.csv", gerar_csv(linhas=5), "text/csv")})
+    assert resposta.status_code == 200
+    corpo = resposta.json()
+    assert [p["name"] for p in corpo["predictions"]] == [f"K{i:05d}.01" for i in range(5)]
+    assert corpo["metadata"]["modelVersion"] == "v1.0.0"
+    csv = pd.read_csv(io.BytesIO(base64.b64decode(corpo["csv_base64"])))
+    assert csv.columns.tolist() == ["kepoi_name", "Confianca_Calculada", "Veredito_do_Modelo"]
+
+
+def _linhas_stream(resposta):
+    return [orjson.loads(linha) for linha in resposta.content.splitlines()]
+
+
+def test_predict_stream_pontua_em_blocos_no_pool(cliente, gerar_csv, monkeypatch):
+    monkeypatch.setattr(model, "TAMANHO_BLOCO", 4)
+    csv = gerar_csv(linhas=10)
+    resposta = cliente.post("/predict/stream", files={"file": ("a.csv", csv, "text/csv")})
+    assert resposta.status_code == 200
+    *predicoes, fim = _linhas_stream(resposta)
+    assert [p["id"] for p in predicoes] == list(range(1, 11))
+    assert fim["metadata"]["totalSamples"] == 10
+
+    inteiro = cliente.post("/predict", files={"file": ("a.csv", csv, "text/csv")}).json()["predictions"]
+    assert [p["percent"] for p in predicoes] == [p["percent"] for p in inteiro]
+    assert main.inference_pool.pending == 0
+
+
+def test_predict_stream_erro_depois_do_primeiro_bloco_vira_ultima_linha(cliente, gerar_csv, monkeypatch):
+    import pipeline
+
+    monkeypatch.setattr(model, "TAMANHO_BLOCO", 4)
+    original = pipeline.pontuar_bloco
+    chamadas = []
+
+    def falha_no_segundo(*args, **kwargs):
+        chamadas.append(1)
+        if len(chamadas) == 2:
+            raise RuntimeError("falhou no meio")
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(pipeline, "pontuar_bloco", falha_no_segundo)
+    resposta = cliente.post("/predict/stream", files={"file": ("a.csv", gerar_csv(linhas=10), "text/csv")})
+    assert resposta.status_code == 200
+    *predicoes, fim = _linhas_stream(resposta)
+    assert len(predicoes) == 4
+    assert fim == {"error": {"message": "falhou no meio", "processedSamples": 4}}
+
+
+def test_predict_stream_passa_pelo_cache_e_pelas_metricas(cliente, gerar_csv, monkeypatch):
+    import metricas
+
+    monkeypatch.setattr(model, "TAMANHO_BLOCO", 4)
+    monkeypatch.setattr(main, "registro_metricas", metricas.Registro())
+    csv = gerar_csv(linhas=10)
+    for _ in range(2):
+        assert cliente.post("/predict/stream", files={"file": ("a.csv", csv, "text/csv")}).status_code == 200
+    # A segunda vez sai toda do cache de predições
+    assert (model.cache_predicoes.hits, model.cache_predicoes.misses) == (10, 10)
+
+    texto = cliente.get("/metrics").text
+    for etapa in ("sniff", "parse", "impute", "cache", "serialize"):
+        assert f'exo_stage_duration_seconds_count{{endpoint="predict_stream",stage="{etapa}"}} 2' in texto
+    assert 'exo_rows_total{endpoint="predict_stream"} 20' in texto
+
+
+def test_build_predictions_registros_e_colunas():
+    resultados = model.montar_resultados(
+        np.array(["K1.01", None, "K3.01"], dtype=object), np.array([0.9, np.nan, 0.1234], dtype=np.float32)
+    )
+    registros = main.build_predictions(resultados, inicio=10)
+    assert [p["id"] for p in registros] == [11, 12, 13]
+    assert [p["name"] for p in registros] == ["K1.01", "ID_12", "K3.01"]
+    assert [p["percent"] for p in registros] == [90.0, None, 12.34]
+    assert [p["status"] for p in registros] == resultados["Veredito_do_Modelo"].tolist()
+
+    colunas = main.build_predictions(resultados, "columns", inicio=10)
+    assert colunas["id"].tolist() == [11, 12, 13]
+    assert colunas["name"] == [p["name"] for p in registros]
+    assert colunas["status"] == [p["status"] for p in registros]
+
+
+def test_predict_orient_columns(cliente, gerar_csv):
+    csv = gerar_csv(linhas=4)
+    registros = cliente.post("/predict", files={"file": ("a.csv", csv, "text/csv")}).json()["predictions"]
+    resposta = cliente.post("/predict?orient=columns", files={"file": ("a.csv", csv, "text/csv")})
+    assert resposta.status_code == 200
+    colunas = resposta.json()["predictions"]
+    assert colunas == {campo: [p[campo] for p in registros] for campo in ("id", "name", "percent", "status")}
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+import arvores
+
+
+def test_lote_grande_em_threads_igual_ao_sequencial(modelo_pequeno, monkeypatch):
+    modelo, escalonador, features = modelo_pequeno
+    compilado = arvores.ModeloCompilado.de_booster(modelo)
+    X = np.random.default_rng(6).normal(size=(1000, len(features)))
+    X[::7, 3] = np.nan
+
+    sequencial = compilado.predict_margin(X)
+    monkeypatch.setattr(arvores, "THREADS", 3)
+    monkeypatch.setattr(arvores, "LINHAS_POR_THREAD", 100)
+    np.testing.assert_array_equal(compilado.predict_margin(X), sequencial)
+    np.testing.assert_allclose(compilado.predict_margin(X), modelo.get_booster().inplace_predict(
+        X.astype(np.float32), predict_type="margin"), rtol=0, atol=1e-5)
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import bundle
+
+
+def test_bundle_ida_e_volta(caminho_bundle, modelo_pequeno):
+    modelo, escalonador, features = modelo_pequeno
+    carregado = bundle.carregar_bundle(caminho_bundle)
+
+    assert carregado.features == features
+    assert carregado.metadados["versao_modelo"] == "v1.0.0"
+    assert bundle.ler_versao(caminho_bundle) == "v1.0.0"
+    np.testing.assert_array_equal(carregado.escalonador.mean_, escalonador.mean_)
+    np.testing.assert_array_equal(carregado.escalonador.scale_, escalonador.scale_)
+    np.testing.assert_array_equal(carregado.escalonador.medianas_, escalonador.medianas_)
+
+    X = pd.DataFrame(np.random.default_rng(3).normal(size=(50, len(features))), columns=features)
+    np.testing.assert_array_equal(carregado.escalonador.transform(X), escalonador.transform(X))
+    np.testing.assert_array_equal(
+        carregado.modelo.predict_proba(carregado.escalonador.transform(X)),
+        modelo.predict_proba(escalonador.transform(X)),
+    )
+
+
+def test_bundle_guarda_metadados(tmp_path, modelo_pequeno):
+    caminho = str(tmp_path / "m.exob")
+    bundle.salvar_bundle(caminho, *modelo_pequeno, "v2.1.0", {"acuracia": 0.9, "origem": "treino"})
+    metadados = bundle.carregar_bundle(caminho).metadados
+    assert metadados["versao_modelo"] == "v2.1.0"
+    assert metadados["acuracia"] == 0.9
+    assert metadados["origem"] == "treino"
+
+
+def test_bundle_rejeita_arquivo_que_nao_e_bundle(tmp_path):
+    caminho = tmp_path / "x.exob"
+    caminho.write_bytes(b"nao sou um bundle" * 10)
+    with pytest.raises(ValueError, match="bundle"):
+        bundle.carregar_bundle(str(caminho))
+
+
+def test_bundle_mapeia_as_tabelas_do_motor_compilado(caminho_bundle, modelo_pequeno):
+    import arvores
+
+    modelo, escalonador, features = modelo_pequeno
+    carregado = bundle.carregar_bundle(caminho_bundle, motor="compilado")
+
+    assert carregado.modelo is carregado.compilado
+    assert isinstance(carregado.modelo, arvores.ModeloCompilado)
+    # Views do mmap, não cópias
+    assert not carregado.modelo.tabelas.flags.owndata
+    assert carregado.modelo._booster is None
+
+    X = escalonador.transform(pd.DataFrame(np.random.default_rng(4).normal(size=(50, len(features))), columns=features))
+    esperado = arvores.ModeloCompilado.de_booster(modelo).predict_margin(X)
+    np.testing.assert_array_equal(carregado.modelo.predict_margin(X), esperado)
+    # O booster só é lido quando pedido
+    assert carregado.modelo.booster.num_boosted_rounds() == modelo.get_booster().num_boosted_rounds()
+
+
+def test_carregar_nao_regrava_o_bundle(artefatos_temporarios, caminho_bundle):
+    import model
+
+    antes = os.stat(caminho_bundle)
+    with open(caminho_bundle, "rb") as f:
+        conteudo = f.read()
+    model.treinar_modelo_final()
+    depois = os.stat(caminho_bundle)
+    assert (depois.st_mtime_ns, depois.st_size) == (antes.st_mtime_ns, antes.st_size)
+    with open(caminho_bundle, "rb") as f:
+        assert f.read() == conteudo
+
+
+def test_salvar_bundle_exige_medianas(tmp_path, modelo_pequeno):
+    from sklearn.preprocessing import StandardScaler
+
+    modelo, escalonador, features = modelo_pequeno
+    sem_medianas = StandardScaler()
+    sem_medianas.mean_, sem_medianas.scale_ = escalonador.mean_, escalonador.scale_
+    with pytest.raises(ValueError, match="medianas"):
+        bundle.salvar_bundle(str(tmp_path / "m.exob"), modelo, sem_medianas, features)
+
+
+def _joblib_sem_medianas(diretorio, modelo):
+    """Artefatos joblib antigos (escalonador sem medianas) e o CSV com que foram 'treinados'."""
+    import joblib
+    from sklearn.preprocessing import StandardScaler
+
+    import model
+
+    features = list(model.FEATURES_MODELO)
+    rng = np.random.default_rng(5)
+    df = pd.DataFrame(rng.normal(size=(300, len(features))), columns=features)
+    df.insert(0, "koi_disposition", np.where(rng.random(len(df)) < 0.5, "CONFIRMED", "FALSE POSITIVE"))
+    dataset = str(diretorio / "treino.csv")
+    df.to_csv(dataset, index=False)
+
+    X, y = model.carregar_dados_treino(dataset, features)
+    X_train = model._dividir_treino_teste(X, y)[0]
+    joblib.dump(modelo, model.MODEL_PATH)
+    joblib.dump(StandardScaler().fit(X_train), model.SCALER_PATH)
+    joblib.dump(features, model.FEATURES_PATH)
+    return dataset, X_train
+
+
+def test_exportar_bundle_recalcula_as_medianas_do_treino(artefatos_temporarios, modelo_pequeno):
+    import model
+
+    dataset, X_train = _joblib_sem_medianas(artefatos_temporarios, modelo_pequeno[0])
+    caminho = model.exportar_bundle(str(artefatos_temporarios / "exportado.exob"), dataset=dataset)
+    np.testing.assert_array_equal(bundle.carregar_bundle(caminho).escalonador.medianas_, X_train.median().to_numpy())
+
+
+def test_exportar_bundle_recusa_dataset_que_nao_e_o_do_treino(artefatos_temporarios, modelo_pequeno):
+    import model
+
+    dataset, _ = _joblib_sem_medianas(artefatos_temporarios, modelo_pequeno[0])
+    df = pd.read_csv(dataset)
+    df["koi_period"] *= 1.001
+    df.to_csv(dataset, index=False)
+    with pytest.raises(ValueError, match="não reproduz"):
+        model.exportar_bundle(str(artefatos_temporarios / "exportado.exob"), dataset=dataset)
+    with pytest.raises(ValueError, match="não encontrado"):
+        model.exportar_bundle(str(artefatos_temporarios / "exportado.exob"), dataset=str(artefatos_temporarios / "x.csv"))
+
+
+def test_joblib_sem_medianas_nao_carrega(artefatos_temporarios, modelo_pequeno, monkeypatch):
+    import model
+
+    _joblib_sem_medianas(artefatos_temporarios, modelo_pequeno[0])
+    monkeypatch.setattr(model, "BUNDLE_PATH", str(artefatos_temporarios / "inexistente.exob"))
+    with pytest.raises(ValueError, match="bundle.py converter"):
+        model.treinar_modelo_final()
+
+
+def test_exportar_bundle_so_mede_metricas_fora_do_treino(artefatos_temporarios, modelo_pequeno):
+    import ajuste
+    import model
+
+    modelo = modelo_pequeno[0]
+    dataset, _ = _joblib_sem_medianas(artefatos_temporarios, modelo)
+    caminho = model.exportar_bundle(str(artefatos_temporarios / "exportado.exob"), dataset=dataset)
+
+    X, y = model.carregar_dados_treino(dataset, model.FEATURES_MODELO)
+    _, X_test, _, y_test = model._dividir_treino_teste(X, y)
+    carregado = bundle.carregar_bundle(caminho)
+    esperado = ajuste.avaliar(y_test, modelo.predict_proba(carregado.escalonador.transform(X_test))[:, 1])
+    assert carregado.metadados["metricas_teste"] == esperado
+
+    # Outro CSV (as medianas já estão no escalonador): métricas ficam desconhecidas
+    import joblib
+    joblib.dump(carregado.escalonador, model.SCALER_PATH)
+    pd.read_csv(dataset).sample(frac=1, random_state=1).to_csv(dataset, index=False)
+    caminho = model.exportar_bundle(str(artefatos_temporarios / "outro.exob"), dataset=dataset)
+    assert "metricas_teste" not in bundle.carregar_bundle(caminho).metadados
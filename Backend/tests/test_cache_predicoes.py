@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+import model
+from cache_predicoes import CachePredicoes
+from conftest import treinar_pequeno
+
+
+def _X(n=20, semente=5):
+    return np.random.default_rng(semente).normal(size=(n, len(model.FEATURES_MODELO)))
+
+
+def test_versao_muda_com_o_modelo_e_o_escalonador(modelo_pequeno):
+    cache = CachePredicoes(100)
+    modelo, escalonador, _ = modelo_pequeno
+    outro_modelo, outro_escalonador, _ = treinar_pequeno(semente=1)
+
+    versao = cache.versao(modelo, escalonador)
+    assert cache.versao(modelo, escalonador) == versao
+    assert cache.versao(outro_modelo, escalonador) != versao
+    assert cache.versao(modelo, outro_escalonador) != versao
+    # Mesmo conteúdo em outro objeto: mesma versão
+    copia = treinar_pequeno(semente=0)[0]
+    assert cache.versao(copia, escalonador) == versao
+
+
+def test_troca_de_modelo_nao_reaproveita_predicoes(modelo_pequeno, monkeypatch):
+    cache = CachePredicoes(1000)
+    monkeypatch.setattr(model, "cache_predicoes", cache)
+    modelo, escalonador, features = modelo_pequeno
+    outro, _, _ = treinar_pequeno(semente=1)
+    X = _X()
+
+    primeira, _ = model.pontuar_candidatos(X, modelo, escalonador, features)
+    assert (cache.hits, cache.misses) == (0, len(X))
+    np.testing.assert_array_equal(model.pontuar_candidatos(X, modelo, escalonador, features)[0], primeira)
+    assert cache.hits == len(X)
+
+    com_outro, _ = model.pontuar_candidatos(X, outro, escalonador, features)
+    assert cache.misses == 2 * len(X)
+    esperado = outro.predict_proba(escalonador.transform(pd.DataFrame(X, columns=features)))[:, 1]
+    np.testing.assert_array_equal(com_outro, esperado)
+    assert not np.array_equal(com_outro, primeira)
+
+
+def test_descartar_versao(modelo_pequeno):
+    cache = CachePredicoes(1000)
+    modelo, escalonador, _ = modelo_pequeno
+    versao = cache.versao(modelo, escalonador)
+    cache.pontuar(_X(), versao, lambda X: np.full(len(X), 0.5, dtype=np.float32))
+    assert cache.stats()["entries"] == 20
+
+    cache.descartar(versao)
+    stats = cache.stats()
+    assert (stats["entries"], stats["invalidations"], stats["model_versions"]) == (0, 1, [])
+
+
+def test_limite_de_entradas_entre_versoes():
+    cache = CachePredicoes(30)
+    um = lambda X: np.full(len(X), 0.25, dtype=np.float32)  # noqa: E731
+    cache.pontuar(_X(20, 1), "a", um)
+    cache.pontuar(_X(20, 2), "b", um)
+    # A versão usada há mais tempo perde entradas primeiro
+    assert cache.stats()["entries"] == 30
+    assert len(cache._entradas["a"]) == 10 and len(cache._entradas["b"]) == 20
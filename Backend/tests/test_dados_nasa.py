@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import http.server
+import os
+import threading
+import urllib.parse
+
+import pytest
+import requests
+
+import dados_nasa
+
+
+class ArchiveLocal(http.server.BaseHTTPRequestHandler):
+    """Substituto do TAP do archive: responde `servidor.csv` e guarda as consultas."""
+
+    def do_GET(self):
+        self.server.consultas.append(urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query))
+        corpo = self.server.csv.encode("utf-8")
+        self.send_response(self.server.status)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def archive():
+    servidor = http.server.HTTPServer(("127.0.0.1", 0), ArchiveLocal)
+    servidor.consultas = []
+    servidor.csv = ""
+    servidor.status = 200
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    servidor.url = f"http://127.0.0.1:{servidor.server_port}/TAP/sync"
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+COLUNAS = ["kepoi_name", "koi_disposition", "koi_period"]
+
+
+def test_atualizacao_contra_archive_local(archive, tmp_path):
+    caminho = str(tmp_path / "cumulative.csv")
+    archive.csv = "kepoi_name,koi_disposition,koi_period\nK1,CONFIRMED,1.0\nK2,FALSE POSITIVE,2.0\n"
+
+    diferenca = dados_nasa.atualizar_dataset(caminho, COLUNAS, url=archive.url)
+    assert diferenca == {"novas": ["K1", "K2"], "alteradas": [], "removidas": [], "arquivo_alterado": True}
+    # Só as colunas pedidas, em CSV
+    assert archive.consultas[0] == {"query": ["select kepoi_name,koi_disposition,koi_period from cumulative"],
+                                    "format": ["csv"]}
+    with open(caminho) as f:
+        assert f.read() == archive.csv
+
+    # Nada mudou: o arquivo local não é tocado
+    antes = os.stat(caminho).st_mtime_ns
+    diferenca = dados_nasa.atualizar_dataset(caminho, COLUNAS, url=archive.url)
+    assert diferenca["arquivo_alterado"] is False
+    assert os.stat(caminho).st_mtime_ns == antes
+
+    archive.csv = "kepoi_name,koi_disposition,koi_period\nK1,CONFIRMED,1.5\nK3,CANDIDATE,3.0\n"
+    diferenca = dados_nasa.atualizar_dataset(caminho, COLUNAS, url=archive.url)
+    assert diferenca == {"novas": ["K3"], "alteradas": ["K1"], "removidas": ["K2"], "arquivo_alterado": True}
+    assert not os.path.exists(caminho + ".download")
+
+
+def test_erro_http_mantem_a_copia_local(archive, tmp_path):
+    caminho = str(tmp_path / "cumulative.csv")
+    with open(caminho, "w") as f:
+        f.write("kepoi_name,koi_period\nK1,1.0\n")
+    archive.status = 500
+    with pytest.raises(requests.HTTPError):
+        dados_nasa.atualizar_dataset(caminho, COLUNAS, url=archive.url)
+    with open(caminho) as f:
+        assert f.read() == "kepoi_name,koi_period\nK1,1.0\n"
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import base64
+import io
+
+import numpy as np
+import pandas as pd
+from xgboost import DMatrix
+
+import model
+
+FEATURES = model.FEATURES_MODELO
+
+
+def _margem(modelo, escalonador, X):
+    X_scaled = escalonador.transform(pd.DataFrame(X, columns=FEATURES))
+    return modelo.get_booster().predict(DMatrix(X_scaled), output_margin=True)
+
+
+def test_contribuicoes_somam_a_margem(modelo_pequeno):
+    modelo, escalonador, features = modelo_pequeno
+    X = np.random.default_rng(7).normal(size=(200, len(features)))
+
+    contribuicoes = model.calcular_contribuicoes(X, modelo, escalonador, features)
+    assert contribuicoes.shape == (200, len(features) + 1)
+    np.testing.assert_allclose(contribuicoes.sum(axis=1), _margem(modelo, escalonador, X), atol=1e-4)
+    confianca = model.pontuar_candidatos(X, modelo, escalonador, features, avisar=False)[0]
+    np.testing.assert_allclose(1 / (1 + np.exp(-contribuicoes.sum(axis=1))), confianca, atol=1e-5)
+
+
+def test_contribuicoes_com_motor_compilado(modelo_pequeno):
+    modelo, escalonador, features = modelo_pequeno
+    X = np.random.default_rng(8).normal(size=(20, len(features)))
+    np.testing.assert_array_equal(
+        model.calcular_contribuicoes(X, model._compilar(modelo), escalonador, features),
+        model.calcular_contribuicoes(X, modelo, escalonador, features),
+    )
+
+
+def test_analisar_dataframe_com_explicar(modelo_pequeno, gerar_csv):
+    modelo, escalonador, features = modelo_pequeno
+    df = pd.read_csv(io.BytesIO(gerar_csv(linhas=6)), comment="#")
+    sem = model.analisar_dataframe(df, modelo, escalonador, features, avisar=False)
+    com = model.analisar_dataframe(df, modelo, escalonador, features, avisar=False, explicar=True)
+
+    assert com.columns.tolist()[:3] == sem.columns.tolist()
+    assert com.columns.tolist()[3:] == model.colunas_contribuicao(features)
+    np.testing.assert_array_equal(com["Confianca_Calculada"], sem["Confianca_Calculada"])
+    margem = com[model.colunas_contribuicao(features)].sum(axis=1).to_numpy()
+    np.testing.assert_allclose(1 / (1 + np.exp(-margem)), com["Confianca_Calculada"], atol=1e-5)
+
+
+def test_predict_explain(cliente, gerar_csv):
+    resposta = cliente.post("/predict?explain=true", files={"file": ("a.csv", gerar_csv(linhas=4), "text/csv")})
+    assert resposta.status_code == 200
+    corpo = resposta.json()
+    for predicao in corpo["predictions"]:
+        assert list(predicao["contributions"]) == FEATURES + ["base"]
+        margem = sum(predicao["contributions"].values())
+        assert abs(100 / (1 + np.exp(-margem)) - predicao["percent"]) < 0.02
+    csv = pd.read_csv(io.BytesIO(base64.b64decode(corpo["csv_base64"])))
+    assert csv.columns.tolist()[3:] == model.colunas_contribuicao(FEATURES)
+
+    colunas = cliente.post("/predict?explain=true&orient=columns",
+                           files={"file": ("a.csv", gerar_csv(linhas=4), "text/csv")}).json()
+    assert len(colunas["predictions"]["contributions"]["koi_period"]) == 4
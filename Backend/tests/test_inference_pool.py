@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+
+import pytest
+
+import main
+from inference_pool import InferencePool, PoolSaturatedError
+
+
+def test_pool_recusa_acima_da_capacidade():
+    pool = InferencePool("thread", workers=1, queue_depth=1)
+    liberar = threading.Event()
+
+    async def cenario():
+        ocupadas = [asyncio.ensure_future(pool.run(liberar.wait, 5)) for _ in range(pool.capacity)]
+        await asyncio.sleep(0)
+        assert pool.pending == pool.capacity
+        with pytest.raises(PoolSaturatedError):
+            await pool.run(lambda: None)
+        liberar.set()
+        assert await asyncio.gather(*ocupadas) == [True, True]
+        # Com vagas livres de novo, aceita
+        assert await pool.run(lambda x: x + 1, 1) == 2
+
+    try:
+        asyncio.run(cenario())
+    finally:
+        pool.shutdown()
+    assert pool.rejected == 1
+    assert pool.pending == 0
+
+
+def test_run_waiting_espera_vaga_em_vez_de_recusar():
+    pool = InferencePool("thread", workers=1, queue_depth=0)
+    liberar = threading.Event()
+
+    async def cenario():
+        ocupada = asyncio.ensure_future(pool.run(liberar.wait, 5))
+        await asyncio.sleep(0)
+        esperando = asyncio.ensure_future(pool.run_waiting(lambda x: x + 1, 1))
+        await asyncio.sleep(0)
+        assert pool.stats()["waiting"] == 1
+        liberar.set()
+        assert await ocupada is True
+        assert await esperando == 2
+
+    try:
+        asyncio.run(cenario())
+    finally:
+        pool.shutdown()
+    assert pool.rejected == 0
+    assert pool.pending == 0
+
+
+def test_pool_tipo_invalido():
+    with pytest.raises(ValueError):
+        InferencePool("fibra")
+
+
+def test_predict_responde_429_com_pool_saturado(cliente, gerar_csv, monkeypatch):
+    async def saturado(*args, **kwargs):
+        raise PoolSaturatedError("Pool saturado")
+
+    monkeypatch.setattr(main.inference_pool, "run", saturado)
+    resposta = cliente.post("/predict", files={"file": ("a.csv", gerar_csv(), "text/csv")})
+    assert resposta.status_code == 429
+    assert resposta.headers["retry-after"] == "1"
+
+
+def test_predict_stream_responde_429_com_pool_saturado(cliente, gerar_csv, monkeypatch):
+    async def saturado(*args, **kwargs):
+        raise PoolSaturatedError("Pool saturado")
+
+    monkeypatch.setattr(main.inference_pool, "run", saturado)
+    resposta = cliente.post("/predict/stream", files={"file": ("a.csv", gerar_csv(), "text/csv")})
+    assert resposta.status_code == 429
+    assert resposta.headers["retry-after"] == "1"
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import orjson
+import pytest
+
+import leitor
+import model
+
+FEATURES = model.FEATURES_MODELO
+
+
+@pytest.mark.parametrize("motor", ["c", "pyarrow"])
+def test_ler_csv_pula_comentarios_e_projeta_colunas(gerar_csv, motor):
+    if motor == "pyarrow" and not leitor._TEM_PYARROW:
+        pytest.skip("pyarrow não instalado")
+    df, sep, encoding = leitor.ler_csv(gerar_csv(linhas=4), FEATURES, motor=motor)
+    assert (sep, encoding) == (",", "utf-8")
+    assert list(df.columns) == ["kepoi_name"] + FEATURES  # koi_disposition não é lida
+    assert len(df) == 4
+    assert df["kepoi_name"].tolist() == [f"K{i:05d}.01" for i in range(4)]
+    assert all(df[col].dtype == np.float64 for col in FEATURES)
+
+
+def test_fim_dos_comentarios():
+    conteudo = b"# a\n#b\n\n  # c\nkepoi_name,koi_period\n"
+    assert conteudo[leitor.fim_dos_comentarios(conteudo):].startswith(b"kepoi_name")
+    assert leitor.fim_dos_comentarios(b"kepoi_name\n") == 0
+
+
+def test_ler_csv_detecta_delimitador(gerar_csv):
+    df, sep, _ = leitor.ler_csv(gerar_csv(linhas=3, sep=";"), FEATURES)
+    assert sep == ";"
+    assert list(df.columns) == ["kepoi_name"] + FEATURES
+
+
+def test_ler_csv_cai_para_latin1():
+    conteudo = "kepoi_name,koi_period\nK00001.01 é,1.5\n".encode("latin-1")
+    df, _, encoding = leitor.ler_csv(conteudo, FEATURES)
+    assert encoding == "latin-1"
+    assert df["kepoi_name"].tolist() == ["K00001.01 é"]
+
+
+def test_ler_csv_latin1_depois_da_amostra():
+    # Amostra (64 KiB) em UTF-8 válido e um byte latin-1 no fim do arquivo
+    linhas = ["kepoi_name,koi_period"] + [f"K{i:05d}.01,{i}" for i in range(8000)] + ["K99999.01 é,1"]
+    conteudo = "\n".join(linhas).encode("latin-1")
+    assert len(conteudo) > leitor.AMOSTRA_BYTES
+    df, _, encoding = leitor.ler_csv(conteudo, FEATURES, motor="c")
+    assert encoding == "latin-1"
+    assert df["kepoi_name"].iloc[-1] == "K99999.01 é"
+
+
+@pytest.mark.parametrize("motor", ["c", "pyarrow"])
+def test_nome_vazio_e_linha_curta_iguais_no_predict_e_no_stream(cliente, motor, monkeypatch):
+    if motor == "pyarrow" and not leitor._TEM_PYARROW:
+        pytest.skip("pyarrow não instalado")
+    monkeypatch.setattr(leitor, "MOTOR_CSV", motor)
+    conteudo = (
+        "kepoi_name,koi_period,koi_depth,koi_model_snr\n"
+        "K00001.01,10.5,800,40\n"
+        ",3.2,150,12\n"      # sem nome
+        "007,1.0\n"          # linha curta: as features que faltam viram medianas
+        "K00004.01,2.0,90,7\n"
+    ).encode()
+    arquivo = {"file": ("a.csv", conteudo, "text/csv")}
+
+    predict = cliente.post("/predict", files=arquivo).json()["predictions"]
+    *stream, fim = [orjson.loads(linha) for linha in cliente.post("/predict/stream", files=arquivo).content.splitlines()]
+    assert fim["metadata"]["totalSamples"] == 4
+    assert predict == stream
+    assert [p["name"] for p in predict] == ["K00001.01", "ID_2", "007", "K00004.01"]
+    assert all(p["percent"] is not None for p in predict)
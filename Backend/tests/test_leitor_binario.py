@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import io
+
+import numpy as np
+import pytest
+
+import leitor
+import model
+
+FEATURES = model.FEATURES_MODELO
+
+
+def _npy(array):
+    f = io.BytesIO()
+    np.save(f, array)
+    return f.getvalue()
+
+
+def test_ler_binario_npy_2d_sem_copia():
+    X = np.arange(3 * len(FEATURES), dtype=np.float32).reshape(3, -1)
+    conteudo = _npy(X)
+    assert leitor.formato_binario(conteudo) == "npy"
+    ids, lido = leitor.ler_binario(conteudo, FEATURES, "npy")
+    assert ids.tolist() == ["0", "1", "2"]
+    assert lido.dtype == np.float32
+    np.testing.assert_array_equal(lido, X)
+    assert not lido.flags.owndata
+
+
+def test_ler_binario_npy_1d_vira_uma_linha():
+    ids, X = leitor.ler_binario(_npy(np.ones(len(FEATURES))), FEATURES, "npy")
+    assert X.shape == (1, len(FEATURES))
+    assert ids.tolist() == ["0"]
+
+
+def test_ler_binario_npy_inteiro_vira_float64():
+    _, X = leitor.ler_binario(_npy(np.ones((2, len(FEATURES)), dtype=np.int32)), FEATURES, "npy")
+    assert X.dtype == np.float64
+
+
+@pytest.mark.parametrize("array, mensagem", [
+    (np.ones((2, len(FEATURES) - 1)), "formato"),
+    (np.ones((2, 3, len(FEATURES))), "formato"),
+    (np.array([["a"] * len(FEATURES)]), "numérico"),
+    (np.array([[object()] * len(FEATURES)], dtype=object), "objetos"),
+])
+def test_ler_binario_npy_invalido(array, mensagem):
+    with pytest.raises(ValueError, match=mensagem):
+        leitor.ler_binario(_npy(array), FEATURES, "npy")
+
+
+def test_ler_binario_npy_truncado():
+    with pytest.raises(ValueError, match="truncado"):
+        leitor.ler_binario(_npy(np.ones((4, len(FEATURES))))[:-8], FEATURES, "npy")
+
+
+def test_ler_binario_npy_estruturado_pelos_nomes():
+    dtype = [("kepoi_name", "U12"), ("koi_period", "f8"), ("koi_depth", "f4")]
+    array = np.array([("K1.01", 1.5, 2.0), ("K2.01", 3.0, 4.0)], dtype=dtype)
+    ids, X = leitor.ler_binario(_npy(array), FEATURES, "npy")
+    assert ids.tolist() == ["K1.01", "K2.01"]
+    np.testing.assert_array_equal(X[:, FEATURES.index("koi_depth")], [2.0, 4.0])
+    assert np.isnan(X[:, FEATURES.index("koi_srad")]).all()
+
+
+def test_ler_binario_parquet():
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    tabela = pa.table({"kepoi_name": ["K1.01", "K2.01"], "koi_period": [1.0, 2.0], "extra": [0, 0]})
+    f = io.BytesIO()
+    pq.write_table(tabela, f)
+    conteudo = f.getvalue()
+    assert leitor.formato_binario(conteudo) == "parquet"
+    ids, X = leitor.ler_binario(conteudo, FEATURES, "parquet")
+    assert ids.tolist() == ["K1.01", "K2.01"]
+    assert X.shape == (2, len(FEATURES))
+    np.testing.assert_array_equal(X[:, 0], [1.0, 2.0])
+
+
+def test_ler_binario_nome_nulo_fica_none():
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    f = io.BytesIO()
+    pq.write_table(pa.table({"kepoi_name": ["K1.01", None], "koi_period": [1.0, 2.0]}), f)
+    ids, _ = leitor.ler_binario(f.getvalue(), FEATURES, "parquet")
+    assert ids.tolist() == ["K1.01", None]
+
+    numericos = pa.table({"kepoi_name": pa.array([1.0, None]), "koi_period": [1.0, 2.0]})
+    f = io.BytesIO()
+    pq.write_table(numericos, f)
+    ids, _ = leitor.ler_binario(f.getvalue(), FEATURES, "parquet")
+    assert ids.tolist() == ["1.0", None]
+
+
+def test_formato_binario_csv_e_content_type():
+    assert leitor.formato_binario(b"kepoi_name,koi_period\n") is None
+    assert leitor.formato_binario(b"xx", "application/x-parquet; charset=binary") == "parquet"
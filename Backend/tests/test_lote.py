@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+import main
+import pipeline
+
+
+def _zip(membros):
+    f = io.BytesIO()
+    with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as zf:
+        for nome, conteudo in membros.items():
+            zf.writestr(nome, conteudo)
+    return f.getvalue()
+
+
+def _tar_gz(membros):
+    f = io.BytesIO()
+    with tarfile.open(fileobj=f, mode="w:gz") as tf:
+        for nome, conteudo in membros.items():
+            info = tarfile.TarInfo(nome)
+            info.size = len(conteudo)
+            tf.addfile(info, io.BytesIO(conteudo))
+    return f.getvalue()
+
+
+def _por_arquivo(resposta):
+    return {a["filename"]: a for a in resposta.json()["files"]}
+
+
+def test_lote_de_varios_csvs_igual_ao_predict(cliente, gerar_csv):
+    a, b = gerar_csv(linhas=3, semente=1), gerar_csv(linhas=2, semente=2)
+    resposta = cliente.post("/predict/batch", files=[
+        ("files", ("a.csv", a, "text/csv")), ("files", ("b.csv", b, "text/csv"))
+    ])
+    assert resposta.status_code == 200
+    arquivos = _por_arquivo(resposta)
+    assert resposta.json()["metadata"]["totalSamples"] == 5
+    for nome, conteudo in (("a.csv", a), ("b.csv", b)):
+        sozinho = cliente.post("/predict", files={"file": (nome, conteudo, "text/csv")}).json()["predictions"]
+        assert [p["percent"] for p in arquivos[nome]["predictions"]] == [p["percent"] for p in sozinho]
+
+
+def test_lote_em_zip_e_tar_gz(cliente, gerar_csv):
+    membros = {"dados/a.csv": gerar_csv(linhas=3), "b.csv": gerar_csv(linhas=2, semente=5),
+               "leiame.txt": b"ignorado", "__MACOSX/._a.csv": b"lixo"}
+    for nome, conteudo in (("lote.zip", _zip(membros)), ("lote.tar.gz", _tar_gz(membros))):
+        resposta = cliente.post("/predict/batch", files={"files": (nome, conteudo, "application/octet-stream")})
+        assert resposta.status_code == 200, nome
+        arquivos = _por_arquivo(resposta)
+        assert sorted(arquivos) == ["b.csv", "dados/a.csv"]
+        assert [arquivos[n]["totalSamples"] for n in ("dados/a.csv", "b.csv")] == [3, 2]
+
+
+def test_arquivo_com_erro_nao_derruba_o_lote(cliente, gerar_csv):
+    resposta = cliente.post("/predict/batch", files={"files": ("lote.zip", _zip({
+        "bom.csv": gerar_csv(linhas=2), "sem_nome.csv": b"koi_period\n1.0\n"
+    }), "application/zip")})
+    assert resposta.status_code == 200
+    arquivos = _por_arquivo(resposta)
+    assert arquivos["bom.csv"]["totalSamples"] == 2
+    assert "kepoi_name" in arquivos["sem_nome.csv"]["error"]
+
+
+def test_limite_de_tamanho_por_arquivo(cliente, gerar_csv, monkeypatch):
+    monkeypatch.setattr(main, "BATCH_MAX_FILE_BYTES", 200)
+    resposta = cliente.post("/predict/batch", files={"files": ("lote.zip", _zip({
+        "grande.csv": gerar_csv(linhas=20), "pequeno.csv": b"kepoi_name,koi_period\nK1,1.0\n"
+    }), "application/zip")})
+    arquivos = _por_arquivo(resposta)
+    assert "limite" in arquivos["grande.csv"]["error"]
+    assert arquivos["pequeno.csv"]["totalSamples"] == 1
+
+
+def test_limite_de_arquivos_por_lote(cliente, monkeypatch):
+    monkeypatch.setattr(main, "BATCH_MAX_FILES", 2)
+    csv = b"kepoi_name,koi_period\nK1,1.0\n"
+    resposta = cliente.post("/predict/batch", files={"files": ("lote.zip", _zip({
+        f"{i}.csv": csv for i in range(3)
+    }), "application/zip")})
+    assert resposta.status_code == 413
+
+
+def test_arquivo_compactado_invalido_e_400(cliente):
+    resposta = cliente.post("/predict/batch", files={"files": ("lote.zip", b"nao sou zip", "application/zip")})
+    assert resposta.status_code == 400
+
+
+def test_limite_de_bytes_descompactados_do_lote(cliente, gerar_csv, monkeypatch):
+    monkeypatch.setattr(main, "BATCH_MAX_TOTAL_BYTES", 1000)
+    membros = {f"{i}.csv": gerar_csv(linhas=1, semente=i) for i in range(3)}
+    assert all(len(c) < 1000 for c in membros.values()) and sum(map(len, membros.values())) > 1000
+    for nome, conteudo in (("lote.zip", _zip(membros)), ("lote.tar.gz", _tar_gz(membros))):
+        resposta = cliente.post("/predict/batch", files={"files": (nome, conteudo, "application/octet-stream")})
+        assert resposta.status_code == 413, nome
+        assert "descompactados" in resposta.json()["detail"]
+    soltos = [("files", (nome, conteudo, "text/csv")) for nome, conteudo in membros.items()]
+    assert cliente.post("/predict/batch", files=soltos).status_code == 413
+
+
+def test_taxa_de_compressao_de_zip_e_tar_bomb(cliente, monkeypatch):
+    monkeypatch.setattr(pipeline, "PISO_COMPACTADO", 1)
+    monkeypatch.setattr(pipeline, "BLOCO_MEMBRO", 4096)
+    monkeypatch.setattr(main, "BATCH_MAX_RATIO", 50)
+    bomba = {"bomba.csv": b"kepoi_name,koi_period\n" + b"K1,1.0\n" * 200_000}
+    for nome, conteudo in (("lote.zip", _zip(bomba)), ("lote.tar.gz", _tar_gz(bomba))):
+        assert len(bomba["bomba.csv"]) > 50 * len(conteudo)
+        resposta = cliente.post("/predict/batch", files={"files": (nome, conteudo, "application/octet-stream")})
+        assert resposta.status_code == 413, nome
+        assert "compressão" in resposta.json()["detail"]
+
+    # Com uma taxa máxima acima da do arquivo, o mesmo lote passa
+    monkeypatch.setattr(main, "BATCH_MAX_RATIO", 1000)
+    resposta = cliente.post("/predict/batch", files={"files": ("lote.zip", _zip(bomba), "application/zip")})
+    assert resposta.status_code == 200
+
+
+def test_bytes_do_lote_parado_durante_a_extracao():
+    lidos = []
+
+    class Membro(io.BytesIO):
+        def read(self, n=-1):
+            parte = super().read(n)
+            lidos.append(len(parte))
+            return parte
+
+    lote = pipeline.BytesDoLote(max_total=3 * pipeline.BLOCO_MEMBRO)
+    with pytest.raises(pipeline.BatchTooLargeError):
+        pipeline._ler_limitado(Membro(bytes(10 * pipeline.BLOCO_MEMBRO)), "a.csv", 64 << 20, lote)
+    # Parou no bloco que passou do limite, sem ler o membro inteiro
+    assert sum(lidos) == 4 * pipeline.BLOCO_MEMBRO
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+import main
+import metricas
+
+
+def test_etapa_fora_de_um_cronometro_nao_mede():
+    with metricas.etapa("parse"):
+        pass
+    with metricas.cronometrar() as cronometro:
+        with metricas.etapa("parse"):
+            time.sleep(0.01)
+        with metricas.etapa("parse"):
+            pass
+    assert list(cronometro.tempos) == ["parse"]
+    assert cronometro.tempos["parse"] >= 0.01
+
+
+def test_com_tempos_separa_as_requisicoes_entre_threads():
+    resultados = {}
+
+    def trabalho(nome, espera):
+        def etapas():
+            with metricas.etapa(nome):
+                time.sleep(espera)
+            return nome
+        resultados[nome] = metricas.com_tempos(etapas)
+
+    threads = [threading.Thread(target=trabalho, args=(n, 0.01)) for n in ("parse", "infer")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert {nome: list(tempos) for nome, (_, tempos) in resultados.items()} == {"parse": ["parse"], "infer": ["infer"]}
+
+
+def test_registro_em_formato_prometheus():
+    registro = metricas.Registro()
+    registro.registrar("predict", {"parse": 0.002, "infer": 0.03}, linhas=100, total=0.05)
+    registro.registrar("predict", {"parse": 0.2}, linhas=50, total=0.4)
+    texto = registro.prometheus()
+
+    assert 'exo_stage_duration_seconds_bucket{endpoint="predict",stage="parse",le="0.0025"} 1' in texto
+    assert 'exo_stage_duration_seconds_bucket{endpoint="predict",stage="parse",le="+Inf"} 2' in texto
+    assert 'exo_stage_duration_seconds_count{endpoint="predict",stage="infer"} 1' in texto
+    assert 'exo_request_duration_seconds_sum{endpoint="predict"} 0.450000' in texto
+    assert 'exo_rows_per_second_bucket{endpoint="predict",le="1000"} 1' in texto  # 125 linhas/s
+    assert 'exo_rows_per_second_bucket{endpoint="predict",le="10000"} 2' in texto  # e 2000 linhas/s
+    assert 'exo_rows_total{endpoint="predict"} 150' in texto
+    # Etapas na ordem do pipeline, não alfabética
+    assert texto.index('stage="parse"') < texto.index('stage="infer"')
+
+
+def test_server_timing():
+    assert metricas.server_timing({"parse": 0.0012, "infer": 0.003}, total=0.005) == \
+        "parse;dur=1.20, infer;dur=3.00, total;dur=5.00"
+
+
+@pytest.mark.parametrize("ligado", [False, True])
+def test_predict_com_server_timing_e_metrics(cliente, gerar_csv, monkeypatch, ligado):
+    monkeypatch.setattr(main, "SERVER_TIMING", ligado)
+    monkeypatch.setattr(main, "registro_metricas", metricas.Registro())
+    monkeypatch.setattr(main, "MICROBATCH_MAX_UPLOAD_BYTES", 0)
+    resposta = cliente.post("/predict", files={"file": ("a.csv", gerar_csv(linhas=4), "text/csv")})
+    assert resposta.status_code == 200
+    if ligado:
+        etapas = [parte.split(";")[0] for parte in resposta.headers["server-timing"].split(", ")]
+        assert {"parse", "infer", "serialize", "total"} <= set(etapas)
+    else:
+        assert "server-timing" not in resposta.headers
+
+    texto = cliente.get("/metrics").text
+    assert 'exo_request_duration_seconds_count{endpoint="predict"} 1' in texto
+    assert 'exo_stage_duration_seconds_count{endpoint="predict",stage="parse"} 1' in texto
+    assert 'exo_rows_total{endpoint="predict"} 4' in texto
+    assert "exo_pool_workers " in texto
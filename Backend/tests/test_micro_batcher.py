@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+import main
+from micro_batcher import MicroBatcher
+
+
+class Pontuador:
+    """score_fn que guarda o tamanho de cada lote e devolve a soma de cada linha."""
+
+    def __init__(self):
+        self.lotes = []
+
+    def __call__(self, X, modelo=None):
+        self.lotes.append((len(X), modelo))
+        return X.sum(axis=1)
+
+
+def _rodar(batcher, cenario):
+    try:
+        return asyncio.run(cenario())
+    finally:
+        batcher.shutdown()
+
+
+def test_junta_requisicoes_concorrentes_em_um_lote():
+    pontuador = Pontuador()
+    batcher = MicroBatcher(pontuador, max_rows=1000, max_wait_ms=50)
+    matrizes = [np.full((n, 2), float(n)) for n in (1, 3, 2)]
+
+    async def cenario():
+        return await asyncio.gather(*(batcher.score(X) for X in matrizes))
+
+    resultados = _rodar(batcher, cenario)
+    assert pontuador.lotes == [(6, None)]
+    for X, confianca in zip(matrizes, resultados):
+        np.testing.assert_array_equal(confianca, X.sum(axis=1))
+    assert batcher.stats()["avg_batch_rows"] == 6.0
+
+
+def test_lote_cheio_sai_sem_esperar_o_prazo():
+    pontuador = Pontuador()
+    batcher = MicroBatcher(pontuador, max_rows=4, max_wait_ms=10_000)
+
+    async def cenario():
+        inicio = time.perf_counter()
+        await asyncio.gather(batcher.score(np.ones((2, 2))), batcher.score(np.ones((2, 2))))
+        return time.perf_counter() - inicio
+
+    assert _rodar(batcher, cenario) < 5
+    assert pontuador.lotes == [(4, None)]
+
+
+def test_requisicao_sozinha_sai_no_prazo():
+    pontuador = Pontuador()
+    batcher = MicroBatcher(pontuador, max_rows=1000, max_wait_ms=20)
+
+    async def cenario():
+        inicio = time.perf_counter()
+        await batcher.score(np.ones((1, 2)))
+        return time.perf_counter() - inicio
+
+    decorrido = _rodar(batcher, cenario)
+    assert 0.015 <= decorrido < 5
+    assert pontuador.lotes == [(1, None)]
+
+
+def test_modelos_diferentes_pontuam_separados():
+    pontuador = Pontuador()
+    batcher = MicroBatcher(pontuador, max_rows=1000, max_wait_ms=20)
+
+    async def cenario():
+        return await asyncio.gather(
+            batcher.score(np.ones((1, 2)), "a"), batcher.score(np.ones((2, 2)), "b"), batcher.score(np.ones((3, 2)), "a")
+        )
+
+    resultados = _rodar(batcher, cenario)
+    assert sorted(pontuador.lotes) == [(2, "b"), (4, "a")]
+    assert [len(r) for r in resultados] == [1, 2, 3]
+
+
+def test_erro_no_lote_chega_a_todas_as_requisicoes():
+    def falha(X):
+        raise RuntimeError("modelo quebrado")
+
+    batcher = MicroBatcher(falha, max_rows=1000, max_wait_ms=20)
+
+    async def cenario():
+        return await asyncio.gather(batcher.score(np.ones((1, 2))), batcher.score(np.ones((1, 2))),
+                                    return_exceptions=True)
+
+    assert [str(e) for e in _rodar(batcher, cenario)] == ["modelo quebrado"] * 2
+
+
+def test_predict_pequeno_passa_pelo_micro_batcher(cliente, gerar_csv):
+    if main.micro_batcher is None:
+        pytest.skip("micro-batching desligado (EXO_MICROBATCH_MAX_UPLOAD_KB=0)")
+    antes = main.micro_batcher.batches
+    resposta = cliente.post("/predict", files={"file": ("a.csv", gerar_csv(linhas=3), "text/csv")})
+    assert resposta.status_code == 200
+    assert main.micro_batcher.batches == antes + 1
+    assert len(resposta.json()["predictions"]) == 3
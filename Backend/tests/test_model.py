@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import leitor
+import model
+from cache_predicoes import CachePredicoes
+
+FEATURES = model.FEATURES_MODELO
+
+
+def _candidatos(linhas=20, semente=2):
+    rng = np.random.default_rng(semente)
+    df = pd.DataFrame(rng.normal(size=(linhas, len(FEATURES))), columns=FEATURES)
+    df.iloc[::3, 1] = np.nan
+    return df
+
+
+def test_pontuar_candidatos_aceita_dataframe_ou_matriz(modelo_pequeno):
+    modelo, escalonador, features = modelo_pequeno
+    df = _candidatos()
+    por_df, vereditos = model.pontuar_candidatos(df, modelo, escalonador, features, avisar=False)
+
+    X = model.preparar_matriz(df, features, medianas=model.medianas_do_treino(escalonador))
+    por_matriz, _ = model.pontuar_candidatos(X, modelo, escalonador, features, avisar=False)
+    np.testing.assert_array_equal(por_matriz, por_df)
+    # Matriz com NaN: preenchida com as mesmas medianas
+    com_nan, _ = model.pontuar_candidatos(df.to_numpy(), modelo, escalonador, features, avisar=False)
+    np.testing.assert_array_equal(com_nan, por_df)
+    assert vereditos.tolist() == model.vereditos(por_df).tolist()
+
+
+def test_pontuar_candidatos_ignora_ordem_e_colunas_extras(modelo_pequeno):
+    modelo, escalonador, features = modelo_pequeno
+    df = _candidatos()
+    esperado, _ = model.pontuar_candidatos(df, modelo, escalonador, features, avisar=False)
+    embaralhado = df[features[::-1]].assign(kepoi_name="K1.01", koi_disposition="CANDIDATE")
+    obtido, _ = model.pontuar_candidatos(embaralhado, modelo, escalonador, features, avisar=False)
+    np.testing.assert_array_equal(obtido, esperado)
+
+
+def test_pontuar_candidatos_recusa_matriz_de_formato_errado(modelo_pequeno):
+    with pytest.raises(ValueError, match="formato"):
+        model.pontuar_candidatos(np.ones((2, 3)), *modelo_pequeno, avisar=False)
+
+
+def test_analisar_novo_csv_le_uma_vez(modelo_pequeno, gerar_csv, monkeypatch):
+    leituras = []
+    original = leitor.ler_csv
+    monkeypatch.setattr(leitor, "ler_csv", lambda *a, **k: leituras.append(1) or original(*a, **k))
+    resultados = model.analisar_novo_csv(io.BytesIO(gerar_csv(linhas=6)), *modelo_pequeno)
+    assert len(resultados) == 6
+    assert leituras == [1]
+
+
+
+def _csv_treino(caminho, linhas=60, semente=3):
+    rng = np.random.default_rng(semente)
+    df = pd.DataFrame(rng.normal(size=(linhas, len(FEATURES))), columns=FEATURES)
+    df.insert(0, "koi_disposition", np.where(rng.random(linhas) < 0.5, "CONFIRMED", "FALSE POSITIVE"))
+    df.loc[0, "koi_disposition"] = "CANDIDATE"
+    df.to_csv(caminho, index=False)
+    return df
+
+
+def test_dados_treino_em_cache_pelo_sha256(artefatos_temporarios, monkeypatch):
+    caminho = str(artefatos_temporarios / "treino.csv")
+    df = _csv_treino(caminho)
+    X, y = model.carregar_dados_treino(caminho, FEATURES)
+    assert len(X) == len(df) - 1  # CANDIDATE fica fora
+    assert os.path.exists(model.CACHE_TREINO_PATH)
+
+    # Mesmo arquivo: vem do cache, sem ler o CSV
+    leituras = []
+    ler_csv = pd.read_csv
+    monkeypatch.setattr(pd, "read_csv", lambda *a, **k: leituras.append(a) or ler_csv(*a, **k))
+    X_cache, y_cache = model.carregar_dados_treino(caminho, FEATURES)
+    assert leituras == []
+    pd.testing.assert_frame_equal(X_cache, X)
+    pd.testing.assert_series_equal(y_cache, y)
+
+    # Conteúdo diferente (outro sha256): relê e regrava o cache
+    _csv_treino(caminho, linhas=40, semente=4)
+    X_novo, _ = model.carregar_dados_treino(caminho, FEATURES)
+    assert len(leituras) == 1
+    assert len(X_novo) == 39
+
+    # Outras features também invalidam
+    model.carregar_dados_treino(caminho, FEATURES[:5])
+    assert len(leituras) == 2
+
+
+def test_colunas_faltando_preenchidas_com_medianas_do_treino(gerar_csv):
+    presentes = ["koi_period", "koi_depth"]
+    df, _, _ = leitor.ler_csv(gerar_csv(linhas=3, features=presentes), FEATURES)
+    assert list(df.columns) == ["kepoi_name"] + presentes
+
+    medianas = np.arange(len(FEATURES), dtype=np.float64)
+    X = model.preparar_matriz(df, FEATURES, medianas=medianas)
+    assert X.shape == (3, len(FEATURES))
+    ausentes = [j for j, f in enumerate(FEATURES) if f not in presentes]
+    np.testing.assert_array_equal(X[:, ausentes], np.broadcast_to(medianas[ausentes], (3, len(ausentes))))
+    np.testing.assert_array_equal(X[:, FEATURES.index("koi_period")], df["koi_period"].to_numpy())
+
+
+def test_confianca_de_uma_linha_nao_depende_do_resto_do_upload(modelo_pequeno, monkeypatch):
+    # Sem cache: cada chamada pontua de novo
+    monkeypatch.setattr(model, "cache_predicoes", CachePredicoes(0))
+    modelo, escalonador, features = modelo_pequeno
+    df = _candidatos(linhas=30)
+    sozinha, _ = model.pontuar_candidatos(df.iloc[[0]], modelo, escalonador, features, avisar=False)
+    com_outras, _ = model.pontuar_candidatos(df, modelo, escalonador, features, avisar=False)
+    metade, _ = model.pontuar_candidatos(df.iloc[:10], modelo, escalonador, features, avisar=False)
+    assert np.isnan(df.iloc[0, 1])
+    assert sozinha[0] == com_outras[0] == metade[0]
+
+
+def test_matriz_com_nan_preenchida_com_medianas_do_treino():
+    X = np.full((2, len(FEATURES)), np.nan, dtype=np.float32)
+    X[1] = 1.0
+    X.flags.writeable = False
+    medianas = np.arange(len(FEATURES), dtype=np.float64)
+
+    preenchida = model.preparar_matriz(X, FEATURES, medianas=medianas)
+    np.testing.assert_array_equal(preenchida, np.vstack([medianas, np.ones(len(FEATURES))]).astype(np.float32))
+    assert preenchida.dtype == np.float32
+    assert np.isnan(X[0]).all()
+    with pytest.raises(TypeError):
+        model.preparar_matriz(X, FEATURES)
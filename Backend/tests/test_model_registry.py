@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+import bundle
+import main
+import model_registry
+from conftest import treinar_pequeno
+
+
+@pytest.fixture
+def registro(tmp_path, caminho_bundle):
+    diretorio = tmp_path / "modelos"
+    diretorio.mkdir()
+    registro = model_registry.ModelRegistry(caminho_bundle, str(diretorio), intervalo_s=0)
+    registro.verificar()
+    return registro
+
+
+def _regravar(caminho, versao, semente):
+    """Grava outro modelo em `caminho` garantindo que a assinatura (mtime, tamanho) mude."""
+    antes = model_registry.assinatura(caminho)
+    bundle.salvar_bundle(caminho, *treinar_pequeno(semente=semente), versao)
+    if antes is not None and model_registry.assinatura(caminho) == antes:
+        os.utime(caminho, ns=(antes[0] + 10**9, antes[0] + 10**9))
+
+
+def test_registro_carrega_ativo_e_versoes_do_diretorio(registro):
+    assert registro.obter().versao == "v1.0.0"
+    assert registro.verificar() == []
+
+    _regravar(os.path.join(registro.diretorio, "v0.9.0.exob"), "v0.9.0", semente=1)
+    assert registro.verificar() == ["v0.9.0"]
+    assert registro.obter("v0.9.0").versao == "v0.9.0"
+    assert [v["version"] for v in registro.versoes()] == ["v1.0.0", "v0.9.0"]
+    assert registro.versoes()[0]["active"]
+
+
+def test_registro_recarrega_ativo_alterado(registro, caminho_bundle):
+    anterior = registro.obter()
+    _regravar(caminho_bundle, "v1.1.0", semente=2)
+
+    assert registro.verificar() == ["v1.1.0"]
+    atual = registro.obter()
+    assert atual.versao == "v1.1.0"
+    assert atual is not anterior
+    assert registro.stats()["reloads"] == 2
+    # Quem já tinha a referência antiga continua com o modelo inteiro
+    assert anterior.versao == "v1.0.0" and anterior.modelo is not None
+
+
+def test_registro_remove_versao_apagada(registro):
+    caminho = os.path.join(registro.diretorio, "v0.9.0.exob")
+    _regravar(caminho, "v0.9.0", semente=1)
+    registro.verificar()
+    os.remove(caminho)
+    registro.verificar()
+    with pytest.raises(KeyError):
+        registro.obter("v0.9.0")
+
+
+def test_registro_mantem_versao_se_arquivo_novo_for_invalido(registro, caminho_bundle):
+    with open(caminho_bundle, "r+b") as f:
+        f.write(b"corrompido")
+    assert registro.verificar() == []
+    assert registro.obter().versao == "v1.0.0"
+    assert registro.stats()["failures"] == 1
+
+
+def test_versao_desconhecida_e_404(registro, monkeypatch):
+    monkeypatch.setattr(main, "model_registry", registro)
+    assert main.served_model(None).versao == "v1.0.0"
+    with pytest.raises(HTTPException) as erro:
+        main.served_model("v9.9.9")
+    assert erro.value.status_code == 404
+    assert "v1.0.0" in erro.value.detail
+
+
+def test_predict_com_versao_desconhecida(cliente, gerar_csv):
+    resposta = cliente.post("/predict?model=v9.9.9", files={"file": ("a.csv", gerar_csv(), "text/csv")})
+    assert resposta.status_code == 404
+    assert cliente.get("/models").json()["models"][0]["version"] == "v1.0.0"
+
+
+def test_partida_monta_motor_rapido_em_segundo_plano(tmp_path, caminho_bundle, monkeypatch):
+    liberar = threading.Event()
+    montado = object()
+
+    def motor_rapido_lento(base):
+        liberar.wait(5)
+        return montado
+
+    monkeypatch.setattr(model_registry.model, "motor_rapido", motor_rapido_lento)
+    registro = model_registry.ModelRegistry(caminho_bundle, str(tmp_path / "modelos"), intervalo_s=0)
+    ativo = registro.carregar_inicial()
+    # A partida não espera o motor de poucas linhas: até lá, serve o próprio modelo
+    assert ativo.rapido is ativo.modelo
+    assert not registro.aguardar_rapido(timeout=0.05)
+
+    liberar.set()
+    assert registro.aguardar_rapido(timeout=5)
+    assert registro.obter().rapido is montado
+    assert registro.obter().modelo is ativo.modelo
+    registro.shutdown()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Partida a frio da API em processo novo: import de main, startup (carga do
+modelo) e a primeira predição.
+
+Em vez do relógio de parede, mede o tempo de import acumulado que o
+`python -X importtime` reporta, contra uma base medida na hora: o import das
+dependências que a partida não evita (numpy, pandas, fastapi, numba e, no
+motor xgboost, o xgboost). E confere quais módulos a partida importou.
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+from conftest import BACKEND_DIR, csv_candidatos
+
+# Tempo de import da partida, em múltiplos da base (melhor de REPETICOES processos cada)
+FOLGA = 2.0
+REPETICOES = 3
+
+BASE = {
+    "compilado": "import numpy, pandas, fastapi, numba",
+    "xgboost": "import numpy, pandas, fastapi, numba, xgboost",
+}
+
+# Dependências de treino: o motor compilado serve sem elas (o scipy vem junto com o numba)
+SO_TREINO = ("sklearn", "xgboost", "joblib")
+# Módulos do backend usados só no treino
+SO_TREINO_BACKEND = ("ajuste", "dados_nasa")
+
+# "import time: self [us] | cumulative | nome", com o nome recuado pela profundidade
+_LINHA_IMPORTTIME = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)")
+
+_PARTIDA = """
+import json
+import asyncio
+import main
+import model
+import pipeline
+model.BUNDLE_PATH = {bundle!r}
+model.MODELOS_DIR = {modelos!r}
+asyncio.run(main.startup_event())
+servido = main.model_registry.ativo
+with open({csv!r}, "rb") as f:
+    resultados, _ = pipeline.analisar_upload(f.read(), "candidatos.csv", servido.modelo, servido.escalonador,
+                                             servido.features)
+main.model_registry.shutdown()
+print(json.dumps({{"linhas": len(resultados)}}))
+"""
+
+
+def _importtime(codigo, motor):
+    """(segundos de import acumulados, módulos importados, stdout) de `codigo` em processo novo."""
+    ambiente = dict(os.environ, EXO_MOTOR_INFERENCIA=motor, EXO_MODEL_RELOAD_S="0")
+    processo = subprocess.run([sys.executable, "-W", "ignore", "-X", "importtime", "-c", codigo], cwd=BACKEND_DIR,
+                              env=ambiente, capture_output=True, text=True, check=True)
+    microssegundos = 0
+    modulos = set()
+    for linha in processo.stderr.splitlines():
+        m = _LINHA_IMPORTTIME.match(linha)
+        if m is None:
+            continue
+        modulos.add(m.group(3))
+        # Só os imports de primeiro nível: o acumulado deles já inclui os aninhados
+        if not m.group(2):
+            microssegundos += int(m.group(1))
+    return microssegundos / 1e6, modulos, processo.stdout
+
+
+@pytest.mark.parametrize("motor", ["compilado", "xgboost"])
+def test_partida_a_frio_dentro_do_orcamento(motor, caminho_bundle, tmp_path):
+    csv = tmp_path / "candidatos.csv"
+    csv.write_bytes(csv_candidatos(linhas=20))
+    codigo = _PARTIDA.format(bundle=caminho_bundle, modelos=str(tmp_path / "modelos"), csv=str(csv))
+
+    bases, partidas = [], []
+    # Intercaladas, para que as duas medições peguem a máquina no mesmo estado
+    for _ in range(REPETICOES):
+        bases.append(_importtime(BASE[motor], motor)[0])
+        partidas.append(_importtime(codigo, motor))
+    base = min(bases)
+    melhor = min(segundos for segundos, _, _ in partidas)
+
+    assert all(json.loads(saida.strip().splitlines()[-1])["linhas"] == 20 for _, _, saida in partidas)
+    assert melhor <= FOLGA * base, (f"imports da partida com motor {motor}: {melhor:.2f} s, "
+                                    f"{melhor / base:.2f}x a base de {base:.2f} s (folga {FOLGA}x)")
+    modulos = partidas[0][1]
+    assert not modulos & set(SO_TREINO_BACKEND)
+    if motor == "compilado":
+        assert not modulos & set(SO_TREINO)
+
+_SEM_NUMBA = """
+import json
+import main
+import model
+from fastapi.testclient import TestClient
+model.BUNDLE_PATH = {bundle!r}
+model.MODELOS_DIR = {modelos!r}
+with TestClient(main.app) as cliente:
+    main.model_registry.aguardar_rapido()
+    servido = main.model_registry.ativo
+    with open({csv!r}, "rb") as f:
+        por_csv = cliente.post("/predict", files={{"file": ("candidatos.csv", f.read(), "text/csv")}})
+    por_json = cliente.post("/predict/json", json={{"koi_period": 3.5}})
+    print(json.dumps({{"modelo": type(servido.modelo).__name__, "rapido": type(servido.rapido).__name__,
+                      "predict": [por_csv.status_code, len(por_csv.json().get("predictions", []))],
+                      "json": [por_json.status_code, len(por_json.json().get("predictions", []))]}}))
+"""
+
+
+def test_motor_compilado_sem_numba_serve_com_xgboost(caminho_bundle, tmp_path):
+    # Um numba que não importa (instalação quebrada) à frente do verdadeiro no caminho
+    falso = tmp_path / "sem_numba" / "numba"
+    falso.mkdir(parents=True)
+    (falso / "__init__.py").write_text("raise ImportError('numba indisponível')\n")
+    csv = tmp_path / "candidatos.csv"
+    csv.write_bytes(csv_candidatos(linhas=20))
+    codigo = _SEM_NUMBA.format(bundle=caminho_bundle, modelos=str(tmp_path / "modelos"), csv=str(csv))
+    ambiente = dict(os.environ, EXO_MOTOR_INFERENCIA="compilado", EXO_MODEL_RELOAD_S="0",
+                    PYTHONPATH=os.pathsep.join(filter(None, [str(falso.parent), os.environ.get("PYTHONPATH")])))
+    saida = subprocess.run([sys.executable, "-W", "ignore", "-c", codigo], cwd=BACKEND_DIR, env=ambiente,
+                           capture_output=True, text=True, check=True).stdout
+    resultado = json.loads(saida.strip().splitlines()[-1])
+
+    assert resultado["modelo"] == resultado["rapido"] == "ModeloBooster"
+    assert resultado["predict"] == [200, 20]
+    assert resultado["json"] == [200, 1]
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+import model
+
+FEATURES = model.FEATURES_MODELO
+
+
+def _candidato(semente=0, **extra):
+    valores = np.random.default_rng(semente).normal(size=len(FEATURES))
+    return {"kepoi_name": f"K{semente:05d}.01", **dict(zip(FEATURES, valores.tolist())), **extra}
+
+
+def test_predict_json_igual_ao_predict(cliente):
+    candidatos = [_candidato(i) for i in range(3)]
+    df = pd.DataFrame(candidatos)
+    por_csv = cliente.post("/predict", files={"file": ("a.csv", df.to_csv(index=False).encode(), "text/csv")}).json()
+    por_json = cliente.post("/predict/json", json=candidatos)
+    assert por_json.status_code == 200
+    assert [p["percent"] for p in por_json.json()["predictions"]] == [p["percent"] for p in por_csv["predictions"]]
+
+    um = cliente.post("/predict/json", json=candidatos[0]).json()
+    assert um["predictions"][0]["name"] == "K00000.01"
+    assert um["metadata"]["totalSamples"] == 1
+
+
+def test_predict_json_preenche_faltantes_e_nomeia(cliente):
+    resposta = cliente.post("/predict/json", json={"koi_period": 3.5, "koi_depth": None})
+    assert resposta.status_code == 200
+    assert resposta.json()["predictions"][0]["name"] == "ID_1"
+
+
+@pytest.mark.parametrize("corpo", [
+    [],
+    [{"koi_period": 1.0}] * (main.JSON_MAX_CANDIDATES + 1),
+    {"koi_period": "muito"},
+    {"kepoi_name": "K1.01"},
+    [{"koi_period": 1.0}, {}],
+    "texto",
+])
+def test_predict_json_invalido_e_422(cliente, corpo):
+    resposta = cliente.post("/predict/json", json=corpo)
+    assert resposta.status_code == 422
+
+
+def test_predict_json_versao_desconhecida(cliente):
+    assert cliente.post("/predict/json?model=v0.0.1", json=_candidato()).status_code == 404
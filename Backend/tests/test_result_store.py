@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import gzip
+import io
+
+import numpy as np
+import pandas as pd
+
+import main
+import model
+from result_store import ResultStore, iter_csv
+
+
+def _resultados(linhas, nome="K"):
+    ids = np.array([f"{nome}{i:05d}.01" for i in range(linhas)], dtype=object)
+    return model.montar_resultados(ids, np.linspace(0, 1, linhas, dtype=np.float32))
+
+
+def test_descarta_o_menos_usado_ao_passar_do_limite():
+    tamanho = int(_resultados(10).memory_usage(index=True, deep=True).sum())
+    store = ResultStore(max_bytes=2 * tamanho)
+    primeiro = store.put(_resultados(10, "A"), "a.csv")
+    segundo = store.put(_resultados(10, "B"), "b.csv")
+    # Usar o primeiro o torna o mais recente: o segundo sai
+    assert store.get(primeiro)[1] == "a.csv"
+    terceiro = store.put(_resultados(10, "C"), "c.csv")
+
+    assert store.get(segundo) is None
+    assert store.get(primeiro) is not None and store.get(terceiro) is not None
+    assert store.stats()["evictions"] == 1
+    assert store.stats()["bytes"] <= store.max_bytes
+
+
+def test_resultado_maior_que_o_limite_nao_e_guardado():
+    store = ResultStore(max_bytes=100)
+    assert store.put(_resultados(50), "a.csv") is None
+    assert store.stats()["items"] == 0
+
+
+def test_iter_csv_em_blocos_e_gzip():
+    resultados = _resultados(25)
+    partes = list(iter_csv(resultados, linhas_por_bloco=10))
+    assert len(partes) == 3
+    texto = b"".join(partes)
+    pd.testing.assert_frame_equal(pd.read_csv(io.BytesIO(texto)), pd.read_csv(io.StringIO(resultados.to_csv(index=False))))
+    assert gzip.decompress(b"".join(iter_csv(resultados, gzip=True, linhas_por_bloco=10))) == texto
+
+
+def test_predict_csv_mode_link_e_download(cliente, gerar_csv):
+    csv = gerar_csv(linhas=6)
+    corpo = cliente.post("/predict?csv_mode=link", files={"file": ("a.csv", csv, "text/csv")}).json()
+    assert "csv_base64" not in corpo
+    assert corpo["csv_url"] == f"/results/{corpo['result_id']}.csv"
+
+    resposta = cliente.get(corpo["csv_url"])
+    assert resposta.status_code == 200
+    assert resposta.headers["content-disposition"] == 'attachment; filename="predicoes_a.csv"'
+    baixado = pd.read_csv(io.BytesIO(resposta.content))
+    assert baixado["kepoi_name"].tolist() == [p["name"] for p in corpo["predictions"]]
+
+    comprimido = cliente.get(corpo["csv_url"] + "?gzip=true")
+    assert comprimido.headers["content-encoding"] == "gzip"
+    assert comprimido.content == resposta.content  # o cliente HTTP já descomprime
+
+
+def test_download_de_resultado_inexistente_e_404(cliente):
+    assert cliente.get("/results/naoexiste.csv").status_code == 404
+
+
+def test_resultado_grande_demais_volta_em_base64(cliente, gerar_csv, monkeypatch):
+    monkeypatch.setattr(main, "result_store", ResultStore(max_bytes=10))
+    corpo = cliente.post("/predict?csv_mode=link", files={"file": ("a.csv", gerar_csv(), "text/csv")}).json()
+    assert "result_id" not in corpo
+    assert corpo["csv_base64"]